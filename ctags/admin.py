@@ -2,24 +2,72 @@
 Admin components for tagging.
 """
 from django.contrib import admin
+from django.contrib import messages
+from django.core.exceptions import PermissionDenied
+from django.db.models import Count
+from django.http import HttpResponseRedirect
+from django.shortcuts import get_object_or_404
+from django.template.response import TemplateResponse
+from django.urls import path
+from django.urls import reverse
+from django.utils.decorators import method_decorator
+from django.utils.text import format_lazy
+from django.utils.translation import gettext as _
+from django.utils.translation import gettext_lazy
+from django.views.decorators.http import require_POST
 
+from ctags.autotag import rebuild
+from ctags.duplicates import find_duplicates
 from ctags.forms import TagAdminForm
 from ctags.models import CTag
 from ctags.models import CTaggedItem
 
 
+LANGUAGES = (
+    ('en', gettext_lazy('English')),
+    ('ja', gettext_lazy('Japanese')),
+    ('es', gettext_lazy('Spanish')),
+    ('pt', gettext_lazy('Portuguese')),
+)
+
+
+def make_approval_action(language, name, approved):
+    """
+    Builds an admin action setting the approval of the selected ctags
+    in ``language``, in a single UPDATE.
+    """
+    def action(modeladmin, request, queryset):
+        updated = queryset.update(**{'approved_%s' % language: approved})
+        # The UPDATE sends no signals, outdate the in-process copies of
+        # the vocabulary.
+        rebuild()
+        modeladmin.message_user(request, _(
+            '%(count)d ctags were updated.') % {'count': updated})
+    action.__name__ = '%s_%s' % (approved and 'approve' or 'unapprove',
+                                 language)
+    if approved:
+        action.short_description = format_lazy(
+            gettext_lazy('Approve selected ctags in {}'), name)
+    else:
+        action.short_description = format_lazy(
+            gettext_lazy('Unapprove selected ctags in {}'), name)
+    return action
+
+
 class TagAdmin(admin.ModelAdmin):
     fieldsets = (
         (None, {'fields': ('approved_en', 'name_en')}),
         (None, {'fields': ('approved_ja', 'name_ja')}),
         (None, {'fields': ('approved_es', 'name_es')}),
         (None, {'fields': ('approved_pt', 'name_pt')}),
+        (None, {'fields': ('parent',)}),
     )
     list_display = (
         'approved_en', 'name_en',
         'approved_ja', 'name_ja',
         'approved_es', 'name_es',
         'approved_pt', 'name_pt',
+        'usage_count',
     )
     list_display_links = None
     list_editable = (
@@ -28,8 +76,85 @@ class TagAdmin(admin.ModelAdmin):
         'approved_es', 'name_es',
         'approved_pt', 'name_pt',
     )
+    list_filter = ('approved_en', 'approved_ja', 'approved_es', 'approved_pt')
     list_per_page = 100
+    raw_id_fields = ('parent',)
     save_on_top = True
+    actions = [make_approval_action(language, name, approved)
+               for language, name in LANGUAGES
+               for approved in (True, False)]
+    duplicate_threshold = 0.7
+
+    def get_queryset(self, request):
+        queryset = super(TagAdmin, self).get_queryset(request)
+        match = request.resolver_match
+        if match is not None and match.url_name == '%s_%s_changelist' % (
+                self.model._meta.app_label, self.model._meta.model_name):
+            # The usage counts of a whole page come from a single
+            # aggregate, which the other views have no use for.
+            queryset = queryset.annotate(usage=Count('items'))
+        return queryset
+
+    def usage_count(self, obj):
+        return obj.usage
+    usage_count.short_description = gettext_lazy('usage')
+    usage_count.admin_order_field = 'usage'
+
+    def get_urls(self):
+        info = self.model._meta.app_label, self.model._meta.model_name
+        return [
+            path('duplicates/',
+                 self.admin_site.admin_view(self.duplicates_view),
+                 name='%s_%s_duplicates' % info),
+            path('merge/',
+                 self.admin_site.admin_view(self.merge_view),
+                 name='%s_%s_merge' % info),
+        ] + super(TagAdmin, self).get_urls()
+
+    def duplicates_view(self, request):
+        """
+        Reports the candidate duplicate ctags.
+        """
+        if not self.has_view_permission(request):
+            raise PermissionDenied
+        duplicates = find_duplicates(self.duplicate_threshold)
+        names = dict(CTag.objects.filter(pk__in=[
+            tag_id for duplicate in duplicates
+            for tag_id in (duplicate.tag_id, duplicate.other_tag_id)
+        ]).values_list('pk', 'name_en'))
+        context = dict(
+            self.admin_site.each_context(request),
+            title=_('Candidate duplicate ctags'),
+            opts=self.model._meta,
+            duplicates=[(duplicate, names.get(duplicate.tag_id),
+                         names.get(duplicate.other_tag_id))
+                        for duplicate in duplicates],
+            has_change_permission=self.has_change_permission(request),
+        )
+        return TemplateResponse(
+            request, 'admin/ctags/ctag/duplicates.html', context)
+
+    @method_decorator(require_POST)
+    def merge_view(self, request):
+        """
+        Merges the ``source`` ctag into the ``target`` one.
+        """
+        if not (self.has_change_permission(request) and
+                self.has_delete_permission(request)):
+            raise PermissionDenied
+        source = get_object_or_404(CTag, pk=request.POST.get('source'))
+        target = get_object_or_404(CTag, pk=request.POST.get('target'))
+        if source.pk == target.pk:
+            self.message_user(request, _('A ctag cannot be merged into '
+                                         'itself.'), messages.ERROR)
+        else:
+            CTag.objects.merge(source, target)
+            self.message_user(request, _('"%(source)s" was merged into '
+                                         '"%(target)s".') % {
+                                  'source': source.name_en,
+                                  'target': target.name_en})
+        return HttpResponseRedirect(reverse(
+            '%s:ctags_ctag_duplicates' % self.admin_site.name))
 
 
 #admin.site.register(CTaggedItem)
@@ -0,0 +1,161 @@
+"""
+Sparse object by ctag incidence matrix of the tagged items, for bulk
+analyses such as co-occurrence and similarity reports.
+
+The matrix is kept in compressed sparse row (CSR) form, one row per
+object and one column per ctag, in ``array`` arrays. NumPy and SciPy are
+used for the computations when they are installed.
+"""
+from array import array
+from collections import Counter
+from itertools import combinations
+
+from django.contrib.contenttypes.models import ContentType
+from django.db import router
+
+from ctags.models import CTaggedItem
+
+try:
+    import numpy
+    from scipy import sparse
+except ImportError:
+    numpy = sparse = None
+
+
+class IncidenceMatrix(object):
+    """
+    Incidence matrix of objects and ctags in CSR form: the column
+    indices of the ctags of the object of row ``i`` are
+    ``indices[indptr[i]:indptr[i + 1]]``.
+    """
+    def __init__(self, objects, tag_ids, indptr, indices):
+        """
+        ``objects`` lists the ``(content_type_id, object_id)`` of the
+        rows and ``tag_ids`` the ctag ids of the columns.
+        """
+        self.objects = objects
+        self.tag_ids = tag_ids
+        self.indptr = indptr
+        self.indices = indices
+        self.object_index = {key: index for index, key in enumerate(objects)}
+        self.tag_index = {tag_id: index
+                          for index, tag_id in enumerate(tag_ids)}
+
+    @classmethod
+    def from_database(cls, models=None, using=None, chunk_size=10000):
+        """
+        Streams the tagged items of the given ``models``, or of all of
+        them, into a matrix.
+        """
+        db = using or router.db_for_read(CTaggedItem)
+        items = CTaggedItem._default_manager.using(db)
+        if models:
+            items = items.filter(content_type__in=list(
+                ContentType.objects.db_manager(db).get_for_models(
+                    *models).values()))
+        objects = []
+        tag_ids = []
+        tag_index = {}
+        indptr = array('q', [0])
+        indices = array('i')
+        row = []
+        current = None
+        # Rows come in the order of the (content_type, object_id, ctag)
+        # index, each object being complete before the next one.
+        for content_type_id, object_id, ctag_id in items.order_by(
+                'content_type_id', 'object_id').values_list(
+                    'content_type_id', 'object_id', 'ctag_id').iterator(
+                        chunk_size=chunk_size):
+            key = (content_type_id, object_id)
+            if key != current:
+                if row:
+                    row.sort()
+                    indices.extend(row)
+                    indptr.append(len(indices))
+                    row = []
+                objects.append(key)
+                current = key
+            column = tag_index.get(ctag_id)
+            if column is None:
+                column = tag_index[ctag_id] = len(tag_ids)
+                tag_ids.append(ctag_id)
+            row.append(column)
+        if row:
+            row.sort()
+            indices.extend(row)
+            indptr.append(len(indices))
+        return cls(objects, tag_ids, indptr, indices)
+
+    @property
+    def shape(self):
+        return len(self.objects), len(self.tag_ids)
+
+    def row(self, index):
+        """
+        Returns the column indices of the ctags of the object of row
+        ``index``.
+        """
+        return self.indices[self.indptr[index]:self.indptr[index + 1]]
+
+    def to_scipy(self):
+        """
+        Returns the matrix as a ``scipy.sparse.csr_matrix`` of ones.
+        """
+        if sparse is None:
+            raise ImportError('SciPy is required to build sparse matrices.')
+        return sparse.csr_matrix(
+            (numpy.ones(len(self.indices), dtype=numpy.int32),
+             numpy.frombuffer(self.indices, dtype=numpy.intc),
+             numpy.frombuffer(self.indptr, dtype=numpy.int64)),
+            shape=self.shape)
+
+    def tag_frequencies(self):
+        """
+        Returns the number of objects tagged with each ctag, indexed by
+        column.
+        """
+        if numpy is not None:
+            return numpy.bincount(
+                numpy.frombuffer(self.indices, dtype=numpy.intc),
+                minlength=len(self.tag_ids))
+        frequencies = array('q', [0]) * len(self.tag_ids)
+        for column in self.indices:
+            frequencies[column] += 1
+        return frequencies
+
+    def cooccurrence(self, min_count=1):
+        """
+        Returns a dictionary of the number of objects tagged with both
+        ctags of each pair of ctag ids, keeping the pairs found at least
+        ``min_count`` times. Each pair is only reported once.
+        """
+        tag_ids = self.tag_ids
+        if sparse is not None:
+            matrix = self.to_scipy()
+            counts = sparse.triu(matrix.T @ matrix, k=1).tocoo()
+            return {(tag_ids[row], tag_ids[column]): int(count)
+                    for row, column, count in zip(
+                        counts.row, counts.col, counts.data)
+                    if count >= min_count}
+        counts = Counter()
+        for index in range(len(self.objects)):
+            counts.update(combinations(self.row(index), 2))
+        return {(tag_ids[row], tag_ids[column]): count
+                for (row, column), count in counts.items()
+                if count >= min_count}
+
+    def jaccard(self, min_count=1):
+        """
+        Returns a dictionary of the Jaccard similarity of the sets of
+        objects tagged with the ctags of each pair of ctag ids
+        co-occurring at least ``min_count`` times.
+        """
+        frequencies = self.tag_frequencies()
+        tag_index = self.tag_index
+        similarities = {}
+        for (tag_id, other_tag_id), count in self.cooccurrence(
+                min_count).items():
+            union = (frequencies[tag_index[tag_id]] +
+                     frequencies[tag_index[other_tag_id]] - count)
+            similarities[tag_id, other_tag_id] = count / float(union)
+        return similarities
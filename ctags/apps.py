@@ -2,6 +2,7 @@
 App for canonical tagging.
 """
 from django.apps import AppConfig
+from django.utils.module_loading import import_string
 from django.utils.translation import gettext_lazy as _
 
 
@@ -12,3 +13,45 @@ class TaggingConfig(AppConfig):
     name = 'ctags'
     label = 'ctags'
     verbose_name = _('Canonical Tags')
+
+    def ready(self):
+        from ctags import autotag  # noqa: F401 (connects its receivers)
+        from ctags import hierarchy  # noqa: F401 (connects its receivers)
+        from ctags import settings
+        from ctags.instrumentation import manager_call
+
+        for path in settings.CTAGS_INSTRUMENTATION_RECEIVERS:
+            manager_call.connect(import_string(path), dispatch_uid=path)
+
+        if settings.CTAGS_TRENDING:
+            from django.db.models import signals
+            from ctags.trending import item_saved
+
+            signals.post_save.connect(
+                item_saved, sender=self.get_model('CTaggedItem'))
+
+        if settings.CTAGS_CHANGE_LOG:
+            from django.db.models import signals
+            from ctags import changelog
+
+            item_model = self.get_model('CTaggedItem')
+            signals.post_save.connect(changelog.item_saved, sender=item_model)
+            signals.post_delete.connect(changelog.item_deleted,
+                                        sender=item_model)
+
+        if settings.CTAGS_OBJECT_CACHE:
+            from django.db.models import signals
+            from ctags.objectcache import item_changed
+
+            item_model = self.get_model('CTaggedItem')
+            signals.post_save.connect(item_changed, sender=item_model)
+            signals.post_delete.connect(item_changed, sender=item_model)
+
+        if settings.CTAGS_FACET_CACHE:
+            from django.db.models import signals
+            from ctags import facets
+
+            item_model = self.get_model('CTaggedItem')
+            signals.post_save.connect(facets.item_changed, sender=item_model)
+            signals.post_delete.connect(facets.item_changed,
+                                        sender=item_model)
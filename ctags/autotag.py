@@ -0,0 +1,227 @@
+"""
+Automatic tagging of texts, by matching all the ctag names and aliases
+in a single pass with an Aho-Corasick automaton.
+"""
+import threading
+from collections import Counter
+from collections import deque
+
+from django.core.cache import cache
+from django.db.models import signals
+from django.dispatch import receiver
+
+from ctags.models import CTag
+from ctags.models import CTagAliasEn
+
+NAME_FIELDS = ('name_en', 'name_ja', 'name_es', 'name_pt')
+
+# Cache key of the generation of the ctag vocabulary, shared by the
+# processes so that they know when to rebuild their automaton.
+GENERATION_CACHE_KEY = 'ctags.autotag.generation'
+
+
+def is_cjk(char):
+    """
+    Whether ``char`` belongs to a script written without spaces
+    between words: Japanese kana, CJK ideographs or Hangul.
+    """
+    code = ord(char)
+    return (0x3040 <= code <= 0x30ff or 0x3400 <= code <= 0x9fff or
+            0xac00 <= code <= 0xd7af or 0xf900 <= code <= 0xfaff or
+            0xff66 <= code <= 0xff9f or 0x20000 <= code <= 0x2fa1f)
+
+
+def is_word_char(char):
+    """
+    Whether ``char`` is part of a word delimited by boundaries.
+    """
+    return char.isalnum() and not is_cjk(char)
+
+
+class TagMatcher(object):
+    """
+    Aho-Corasick automaton over tag names.
+
+    Names are matched case insensitively. A name starting or ending with
+    a letter or digit of a spaced script only matches at word
+    boundaries, whereas Japanese names match anywhere.
+    """
+    def __init__(self, names):
+        """
+        ``names`` is an iterable of ``(name, tag_id)`` pairs.
+        """
+        # Transitions are kept in a single dictionary keyed by
+        # (state, character), which is far more compact than a
+        # dictionary per state.
+        self.goto = {}
+        self.fail = [0]
+        # Per state, the (tag_id, length, start_boundary, end_boundary)
+        # of the names ending there.
+        self.outputs = [()]
+        for name, tag_id in names:
+            self.add(name, tag_id)
+        self.link()
+
+    def add(self, name, tag_id):
+        name = name.strip().lower()
+        if not name:
+            return
+        state = 0
+        for char in name:
+            next_state = self.goto.get((state, char))
+            if next_state is None:
+                next_state = len(self.fail)
+                self.goto[state, char] = next_state
+                self.fail.append(0)
+                self.outputs.append(())
+            state = next_state
+        output = (tag_id, len(name),
+                  is_word_char(name[0]), is_word_char(name[-1]))
+        if output not in self.outputs[state]:
+            self.outputs[state] += (output,)
+
+    def link(self):
+        """
+        Computes the failure links, breadth first, merging the outputs
+        of each state with those of its failure state.
+        """
+        children = {}
+        for (state, char), next_state in self.goto.items():
+            children.setdefault(state, []).append((char, next_state))
+        queue = deque()
+        for char, next_state in children.get(0, ()):
+            queue.append(next_state)
+        while queue:
+            state = queue.popleft()
+            for char, next_state in children.get(state, ()):
+                queue.append(next_state)
+                fallback = self.fail[state]
+                while fallback and (fallback, char) not in self.goto:
+                    fallback = self.fail[fallback]
+                target = self.goto.get((fallback, char), 0)
+                self.fail[next_state] = target if target != next_state else 0
+                self.outputs[next_state] += self.outputs[
+                    self.fail[next_state]]
+
+    def match(self, text):
+        """
+        Scans ``text`` once, returning a ``Counter`` of the number of
+        hits per tag id.
+        """
+        hits = Counter()
+        if not text:
+            return hits
+        text = text.lower()
+        goto = self.goto
+        fail = self.fail
+        outputs = self.outputs
+        last = len(text) - 1
+        state = 0
+        for position, char in enumerate(text):
+            while state and (state, char) not in goto:
+                state = fail[state]
+            state = goto.get((state, char), 0)
+            for tag_id, length, start_boundary, end_boundary in \
+                    outputs[state]:
+                start = position - length + 1
+                if start_boundary and start and is_word_char(text[start - 1]):
+                    continue
+                if (end_boundary and position < last and
+                        is_word_char(text[position + 1])):
+                    continue
+                hits[tag_id] += 1
+        return hits
+
+
+def get_vocabulary(using=None):
+    """
+    Yields the ``(name, tag_id)`` pairs of all the ctag names and
+    English aliases.
+    """
+    tag_ids = set()
+    for row in CTag.objects.using(using).values_list('pk', *NAME_FIELDS):
+        tag_ids.add(row[0])
+        for name in row[1:]:
+            yield name, row[0]
+    for name, target in CTagAliasEn.objects.using(using).values_list(
+            'name', 'target'):
+        if target in tag_ids:
+            yield name, target
+
+
+_lock = threading.Lock()
+_matcher = None
+_generation = None
+
+
+def get_matcher():
+    """
+    Returns the automaton of the current vocabulary, building it again
+    when the vocabulary changed since it was built, in this process or
+    another one.
+    """
+    global _matcher, _generation
+    generation = cache.get_or_set(GENERATION_CACHE_KEY, 0, None)
+    with _lock:
+        if _matcher is None or generation != _generation:
+            _matcher = TagMatcher(get_vocabulary())
+            _generation = generation
+        return _matcher
+
+
+def rebuild():
+    """
+    Marks the automata of all the processes as outdated.
+    """
+    try:
+        cache.incr(GENERATION_CACHE_KEY)
+    except ValueError:
+        cache.set(GENERATION_CACHE_KEY, 1, None)
+
+
+@receiver(signals.post_save, sender=CTag)
+@receiver(signals.post_delete, sender=CTag)
+@receiver(signals.post_save, sender=CTagAliasEn)
+@receiver(signals.post_delete, sender=CTagAliasEn)
+def vocabulary_changed(sender, **kwargs):
+    rebuild()
+
+
+def suggest_tags(text, min_hits=1):
+    """
+    Returns a ``Counter`` of the hits per id of the ctags found in
+    ``text``, keeping those found at least ``min_hits`` times.
+    """
+    hits = get_matcher().match(text)
+    if min_hits > 1:
+        hits = Counter({tag_id: count for tag_id, count in hits.items()
+                        if count >= min_hits})
+    return hits
+
+
+def suggest_tags_bulk(objects, fields, min_hits=1):
+    """
+    Yields an ``(obj, hits)`` pair for each of ``objects``, ``hits``
+    counting the ctags found in the values of the given ``fields``.
+    """
+    matcher = get_matcher()
+    for obj in objects:
+        hits = Counter()
+        for field in fields:
+            hits.update(matcher.match(getattr(obj, field) or ''))
+        if min_hits > 1:
+            hits = Counter({tag_id: count for tag_id, count in hits.items()
+                            if count >= min_hits})
+        yield obj, hits
+
+
+def autotag(objects, fields, min_hits=1, using=None, batch_size=1000):
+    """
+    Tags each of ``objects`` with the ctags found in the values of its
+    ``fields``, through ``TagManager.bulk_add_tags``.
+    """
+    CTag.objects.bulk_add_tags(
+        ((obj, list(hits))
+         for obj, hits in suggest_tags_bulk(objects, fields, min_hits)
+         if hits),
+        using=using, batch_size=batch_size)
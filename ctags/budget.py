@@ -0,0 +1,198 @@
+"""
+Query budgets of the public APIs of ctags.
+
+Each API makes a fixed number of queries, whatever the number of objects
+it reads. ``check`` calls the APIs on growing numbers of the tagged
+instances of a model and counts their queries, so that an API which
+regressed to a query per object or per row is caught against
+representative data, from a project's tests or the ``ctags_budget``
+command. Writes are rolled back.
+"""
+from collections import namedtuple
+from contextlib import ExitStack
+from contextlib import contextmanager
+
+from django.contrib.contenttypes.models import ContentType
+from django.db import connections
+from django.db import router
+from django.db import transaction
+from django.template import Context
+from django.template import Template
+
+from ctags.fields import TagField
+from ctags.instrumentation import QueryCounter
+from ctags.managers import ModelTaggedItemManager
+from ctags.managers import TagDescriptor
+from ctags.models import CTag
+from ctags.models import CTaggedItem
+
+# The calls of a check run with the first ``size`` tagged instances of
+# ``model`` as ``queryset``, the last of them as ``obj``, its ctags, and
+# a ``spare`` ctag it does not have, if any.
+Scope = namedtuple('Scope', ('model', 'db', 'size', 'queryset', 'obj',
+                             'ctags', 'spare'))
+
+# ``counts`` holds the number of queries of each size checked.
+Result = namedtuple('Result', ('name', 'budget', 'counts'))
+
+
+def _render(scope, tag):
+    """
+    Renders ``tag`` and evaluates the variable it sets.
+    """
+    context = Context({'obj': scope.obj, 'ctag': scope.ctags[0]})
+    Template('{% load ctags %}' + tag.replace(
+        '[model]', scope.model._meta.label)).render(context)
+    return list(context['result'])
+
+
+def _manager(scope):
+    manager = ModelTaggedItemManager()
+    manager.model = scope.model
+    return manager.db_manager(scope.db)
+
+
+def _get_tags(scope):
+    for name, value in vars(scope.model).items():
+        if isinstance(value, TagDescriptor):
+            return list(getattr(scope.obj, name))
+    for field in scope.model._meta.fields:
+        if isinstance(field, TagField):
+            # Read again rather than from the instance's cache.
+            vars(scope.obj).pop('_%s_cache' % field.attname, None)
+            return getattr(scope.obj, field.attname)
+
+
+def _update_tags(scope):
+    """
+    Swaps one ctag of ``obj`` for another.
+    """
+    tag_ids = [ctag.pk for ctag in scope.ctags[1:]]
+    if scope.spare is not None:
+        tag_ids.append(scope.spare.pk)
+    CTag.objects.update_tags(scope.obj, tag_ids, using=scope.db)
+
+
+# The name, budget and call of each API checked. The budgets hold with
+# the default settings, ``CTAGS_TRENDING`` and ``CTAGS_CHANGE_LOG``
+# adding queries to the writes. ``update_tags`` makes a fixed number of
+# queries for a fixed number of ctags changed, here one ctag removed and
+# one added, counting the savepoint of the item created.
+CHECKS = [
+    ('TagManager.usage_for_model', 1, lambda scope:
+        CTag.objects.usage_for_model(
+            scope.model, counts=True,
+            filters={'pk__in': scope.queryset.values('pk')},
+            using=scope.db)),
+    ('TagManager.usage_for_queryset', 1, lambda scope:
+        CTag.objects.usage_for_queryset(scope.queryset, counts=True)),
+    ('TagManager.cloud_for_model', 1, lambda scope:
+        CTag.objects.cloud_for_model(scope.model, using=scope.db)),
+    ('TagManager.related_for_model', 1, lambda scope:
+        CTag.objects.related_for_model(scope.ctags[:1], scope.model,
+                                       counts=True, using=scope.db)),
+    ('TagManager.get_for_object', 1, lambda scope: list(
+        CTag.objects.get_for_object(scope.obj, using=scope.db))),
+    ('TagManager.update_tags', 7, _update_tags),
+    ('TaggedItemManager.get_by_model', 1, lambda scope: list(
+        CTaggedItem.objects.get_by_model(scope.queryset, scope.ctags[:2]))),
+    ('TaggedItemManager.get_union_by_model', 1, lambda scope: list(
+        CTaggedItem.objects.get_union_by_model(scope.queryset,
+                                               scope.ctags[:2]))),
+    ('TaggedItemManager.get_related', 2, lambda scope:
+        CTaggedItem.objects.get_related(scope.obj, scope.queryset)),
+    ('ModelTaggedItemManager.with_all', 1, lambda scope: list(
+        _manager(scope).with_all(scope.ctags[:2], scope.queryset))),
+    ('ModelTaggedItemManager.with_any', 1, lambda scope: list(
+        _manager(scope).with_any(scope.ctags[:2], scope.queryset))),
+    ('tags of an instance', 1, _get_tags),
+    ('{% ctags_for_model %}', 1, lambda scope: _render(
+        scope, '{% ctags_for_model [model] as result %}')),
+    ('{% ctag_cloud_for_model %}', 1, lambda scope: _render(
+        scope, '{% ctag_cloud_for_model [model] as result %}')),
+    ('{% ctags_for_object %}', 1, lambda scope: _render(
+        scope, '{% ctags_for_object obj as result %}')),
+    ('{% ctagged_objects %}', 1, lambda scope: _render(
+        scope, '{% ctagged_objects ctag in [model] as result %}')),
+]
+
+
+def get_scopes(model, sizes=(1, 10, 100), using=None):
+    """
+    Returns the scopes of the first instances of ``model`` which are
+    tagged, one per size not exceeding their number.
+    """
+    db = using or router.db_for_read(model)
+    content_type = ContentType.objects.db_manager(db).get_for_model(model)
+    object_ids = list(CTaggedItem._default_manager.using(db).filter(
+        content_type=content_type).order_by('object_id').values_list(
+            'object_id', flat=True).distinct()[:max(sizes)])
+    scopes = []
+    for size in sorted(sizes):
+        if size > len(object_ids):
+            break
+        queryset = model._default_manager.using(db).filter(
+            pk__in=object_ids[:size])
+        obj = queryset.get(pk=object_ids[size - 1])
+        ctags = list(CTag.objects.get_for_object(obj, using=db))
+        spare = CTag.objects.using(db).exclude(
+            pk__in=[ctag.pk for ctag in ctags]).first()
+        scopes.append(Scope(model, db, size, queryset, obj, ctags, spare))
+    return scopes
+
+
+@contextmanager
+def rolled_back(using):
+    """
+    Runs the block in a transaction, or a savepoint, rolled back at its
+    end.
+    """
+    with transaction.atomic(using=using):
+        yield
+        transaction.set_rollback(True, using=using)
+
+
+def count_queries(func, *args, **kwargs):
+    """
+    Returns the number of queries made by calling ``func``.
+    """
+    counter = QueryCounter()
+    with ExitStack() as stack:
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(counter))
+        func(*args, **kwargs)
+    return counter.count
+
+
+def check(model, sizes=(1, 10, 100), using=None, budgets=None):
+    """
+    Returns the ``Result`` of each check for ``model``. ``budgets`` may
+    map the names of some checks to other budgets than ``CHECKS``.
+
+    Every call runs once before being counted, so that the content types
+    are cached. The calls run in transactions rolled back once counted,
+    whose own queries are not counted, so that the counts are the same
+    within a test case.
+    """
+    scopes = get_scopes(model, sizes, using)
+    results = []
+    for name, budget, call in CHECKS:
+        budget = (budgets or {}).get(name, budget)
+        counts = []
+        for scope in scopes:
+            with rolled_back(scope.db):
+                call(scope)
+            with rolled_back(scope.db):
+                counts.append(count_queries(call, scope))
+        results.append(Result(name, budget, counts))
+    return results
+
+
+def failures(results):
+    """
+    Returns the results over their budget, or whose count grows with the
+    number of instances.
+    """
+    return [result for result in results
+            if max(result.counts or [0]) > result.budget or
+            result.counts != sorted(result.counts, reverse=True)]
@@ -0,0 +1,131 @@
+"""
+Log of the ctags added to and removed from objects, for downstream
+consumers such as search indexers to process the changes incrementally.
+
+Changes are logged when the ``CTAGS_CHANGE_LOG`` setting is enabled:
+through the ``CTaggedItem`` model signals, and explicitly by the bulk
+write paths which bypass them. A consumer keeps the ``id`` of the last
+change it processed as its cursor::
+
+    for changes in iter_changes(after=cursor):
+        process(changes)
+        cursor = changes[-1].id
+"""
+import datetime
+
+from django.db import router
+from django.db.models import Exists
+from django.db.models import OuterRef
+from django.utils import timezone
+
+from ctags import settings
+from ctags.models import CTagChange
+
+
+def record(changes, using=None):
+    """
+    Appends ``changes``, an iterable of ``(content_type_id, object_id,
+    ctag_id, added)`` tuples, to the log.
+    """
+    db = using or router.db_for_write(CTagChange)
+    CTagChange.objects.using(db).bulk_create(
+        [CTagChange(content_type_id=content_type_id, object_id=object_id,
+                    ctag_id=ctag_id, added=added)
+         for content_type_id, object_id, ctag_id, added in changes],
+        batch_size=1000)
+
+
+def record_items(items, added, using=None):
+    """
+    Logs the addition, or removal, of the given ``CTaggedItem``
+    instances, when the log is enabled.
+    """
+    if settings.CTAGS_CHANGE_LOG:
+        record(((item.content_type_id, item.object_id, item.ctag_id, added)
+                for item in items), using)
+
+
+def item_saved(sender, instance, created, raw=False, using=None, **kwargs):
+    """
+    ``post_save`` receiver of ``CTaggedItem`` logging additions.
+    """
+    if created and not raw:
+        record_items([instance], True, using)
+
+
+def item_deleted(sender, instance, using=None, **kwargs):
+    """
+    ``post_delete`` receiver of ``CTaggedItem`` logging removals.
+    """
+    record_items([instance], False, using)
+
+
+def read_changes(after=0, limit=1000, using=None):
+    """
+    Returns up to ``limit`` changes following the one of id ``after``,
+    in order.
+    """
+    db = using or router.db_for_read(CTagChange)
+    return list(CTagChange.objects.using(db).filter(
+        id__gt=after).order_by('id')[:limit])
+
+
+def iter_changes(after=0, batch_size=1000, using=None):
+    """
+    Yields the changes following the one of id ``after`` in batches of
+    up to ``batch_size``, until the end of the log.
+    """
+    while True:
+        changes = read_changes(after, batch_size, using)
+        if not changes:
+            return
+        yield changes
+        after = changes[-1].id
+
+
+def purge(days, using=None):
+    """
+    Deletes the changes older than ``days`` days. Returns the number of
+    deleted changes.
+    """
+    db = using or router.db_for_write(CTagChange)
+    return CTagChange.objects.using(db).filter(
+        created__lt=timezone.now() - datetime.timedelta(days=days)
+    ).delete()[0]
+
+
+def compact(upto=None, using=None, chunk_size=10000):
+    """
+    Deletes the changes, up to the one of id ``upto``, which are
+    superseded by a later change of the same ctag on the same object,
+    scanning ``chunk_size`` changes at a time in ``id`` order.
+
+    Consumers whose cursor precedes ``upto`` then only see the final
+    state of each object and ctag, so ``upto`` should not exceed the
+    cursor of the slowest consumer needing every intermediate change.
+    Returns the number of deleted changes.
+    """
+    db = using or router.db_for_write(CTagChange)
+    changes = CTagChange.objects.using(db)
+    if upto is not None:
+        changes = changes.filter(id__lte=upto)
+    deleted = 0
+    last_id = 0
+    while True:
+        ids = list(changes.filter(id__gt=last_id).order_by(
+            'id').values_list('id', flat=True)[:chunk_size])
+        if not ids:
+            return deleted
+        # The ids are read beforehand, MySQL refusing subqueries on the
+        # table a DELETE applies to.
+        superseded = list(changes.filter(
+            id__gte=ids[0], id__lte=ids[-1]
+        ).filter(Exists(changes.filter(
+            content_type=OuterRef('content_type'),
+            object_id=OuterRef('object_id'),
+            ctag_id=OuterRef('ctag_id'),
+            id__gt=OuterRef('id')))).values_list('id', flat=True))
+        if superseded:
+            deleted += CTagChange.objects.using(db).filter(
+                id__in=superseded).delete()[0]
+        last_id = ids[-1]
@@ -0,0 +1,123 @@
+"""
+Detection of near-duplicate ctags, such as "Japanese-American" and
+"Japanese American".
+
+Names are compared per language through an inverted index of the
+trigrams of their normalized keys, so that only names sharing trigrams
+are ever compared.
+"""
+import unicodedata
+from collections import namedtuple
+
+from ctags.autotag import is_cjk
+from ctags.models import CTag
+from ctags.models import CTagAliasEn
+
+NAME_FIELDS = ('name_en', 'name_ja', 'name_es', 'name_pt')
+
+Duplicate = namedtuple('Duplicate', (
+    'score', 'field', 'tag_id', 'name', 'other_tag_id', 'other_name'))
+
+
+def normalize_name(name):
+    """
+    Returns the comparison key of a tag name: case folded, without
+    accents, punctuation nor spaces. The voicing marks of Japanese kana
+    are kept.
+    """
+    key = []
+    for char in unicodedata.normalize('NFKD', name.casefold()):
+        if char.isalnum():
+            key.append(char)
+        elif unicodedata.combining(char) and key and is_cjk(key[-1]):
+            key.append(char)
+    return unicodedata.normalize('NFC', ''.join(key))
+
+
+def trigrams(key):
+    if len(key) < 3:
+        return {key}
+    return {key[i:i + 3] for i in range(len(key) - 2)}
+
+
+class DuplicateIndex(object):
+    """
+    Trigram index over the names of the ctags.
+    """
+    def __init__(self, entries, max_frequency=500):
+        """
+        ``entries`` is an iterable of ``(field, tag_id, name)``. Trigrams
+        shared by more than ``max_frequency`` names are not indexed.
+        """
+        self.max_frequency = max_frequency
+        self.entries = []
+        self.grams = []
+        self.postings = {}
+        for field, tag_id, name in entries:
+            key = normalize_name(name)
+            if not key:
+                continue
+            grams = trigrams(key)
+            index = len(self.entries)
+            self.entries.append((field, tag_id, name, key))
+            self.grams.append(grams)
+            for gram in grams:
+                self.postings.setdefault((field, gram), []).append(index)
+
+    @classmethod
+    def from_database(cls, using=None, **kwargs):
+        """
+        Indexes all the ctag names, along with the English aliases.
+        """
+        def entries():
+            for row in CTag.objects.using(using).values_list(
+                    'pk', *NAME_FIELDS):
+                for field, name in zip(NAME_FIELDS, row[1:]):
+                    yield field, row[0], name
+            for name, target in CTagAliasEn.objects.using(
+                    using).values_list('name', 'target'):
+                yield 'name_en', target, name
+        return cls(entries(), **kwargs)
+
+    def find(self, threshold=0.7):
+        """
+        Returns the pairs of distinct ctags with names whose trigram
+        similarity is at least ``threshold``, best first. Each pair is
+        reported once, for its most similar names.
+        """
+        best = {}
+        for index, (field, tag_id, name, key) in enumerate(self.entries):
+            grams = self.grams[index]
+            candidates = set()
+            for gram in grams:
+                posting = self.postings[field, gram]
+                if len(posting) <= self.max_frequency:
+                    candidates.update(posting)
+            for other in candidates:
+                if other <= index:
+                    continue
+                other_tag_id = self.entries[other][1]
+                if other_tag_id == tag_id:
+                    continue
+                other_grams = self.grams[other]
+                if key == self.entries[other][3]:
+                    score = 1.0
+                else:
+                    score = (len(grams & other_grams) /
+                             float(len(grams | other_grams)))
+                if score < threshold:
+                    continue
+                pair = (min(tag_id, other_tag_id), max(tag_id, other_tag_id))
+                if pair not in best or best[pair].score < score:
+                    best[pair] = Duplicate(score, field, tag_id, name,
+                                           other_tag_id,
+                                           self.entries[other][2])
+        return sorted(best.values(), key=lambda duplicate: (
+            -duplicate.score, duplicate.name))
+
+
+def find_duplicates(threshold=0.7, using=None):
+    """
+    Returns the candidate duplicate ctags of the database.
+    """
+    return DuplicateIndex.from_database(using).find(threshold)
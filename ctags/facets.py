@@ -0,0 +1,193 @@
+"""
+Faceted navigation: a page of the objects tagged with a selection of
+ctags, along with the ctags refining the selection the most.
+
+The page, the total and the facets are all read from the same lazy
+``EXISTS`` filtered queryset, the facets being counted by a single
+grouped query on the tagged items of the matching objects. Results are
+cached when the ``CTAGS_FACET_CACHE`` setting is enabled, under a key
+including a generation bumped by every write of tagged items, as are
+those of ``get_objects`` and ``get_count``, which read the page and the
+total alone, and those of ``get_cloud`` and ``get_related_tags``.
+"""
+import hashlib
+from collections import namedtuple
+
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
+from django.db import router
+from django.db.models import Count
+from django.db.models.functions import Lower
+
+from ctags import settings
+from ctags.models import CTag
+from ctags.models import CTaggedItem
+from ctags.utils import get_queryset_and_model
+from ctags.utils import get_tag_list
+
+# Cache key of the generation of the tagged items, part of the keys of
+# the cached facets.
+GENERATION_CACHE_KEY = 'ctags.facets.generation'
+
+FacetPage = namedtuple('FacetPage', ('objects', 'count', 'facets'))
+
+
+def bump_generation():
+    """
+    Outdates all the cached facets, when the cache is enabled.
+    """
+    if not settings.CTAGS_FACET_CACHE:
+        return
+    try:
+        cache.incr(GENERATION_CACHE_KEY)
+    except ValueError:
+        cache.set(GENERATION_CACHE_KEY, 1, None)
+
+
+def item_changed(sender, **kwargs):
+    """
+    ``post_save`` and ``post_delete`` receiver of ``CTaggedItem``.
+    """
+    bump_generation()
+
+
+def _get_cache_key(kind, *parts):
+    """
+    Returns the cache key of a result depending on ``parts``, or None
+    when the cache is disabled.
+    """
+    if not settings.CTAGS_FACET_CACHE:
+        return None
+    return 'ctags.%s.%s' % (kind, hashlib.md5(repr((
+        cache.get_or_set(GENERATION_CACHE_KEY, 0, None),) + parts).encode(
+            'utf-8')).hexdigest())
+
+
+def _get_cached(key, compute):
+    """
+    Returns the result cached under ``key``, computing and caching it
+    when missing.
+    """
+    if key is None:
+        return compute()
+    result = cache.get(key)
+    if result is None:
+        result = compute()
+        cache.set(key, result, settings.CTAGS_FACET_CACHE_TIMEOUT)
+    return result
+
+
+def get_cloud(model, using=None, **kwargs):
+    """
+    ``CTag.objects.cloud_for_model``, cached when ``CTAGS_FACET_CACHE``
+    is enabled.
+    """
+    db = using or router.db_for_read(model)
+    key = _get_cache_key('cloud', model._meta.label_lower, db,
+                         sorted(kwargs.items()))
+    return _get_cached(key, lambda: CTag.objects.cloud_for_model(
+        model, using=db, **kwargs))
+
+
+def get_related_tags(ctags, model, using=None, **kwargs):
+    """
+    ``CTag.objects.related_for_model``, cached when ``CTAGS_FACET_CACHE``
+    is enabled.
+    """
+    ctags = list(get_tag_list(ctags))
+    db = using or router.db_for_read(CTaggedItem)
+    key = _get_cache_key('related', sorted(ctag.pk for ctag in ctags),
+                         model._meta.label_lower, db,
+                         sorted(kwargs.items()))
+    return _get_cached(key, lambda: CTag.objects.related_for_model(
+        ctags, model, using=db, **kwargs))
+
+
+def _get_selection(queryset_or_model, ctags, include_descendants, using):
+    """
+    Returns the selected ctags, the ordered queryset of the specified
+    model, the lazy queryset of its instances associated with all the
+    selected ctags, and the parts of the cache keys of the results read
+    from them.
+    """
+    selected = list(get_tag_list(ctags)) if ctags else []
+    queryset, model = get_queryset_and_model(queryset_or_model)
+    if using is not None:
+        queryset = queryset.using(using)
+    if not queryset.ordered:
+        # Pages need a stable order.
+        queryset = queryset.order_by('pk')
+    if ctags:
+        # No object matches a selection of unknown ctags.
+        matching = CTaggedItem.objects.get_by_model(
+            queryset, selected, include_descendants=include_descendants)
+    else:
+        matching = queryset
+    parts = ()
+    if settings.CTAGS_FACET_CACHE:
+        # The SQL is only compiled for the cache keys.
+        sql, params = queryset.query.get_compiler(queryset.db).as_sql()
+        parts = (queryset.db, sql, params,
+                 sorted(ctag.pk for ctag in selected), include_descendants)
+    return selected, queryset, matching, parts
+
+
+def get_objects(queryset_or_model, ctags, page=1, per_page=20,
+                include_descendants=False, using=None):
+    """
+    Returns the list of the ``page``-th ``per_page`` instances of the
+    specified model associated with all the given ctags, cached when
+    ``CTAGS_FACET_CACHE`` is enabled.
+    """
+    selected, queryset, matching, parts = _get_selection(
+        queryset_or_model, ctags, include_descendants, using)
+    offset = (page - 1) * per_page
+    return _get_cached(
+        _get_cache_key('objects', page, per_page, *parts),
+        lambda: list(matching[offset:offset + per_page]))
+
+
+def get_count(queryset_or_model, ctags, include_descendants=False,
+              using=None):
+    """
+    Returns the number of instances of the specified model associated
+    with all the given ctags, cached when ``CTAGS_FACET_CACHE`` is
+    enabled.
+    """
+    selected, queryset, matching, parts = _get_selection(
+        queryset_or_model, ctags, include_descendants, using)
+    return _get_cached(_get_cache_key('count', *parts), matching.count)
+
+
+def get_facets(queryset_or_model, ctags, page=1, per_page=20,
+               num_facets=10, include_descendants=False, using=None):
+    """
+    Returns a ``FacetPage`` of the ``page``-th ``per_page`` instances of
+    the specified model associated with all the given ctags, their total
+    ``count``, and the ``num_facets`` other ctags most associated with
+    them as ``facets``, each with a ``count`` attribute.
+    """
+    selected, queryset, matching, parts = _get_selection(
+        queryset_or_model, ctags, include_descendants, using)
+    model = queryset.model
+
+    key = _get_cache_key('facets', page, per_page, num_facets, *parts)
+    if key is not None:
+        result = cache.get(key)
+        if result is not None:
+            return result
+
+    offset = (page - 1) * per_page
+    content_type = ContentType.objects.db_manager(
+        queryset.db).get_for_model(model)
+    facets = CTag.objects.using(queryset.db).filter(
+        items__content_type=content_type.pk,
+        items__object_id__in=matching.order_by().values('pk'),
+    ).exclude(pk__in=[ctag.pk for ctag in selected]).annotate(
+        count=Count('items')).order_by('-count', Lower('name_en'))
+    result = FacetPage(list(matching[offset:offset + per_page]),
+                       matching.count(),
+                       list(facets[:num_facets]))
+    if key is not None:
+        cache.set(key, result, settings.CTAGS_FACET_CACHE_TIMEOUT)
+    return result
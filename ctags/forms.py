@@ -15,7 +15,8 @@ class TagAdminForm(forms.ModelForm):
         fields = ('approved_en', 'name_en',
                   'approved_ja', 'name_ja',
                   'approved_es', 'name_es',
-                  'approved_pt', 'name_pt',)
+                  'approved_pt', 'name_pt',
+                  'parent',)
 
 
 class TagField(forms.CharField):
@@ -4,20 +4,25 @@ Generic components for tagging.
 from django.contrib.contenttypes.models import ContentType
 
 
-def fetch_content_objects(tagged_items, select_related_for=None):
+def fetch_content_objects(tagged_items, select_related_for=None,
+                          using=None):
     """
     Retrieves ``ContentType`` and content objects for the given list of
     ``TaggedItems``, grouping the retrieval of content objects by model
     type to reduce the number of queries executed.
 
-    This results in ``number_of_content_types + 1`` queries rather than
-    the ``number_of_tagged_items * 2`` queries you'd get by iterating
-    over the list and accessing each item's ``object`` attribute.
+    This results in ``number_of_content_types`` queries, the content
+    types coming from the ``ContentType`` cache, rather than the
+    ``number_of_tagged_items * 2`` queries you'd get by iterating over
+    the list and accessing each item's ``object`` attribute.
 
     A ``select_related_for`` argument can be used to specify a list of
     of model names (corresponding to the ``model`` field of a
     ``ContentType``) for which ``select_related`` should be used when
     retrieving model instances.
+
+    The ``object`` of an item whose content object no longer exists, or
+    whose model is no longer installed, is ``None``.
     """
     if select_related_for is None:
         select_related_for = []
@@ -28,20 +33,26 @@ def fetch_content_objects(tagged_items, select_related_for=None):
         objects.setdefault(item.content_type_id, []).append(item.object_id)
 
     # Retrieve content types and content objects in bulk
-    content_types = ContentType._default_manager.in_bulk(objects.keys())
-    for content_type_pk, object_pks in objects.iteritems():
+    manager = ContentType.objects.db_manager(using)
+    content_types = {content_type_pk: manager.get_for_id(content_type_pk)
+                     for content_type_pk in objects}
+    for content_type_pk, object_pks in objects.items():
         model = content_types[content_type_pk].model_class()
+        if model is None:
+            # Stale content type.
+            objects[content_type_pk] = {}
+            continue
+        queryset = model._default_manager.db_manager(using).all()
         if content_types[content_type_pk].model in select_related_for:
-            objects[content_type_pk] = model._default_manager.select_related(
-                ).in_bulk(object_pks)
-        else:
-            objects[content_type_pk] = model._default_manager.in_bulk(
-                object_pks)
+            queryset = queryset.select_related()
+        objects[content_type_pk] = queryset.in_bulk(object_pks)
 
     # Set content types and content objects in the appropriate cache
     # attributes, so accessing the 'content_type' and 'object'
     # attributes on each tagged item won't result in further database
     # hits.
     for item in tagged_items:
-        item._object_cache = objects[item.content_type_id][item.object_id]
-        item._content_type_cache = content_types[item.content_type_id]
+        item._meta.get_field('content_type').set_cached_value(
+            item, content_types[item.content_type_id])
+        item._meta.get_field('object').set_cached_value(
+            item, objects[item.content_type_id].get(item.object_id))
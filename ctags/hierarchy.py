@@ -0,0 +1,144 @@
+"""
+Hierarchy of the ctags, such as "Brazil" under "South America".
+
+Each ctag may have a ``parent``. The ``CTagClosure`` table holds a row
+per ctag and each of its ancestors, itself included at depth 0, so that
+the descendants of ctags are found with a single indexed join. The rows
+are maintained by the receivers below as ctags are saved and deleted;
+``add_roots`` links the ctags created by ``bulk_create`` and ``rebuild``
+computes them again from the ``parent`` links, after writes which send
+no signals such as fixtures.
+"""
+from django.db import router
+from django.db import transaction
+from django.db.models import signals
+from django.dispatch import receiver
+from django.utils.translation import gettext as _
+
+from ctags.models import CTag
+from ctags.models import CTagClosure
+
+
+def get_descendants(ctag_ids):
+    """
+    Returns the subquery of the ids of the given ctags and of all their
+    descendants.
+    """
+    return CTagClosure.objects.filter(
+        ancestor__in=ctag_ids).values('descendant')
+
+
+def is_descendant(ctag_id, ancestor_id, using=None):
+    """
+    Returns whether the ``ctag_id`` ctag is the ``ancestor_id`` one or
+    one of its descendants.
+    """
+    return ctag_id == ancestor_id or CTagClosure.objects.using(using).filter(
+        ancestor=ancestor_id, descendant=ctag_id).exists()
+
+
+def move(ctag_id, parent_id, using=None):
+    """
+    Moves the subtree of a ctag under the ``parent_id`` ctag, or to the
+    root when it is ``None``, in the closure table only.
+    """
+    db = using or router.db_for_write(CTagClosure)
+    closure = CTagClosure.objects.using(db)
+    with transaction.atomic(using=db):
+        subtree = list(closure.filter(ancestor=ctag_id).values_list(
+            'descendant', 'depth'))
+        # Unlink the subtree from its former ancestors. The ids are
+        # read beforehand, MySQL refusing subqueries on the table a
+        # DELETE applies to.
+        closure.filter(
+            ancestor__in=list(closure.filter(
+                descendant=ctag_id, depth__gt=0).values_list(
+                    'ancestor', flat=True)),
+            descendant__in=[descendant for descendant, depth in subtree]
+        ).delete()
+        if parent_id is not None:
+            ancestors = list(closure.filter(descendant=parent_id).values_list(
+                'ancestor', 'depth'))
+            closure.bulk_create(
+                [CTagClosure(ancestor_id=ancestor, descendant_id=descendant,
+                             depth=ancestor_depth + depth + 1)
+                 for ancestor, ancestor_depth in ancestors
+                 for descendant, depth in subtree],
+                batch_size=1000)
+
+
+def add_roots(ctag_ids, using=None):
+    """
+    Links the given ctags, created without signals, to themselves in
+    the closure table, as roots.
+    """
+    db = using or router.db_for_write(CTagClosure)
+    CTagClosure.objects.using(db).bulk_create(
+        [CTagClosure(ancestor_id=pk, descendant_id=pk, depth=0)
+         for pk in ctag_ids],
+        batch_size=1000, ignore_conflicts=True)
+
+
+def rebuild(using=None):
+    """
+    Computes the whole closure table again from the ``parent`` links of
+    the ctags. Returns the number of rows.
+    """
+    db = using or router.db_for_write(CTagClosure)
+    parents = dict(CTag.objects.using(db).values_list('pk', 'parent_id'))
+    links = []
+    for ctag_id in parents:
+        ancestor, depth = ctag_id, 0
+        while ancestor is not None and depth <= len(parents):
+            links.append(CTagClosure(ancestor_id=ancestor,
+                                     descendant_id=ctag_id, depth=depth))
+            ancestor, depth = parents.get(ancestor), depth + 1
+    with transaction.atomic(using=db):
+        CTagClosure.objects.using(db).all().delete()
+        CTagClosure.objects.using(db).bulk_create(links, batch_size=1000)
+    return len(links)
+
+
+@receiver(signals.pre_save, sender=CTag)
+def check_parent(sender, instance, raw=False, using=None, **kwargs):
+    """
+    Refuses to make a ctag a descendant of itself, for the saves which
+    skipped the validation of ``CTag.clean``.
+    """
+    if raw or instance.pk is None or instance.parent_id is None:
+        return
+    if is_descendant(instance.parent_id, instance.pk, using):
+        raise ValueError(_('A ctag cannot be a descendant of itself.'))
+
+
+@receiver(signals.post_save, sender=CTag)
+def ctag_saved(sender, instance, created, raw=False, using=None, **kwargs):
+    if raw:
+        return
+    closure = CTagClosure.objects.using(using)
+    if created:
+        closure.create(ancestor=instance, descendant=instance, depth=0)
+        if instance.parent_id is not None:
+            move(instance.pk, instance.parent_id, using)
+        return
+    parent_id = closure.filter(descendant=instance.pk, depth=1).values_list(
+        'ancestor', flat=True).first()
+    if parent_id != instance.parent_id:
+        move(instance.pk, instance.parent_id, using)
+
+
+@receiver(signals.pre_delete, sender=CTag)
+def ctag_deleted(sender, instance, using=None, **kwargs):
+    """
+    Unlinks the descendants of a deleted ctag from its ancestors, as its
+    children become roots.
+    """
+    closure = CTagClosure.objects.using(using)
+    closure.filter(
+        ancestor__in=list(closure.filter(
+            descendant=instance.pk, depth__gt=0).values_list(
+                'ancestor', flat=True)),
+        descendant__in=list(closure.filter(
+            ancestor=instance.pk, depth__gt=0).values_list(
+                'descendant', flat=True))
+    ).delete()
@@ -0,0 +1,218 @@
+"""
+Instrumentation of the ctags managers.
+
+Every public method of ``TagManager`` and ``TaggedItemManager`` sends
+the ``manager_call`` signal once it returns, describing what it did.
+Nothing is measured while the signal has no receivers.
+"""
+import atexit
+import logging
+import threading
+import time
+from contextlib import ExitStack
+from functools import wraps
+
+from django.core.cache import cache
+from django.db import connections
+from django.db.models import Model
+from django.db.models.query import QuerySet
+from django.dispatch import Signal
+
+from ctags import settings
+
+logger = logging.getLogger('ctags.instrumentation')
+
+# Sent after each instrumented manager method call with the following
+# keyword arguments: ``method``, ``content_type``, ``arguments``,
+# ``queries``, ``rows`` and ``duration``.
+manager_call = Signal()
+
+_local = threading.local()
+
+
+def describe_argument(value):
+    """
+    Returns a short, data-free description of ``value``, suitable for
+    grouping calls by the shape of their arguments.
+    """
+    if isinstance(value, QuerySet):
+        return 'queryset:%s' % value.model._meta.label_lower
+    if isinstance(value, Model):
+        return 'instance:%s' % value._meta.label_lower
+    if isinstance(value, type) and issubclass(value, Model):
+        return 'model:%s' % value._meta.label_lower
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return '%s[%d]' % (type(value).__name__, len(value))
+    return type(value).__name__
+
+
+def content_type_label(args):
+    """
+    Returns the ``app_label.model`` label of the first model, instance
+    or queryset found in ``args``, or ``None``.
+    """
+    for value in args:
+        if isinstance(value, QuerySet):
+            return value.model._meta.label_lower
+        if isinstance(value, Model):
+            return value._meta.label_lower
+        if isinstance(value, type) and issubclass(value, Model):
+            return value._meta.label_lower
+    return None
+
+
+class QueryCounter(object):
+    """
+    Database execute wrapper counting the queries it lets through, also
+    used by ``ctags.budget``.
+    """
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def instrumented(method):
+    """
+    Decorator sending ``manager_call`` around a manager method.
+
+    Only the outermost instrumented call is reported, so queries issued
+    by ``usage_for_model`` through ``usage_for_queryset`` are counted
+    once.
+    """
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if (getattr(_local, 'active', False) or
+                not manager_call.has_listeners(sender=type(self))):
+            return method(self, *args, **kwargs)
+
+        counter = QueryCounter()
+        _local.active = True
+        start = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(counter))
+                result = method(self, *args, **kwargs)
+        finally:
+            _local.active = False
+        duration = time.perf_counter() - start
+
+        arguments = [describe_argument(value) for value in args]
+        arguments.extend('%s=%s' % (key, describe_argument(value))
+                         for key, value in sorted(kwargs.items()))
+        manager_call.send(
+            sender=type(self),
+            method=method.__name__,
+            content_type=content_type_label(args),
+            arguments=tuple(arguments),
+            queries=counter.count,
+            # Lazy querysets are not evaluated just to be counted.
+            rows=len(result) if isinstance(result, list) else None,
+            duration=duration,
+        )
+        return result
+    return wrapper
+
+
+def log_call(sender, method, content_type, arguments, queries, rows,
+             duration, **kwargs):
+    """
+    ``manager_call`` receiver logging every call at ``DEBUG`` level,
+    and calls slower than ``CTAGS_SLOW_CALL_THRESHOLD`` at ``WARNING``.
+    """
+    threshold = settings.CTAGS_SLOW_CALL_THRESHOLD
+    if threshold is not None and duration >= threshold:
+        level = logging.WARNING
+    else:
+        level = logging.DEBUG
+    logger.log(level, '%s.%s(%s) [%s]: %d queries, %s rows, %.2fms',
+               sender.__name__, method, ', '.join(arguments), content_type,
+               queries, rows, duration * 1000)
+
+
+class CallStats(object):
+    """
+    Aggregates ``manager_call`` signals per method and content type.
+
+    Aggregates are kept in-process and merged into the default cache
+    on the first call, every ``CTAGS_STATS_FLUSH_INTERVAL`` seconds
+    after it and when the process exits, so that the ``ctags_stats``
+    management command can report them for all the processes sharing
+    that cache. A per-process backend such as ``LocMemCache`` only
+    shows the command its own, empty, statistics.
+    """
+    cache_key = 'ctags.instrumentation.stats'
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.pending = {}
+        self.last_flush = None
+
+    def __call__(self, sender, method, content_type, queries, rows,
+                 duration, **kwargs):
+        key = '%s.%s %s' % (sender.__name__, method, content_type or '-')
+        threshold = settings.CTAGS_SLOW_CALL_THRESHOLD
+        with self.lock:
+            entry = self.pending.setdefault(key, self.empty_entry())
+            entry['calls'] += 1
+            entry['queries'] += queries
+            entry['rows'] += rows or 0
+            entry['time'] += duration
+            entry['max_time'] = max(entry['max_time'], duration)
+            if threshold is not None and duration >= threshold:
+                entry['slow'] += 1
+            due = (self.last_flush is None or
+                   time.monotonic() - self.last_flush >=
+                   settings.CTAGS_STATS_FLUSH_INTERVAL)
+        if due:
+            self.flush()
+
+    @staticmethod
+    def empty_entry():
+        return {'calls': 0, 'queries': 0, 'rows': 0, 'slow': 0,
+                'time': 0.0, 'max_time': 0.0}
+
+    @staticmethod
+    def merge(into, entries):
+        for key, entry in entries.items():
+            total = into.setdefault(key, CallStats.empty_entry())
+            for field in ('calls', 'queries', 'rows', 'slow', 'time'):
+                total[field] += entry[field]
+            total['max_time'] = max(total['max_time'], entry['max_time'])
+        return into
+
+    def flush(self):
+        """
+        Merges the pending aggregates into the cache.
+        """
+        with self.lock:
+            pending, self.pending = self.pending, {}
+            self.last_flush = time.monotonic()
+        if pending:
+            # Not atomic across processes, the figures are indicative.
+            cache.set(self.cache_key,
+                      self.merge(cache.get(self.cache_key, {}), pending),
+                      None)
+
+    def snapshot(self):
+        """
+        Returns the aggregates, flushed and pending, keyed by
+        ``'Manager.method app_label.model'``.
+        """
+        with self.lock:
+            pending = dict(self.pending)
+        return self.merge(self.merge({}, cache.get(self.cache_key, {})),
+                          pending)
+
+    def reset(self):
+        with self.lock:
+            self.pending = {}
+        cache.delete(self.cache_key)
+
+
+stats = CallStats()
+# The calls since the last flush would be lost otherwise.
+atexit.register(stats.flush)
@@ -0,0 +1,280 @@
+"""
+Load testing of the read paths of ctags: tagged object lists, tag
+clouds and tag detail pages, requested concurrently through Django's
+WSGI handler.
+
+``configure`` serves the pages of a tagged model from the
+``urlpatterns`` of this module. ``run`` requests them from a pool of
+threads or processes of ``django.test.Client``, each with its own
+database connection, and returns the throughput and latency
+percentiles. ``create_dataset`` tags the instances of the model with
+synthetic ctags beforehand.
+"""
+import math
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connections
+from django.db import router
+from django.http import HttpResponse
+from django.shortcuts import get_object_or_404
+from django.template import Context
+from django.template import Template
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import path
+
+from ctags import autotag
+from ctags import facets
+from ctags import hierarchy
+from ctags.models import CTag
+from ctags.models import CTaggedItem
+from ctags.views import TaggedObjectList
+
+# Prefix of the names of the synthetic ctags.
+PREFIX = 'loadtest-'
+
+LIST_TEMPLATE = Template("""
+<h1>{{ ctag }}</h1>
+<ul>{% for object in object_list %}<li>{{ object }}</li>{% endfor %}</ul>
+<ul>{% for related in related_tags %}
+<li>{{ related }} ({{ related.count }})</li>{% endfor %}</ul>
+""")
+
+CLOUD_TEMPLATE = """{% load ctags %}
+{% ctag_cloud_for_model [model] as cloud with steps=6 %}
+{% for ctag in cloud %}
+<a class="size-{{ ctag.font_size }}">{{ ctag }}</a>{% endfor %}
+"""
+
+DETAIL_TEMPLATE = Template("""
+<h1>{{ ctag }}</h1>
+<p>{{ page.count }}</p>
+<ul>{% for object in page.objects %}<li>{{ object }}</li>{% endfor %}</ul>
+<ul>{% for facet in page.facets %}
+<li>{{ facet }} ({{ facet.count }})</li>{% endfor %}</ul>
+<ul>{% for related in related_tags %}<li>{{ related }}</li>{% endfor %}</ul>
+""")
+
+urlpatterns = []
+
+_model = None
+_cloud_template = None
+
+
+class LoadTestObjectList(TaggedObjectList):
+    """
+    ``TaggedObjectList`` rendering an inline template.
+    """
+    paginate_by = 20
+    related_tags = True
+
+    def render_to_response(self, context, **kwargs):
+        return HttpResponse(LIST_TEMPLATE.render(Context(context)))
+
+
+def cloud(request):
+    return HttpResponse(_cloud_template.render(Context()))
+
+
+def detail(request, ctag):
+    ctag = get_object_or_404(CTag, pk=ctag)
+    return HttpResponse(DETAIL_TEMPLATE.render(Context({
+        'ctag': ctag,
+        'page': facets.get_facets(_model, [ctag]),
+        'related_tags': facets.get_related_tags([ctag], _model),
+    })))
+
+
+def configure(model):
+    """
+    Serves the pages of ``model`` from ``urlpatterns``.
+    """
+    global _model, _cloud_template
+    _model = model
+    _cloud_template = Template(CLOUD_TEMPLATE.replace(
+        '[model]', model._meta.label))
+    urlpatterns[:] = [
+        path('tags/<int:ctag>/', LoadTestObjectList.as_view(model=model),
+             name='ctags-loadtest-list'),
+        path('cloud/', cloud, name='ctags-loadtest-cloud'),
+        path('detail/<int:ctag>/', detail, name='ctags-loadtest-detail'),
+    ]
+
+
+def create_dataset(model, objects=1000, num_tags=200, tags_per_object=5,
+                   seed=0, using=None):
+    """
+    Tags the first ``objects`` instances of ``model`` with about
+    ``tags_per_object`` of ``num_tags`` synthetic ctags each, the first
+    ctags being the most used, like in real vocabularies, with
+    ``bulk_add_tags``. Returns the number of tagged items created.
+    """
+    db = using or router.db_for_write(CTaggedItem)
+    names = ['%s%04d' % (PREFIX, index) for index in range(num_tags)]
+    CTag.objects.using(db).bulk_create(
+        [CTag(name_en=name, name_ja=name + '-ja', name_es=name + '-es',
+              name_pt=name + '-pt')
+         for name in names],
+        ignore_conflicts=True)
+    tag_ids = list(CTag.objects.using(db).filter(
+        name_en__in=names).order_by('name_en').values_list('pk', flat=True))
+    # bulk_create sends no signals.
+    hierarchy.add_roots(tag_ids, db)
+    autotag.rebuild()
+
+    weights = [1.0 / (rank + 1) for rank in range(len(tag_ids))]
+    rng = random.Random(seed)
+    return CTag.objects.bulk_add_tags(
+        ((obj, set(rng.choices(tag_ids, weights, k=tags_per_object)))
+         for obj in model._default_manager.using(db).only(
+             'pk').order_by('pk')[:objects]),
+        using=db)
+
+
+def delete_dataset(using=None):
+    """
+    Deletes the synthetic ctags and their tagged items.
+    """
+    db = using or router.db_for_write(CTag)
+    CTag.objects.using(db).filter(name_en__startswith=PREFIX).delete()
+
+
+def get_paths(model, num_tags=20, requests=1000, seed=0, using=None):
+    """
+    Returns ``requests`` paths of a mix of list, cloud and detail pages
+    of the ``num_tags`` most used ctags of ``model``, as
+    ``(kind, path)`` tuples.
+    """
+    ctags = sorted(CTag.objects.usage_for_model(model, counts=True,
+                                                using=using),
+                   key=lambda ctag: -ctag.count)[:num_tags]
+    if not ctags:
+        raise ValueError('%s has no tagged instances.' % model._meta.label)
+    rng = random.Random(seed)
+    paths = []
+    for index in range(requests):
+        ctag = rng.choice(ctags)
+        kind = rng.choice(('list', 'list', 'cloud', 'detail'))
+        if kind == 'list':
+            page = 1
+            if ctag.count > LoadTestObjectList.paginate_by:
+                page = rng.choice((1, 1, 1, 2))
+            paths.append((kind, '/tags/%d/?page=%d' % (ctag.pk, page)))
+        elif kind == 'cloud':
+            paths.append((kind, '/cloud/'))
+        else:
+            paths.append((kind, '/detail/%d/' % ctag.pk))
+    return paths
+
+
+def _settings():
+    """
+    Returns the settings serving the pages of this module, without the
+    query log of ``DEBUG``.
+    """
+    return override_settings(
+        ROOT_URLCONF=__name__, DEBUG=False,
+        ALLOWED_HOSTS=list(settings.ALLOWED_HOSTS) + ['testserver'])
+
+
+def _request(paths):
+    """
+    Requests ``paths`` in turn, returning the kind, status code and
+    latency in seconds of each.
+    """
+    client = Client()
+    results = []
+    try:
+        for kind, url in paths:
+            start = time.perf_counter()
+            try:
+                status = client.get(url).status_code
+            except Exception:
+                status = None
+            results.append((kind, status, time.perf_counter() - start))
+    finally:
+        connections.close_all()
+    return results
+
+
+def _init_worker(model_label):
+    import django
+    from django.apps import apps
+
+    # Sets Django up again in the processes started rather than forked.
+    django.setup()
+    configure(apps.get_model(model_label))
+    _settings().enable()
+
+
+def percentile(values, fraction):
+    """
+    Returns the nearest-rank ``fraction`` percentile of the sorted list
+    ``values``.
+    """
+    return values[max(int(math.ceil(fraction * len(values))) - 1, 0)]
+
+
+def summarize(latencies):
+    """
+    Returns the count and latency percentiles, in milliseconds, of a list
+    of latencies in seconds.
+    """
+    if not latencies:
+        return {'count': 0}
+    latencies = sorted(latencies)
+    return {
+        'count': len(latencies),
+        'mean_ms': 1000 * sum(latencies) / len(latencies),
+        'p50_ms': 1000 * percentile(latencies, 0.5),
+        'p95_ms': 1000 * percentile(latencies, 0.95),
+        'p99_ms': 1000 * percentile(latencies, 0.99),
+        'max_ms': 1000 * latencies[-1],
+    }
+
+
+def run(model, paths, concurrency=8, processes=False):
+    """
+    Requests ``paths`` from ``concurrency`` threads, or processes, each
+    with its own client and database connection, and returns a report
+    of the throughput and latencies, overall and by kind of page.
+    """
+    label = model._meta.label
+    chunks = [paths[index::concurrency] for index in range(concurrency)]
+    configure(model)
+    if processes:
+        # The workers must not share the connections of this process.
+        connections.close_all()
+        pool = ProcessPoolExecutor(concurrency, initializer=_init_worker,
+                                   initargs=(label,))
+    else:
+        pool = ThreadPoolExecutor(concurrency)
+    with _settings():
+        start = time.perf_counter()
+        with pool:
+            results = [result for chunk in pool.map(_request, chunks)
+                       for result in chunk]
+        duration = time.perf_counter() - start
+
+    succeeded = [(kind, latency) for kind, status, latency in results
+                 if status == 200]
+    report = {
+        'model': label,
+        'database': connections[router.db_for_read(model)].vendor,
+        'workers': 'processes' if processes else 'threads',
+        'concurrency': concurrency,
+        'requests': len(results),
+        'errors': len(results) - len(succeeded),
+        'duration_s': duration,
+        'throughput_rps': len(results) / duration if duration else None,
+        'latency': summarize([latency for kind, latency in succeeded]),
+        'pages': {},
+    }
+    for kind in sorted(set(kind for kind, latency in succeeded)):
+        report['pages'][kind] = summarize(
+            [latency for other, latency in succeeded if other == kind])
+    return report
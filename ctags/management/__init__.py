@@ -0,0 +1,3 @@
+"""
+Management module for tagging.
+"""
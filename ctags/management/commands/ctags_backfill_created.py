@@ -0,0 +1,83 @@
+"""
+Fills in the ``created`` timestamp of the tagged items predating it.
+"""
+from django.contrib.contenttypes.models import ContentType
+from django.core.exceptions import FieldDoesNotExist
+from django.core.management.base import BaseCommand
+from django.core.management.base import CommandError
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models import OuterRef
+from django.db.models import Subquery
+from django.utils.dateparse import parse_datetime
+
+from ctags.models import CTaggedItem
+
+
+class Command(BaseCommand):
+    help = ('Fills in the created timestamp of the tagged items which have '
+            'none, from a date field of their objects or a fixed date.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--model', action='append', dest='models', default=[],
+            help='app_label.model.field: fills in the items of the model '
+                 'from the given field of their objects. Can be repeated.')
+        parser.add_argument(
+            '--default',
+            help='ISO 8601 date time given to the remaining items.')
+        parser.add_argument(
+            '--chunk-size', type=int, default=10000,
+            help='Number of rows updated per query.')
+        parser.add_argument(
+            '--database', default=DEFAULT_DB_ALIAS,
+            help='Database to update.')
+
+    def handle(self, **options):
+        self.db = options['database']
+        self.chunk_size = options['chunk_size']
+        items = CTaggedItem.objects.using(self.db).filter(
+            created__isnull=True)
+
+        for spec in options['models']:
+            try:
+                app_label, model_name, field = spec.lower().split('.')
+                content_type = ContentType.objects.db_manager(
+                    self.db).get_by_natural_key(app_label, model_name)
+            except (ValueError, ContentType.DoesNotExist):
+                raise CommandError('Invalid model field: %s' % spec)
+            model = content_type.model_class()
+            if model is None:
+                self.stdout.write('%s: skipped, model not installed' % spec)
+                continue
+            try:
+                model._meta.get_field(field)
+            except FieldDoesNotExist:
+                raise CommandError('Invalid model field: %s' % spec)
+            value = Subquery(model._base_manager.using(self.db).filter(
+                pk=OuterRef('object_id')).values(field)[:1])
+            updated = self.update(
+                items.filter(content_type=content_type), value)
+            self.stdout.write('%s: %d items' % (spec, updated))
+
+        if options['default']:
+            default = parse_datetime(options['default'])
+            if default is None:
+                raise CommandError(
+                    'Invalid date time: %s' % options['default'])
+            updated = self.update(items, default)
+            self.stdout.write('default: %d items' % updated)
+
+    def update(self, items, value):
+        """
+        Sets ``created`` to ``value`` on ``items``, a pk range at a time.
+        """
+        updated = 0
+        last_pk = 0
+        while True:
+            pks = list(items.filter(pk__gt=last_pk).order_by(
+                'pk').values_list('pk', flat=True)[:self.chunk_size])
+            if not pks:
+                return updated
+            updated += items.filter(
+                pk__gte=pks[0], pk__lte=pks[-1]).update(created=value)
+            last_pk = pks[-1]
@@ -0,0 +1,58 @@
+"""
+Checks the query budgets of the ctags APIs against the database.
+"""
+from django.apps import apps
+from django.core.management.base import BaseCommand
+from django.core.management.base import CommandError
+from django.db import DEFAULT_DB_ALIAS
+
+from ctags import budget
+from ctags.registry import registry
+
+
+class Command(BaseCommand):
+    help = ('Counts the queries of the ctags APIs on growing numbers of '
+            'tagged instances, failing when a count exceeds its budget '
+            'or grows with the number of instances.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--model', action='append', dest='models', default=[],
+            help='Only check this app_label.model, can be repeated. '
+                 'Defaults to the registered models.')
+        parser.add_argument(
+            '--sizes', default='1,10,100',
+            help='Comma separated numbers of instances.')
+        parser.add_argument(
+            '--database', default=DEFAULT_DB_ALIAS,
+            help='Database to use.')
+
+    def handle(self, **options):
+        models = [self.get_model(name) for name in options['models']]
+        sizes = [int(size) for size in options['sizes'].split(',')]
+        failed = []
+        for model in models or registry:
+            results = budget.check(model, sizes, options['database'])
+            if not results or len(results[0].counts) < 2:
+                self.stderr.write('%s: fewer than two sizes of tagged '
+                                  'instances, not checked.' %
+                                  model._meta.label)
+                continue
+            failures = budget.failures(results)
+            for result in results:
+                self.stdout.write('%-40s %-12s %3d  %s  %s' % (
+                    result.name, model._meta.label, result.budget,
+                    ' '.join('%3d' % count for count in result.counts),
+                    result in failures and 'FAILED' or 'ok'))
+            failed.extend(failures)
+        if failed:
+            raise CommandError('%d checks failed.' % len(failed))
+
+    def get_model(self, label):
+        """
+        Returns the model of the ``app_label.model`` ``label``.
+        """
+        try:
+            return apps.get_model(label)
+        except (LookupError, ValueError):
+            raise CommandError('Invalid model: %s' % label)
@@ -0,0 +1,51 @@
+"""
+Applies the retention and compaction of the ctag change log.
+"""
+from django.core.management.base import BaseCommand
+from django.core.management.base import CommandError
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models import Max
+from django.db.models import Min
+
+from ctags import changelog
+from ctags.models import CTagChange
+
+
+class Command(BaseCommand):
+    help = ('Deletes the ctag changes older than the retention period '
+            'and, optionally, those superseded by later changes.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days', type=int,
+            help='Delete the changes older than this number of days.')
+        parser.add_argument(
+            '--compact', action='store_true',
+            help='Delete the changes superseded by a later change of the '
+                 'same ctag on the same object.')
+        parser.add_argument(
+            '--upto', type=int,
+            help='Only compact the changes up to this id, usually the '
+                 'cursor of the slowest consumer.')
+        parser.add_argument(
+            '--chunk-size', type=int, default=10000,
+            help='Number of changes compacted per query.')
+        parser.add_argument(
+            '--database', default=DEFAULT_DB_ALIAS,
+            help='Database to use.')
+
+    def handle(self, **options):
+        db = options['database']
+        if options['days'] is not None:
+            if options['days'] < 0:
+                raise CommandError('--days must not be negative.')
+            self.stdout.write('Purged %d changes.' % changelog.purge(
+                options['days'], using=db))
+        if options['compact']:
+            self.stdout.write('Compacted %d changes.' % changelog.compact(
+                options['upto'], using=db,
+                chunk_size=options['chunk_size']))
+        log = CTagChange.objects.using(db).aggregate(
+            first=Min('id'), last=Max('id'))
+        self.stdout.write('%d changes left, ids %s to %s.' % (
+            CTagChange.objects.using(db).count(), log['first'], log['last']))
@@ -0,0 +1,124 @@
+"""
+Streams ctags, aliases and tagged items out as JSONL or CSV records.
+"""
+from django.contrib.contenttypes.models import ContentType
+from django.core.management.base import BaseCommand
+from django.core.management.base import CommandError
+from django.db import DEFAULT_DB_ALIAS
+
+from ctags.models import CTag
+from ctags.models import CTagAliasEn
+from ctags.models import CTaggedItem
+from ctags.transfer import FORMATS
+from ctags.transfer import TAG_FIELDS
+from ctags.transfer import Progress
+from ctags.transfer import guess_format
+from ctags.transfer import write_records
+
+
+class Command(BaseCommand):
+    help = 'Exports ctags, aliases and tagged items as JSONL or CSV.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'output', nargs='?', default='-',
+            help='File to write to, defaults to the standard output.')
+        parser.add_argument(
+            '--format', choices=FORMATS,
+            help='Record format, guessed from the output file by default.')
+        parser.add_argument(
+            '--records', default='tag,alias,item',
+            help='Comma separated record types to export.')
+        parser.add_argument(
+            '--model', action='append', dest='models', default=[],
+            help='Only export the items of this app_label.model, '
+                 'can be repeated.')
+        parser.add_argument(
+            '--chunk-size', type=int, default=5000,
+            help='Number of rows fetched per database round trip.')
+        parser.add_argument(
+            '--database', default=DEFAULT_DB_ALIAS,
+            help='Database to export from.')
+
+    def handle(self, **options):
+        output = options['output']
+        format = options['format'] or guess_format(output)
+        kinds = options['records'].split(',')
+        self.db = options['database']
+        self.chunk_size = options['chunk_size']
+        self.progress = Progress(self.stderr, verbose=options['verbosity'])
+        # Checked before anything is written.
+        content_types = [self.get_content_type(model)
+                         for model in options['models']]
+
+        if output == '-':
+            stream = self.stdout
+            # The records end their own lines.
+            stream.ending = ''
+        else:
+            stream = open(output, 'w', encoding='utf-8', newline='')
+        try:
+            records = []
+            if 'tag' in kinds:
+                records.append(self.tags())
+            if 'alias' in kinds:
+                records.append(self.aliases())
+            if 'item' in kinds:
+                records.append(self.items(content_types))
+            write_records(
+                (record for chunk in records for record in chunk),
+                stream, format)
+        finally:
+            if output != '-':
+                stream.close()
+        if options['verbosity']:
+            self.progress.report(final=True)
+
+    def get_content_type(self, label):
+        """
+        Returns the content type of the ``app_label.model`` ``label``.
+        """
+        try:
+            app_label, model_name = label.lower().split('.')
+            return ContentType.objects.db_manager(
+                self.db).get_by_natural_key(app_label, model_name)
+        except (ValueError, ContentType.DoesNotExist):
+            raise CommandError('Invalid model: %s' % label)
+
+    def tags(self):
+        queryset = CTag.objects.using(self.db).order_by('pk').values_list(
+            'parent__name_en', *TAG_FIELDS)
+        for values in queryset.iterator(chunk_size=self.chunk_size):
+            record = dict(zip(TAG_FIELDS, values[1:]))
+            record['type'] = 'tag'
+            record['parent'] = values[0]
+            self.progress.add('tag')
+            yield record
+
+    def aliases(self):
+        names = dict(CTag.objects.using(self.db).values_list('pk', 'name_en'))
+        queryset = CTagAliasEn.objects.using(self.db).order_by(
+            'pk').values_list('name', 'target')
+        for name, target in queryset.iterator(chunk_size=self.chunk_size):
+            if target not in names:
+                continue
+            self.progress.add('alias')
+            yield {'type': 'alias', 'name': name, 'target': names[target]}
+
+    def items(self, only_content_types):
+        content_types = {
+            content_type.pk: content_type.natural_key()
+            for content_type in ContentType.objects.db_manager(
+                self.db).all()}
+        queryset = CTaggedItem.objects.using(self.db).order_by('pk')
+        if only_content_types:
+            queryset = queryset.filter(content_type__in=only_content_types)
+        queryset = queryset.values_list(
+            'ctag__name_en', 'content_type_id', 'object_id', 'created')
+        for name, content_type_id, object_id, created in queryset.iterator(
+                chunk_size=self.chunk_size):
+            app_label, model = content_types[content_type_id]
+            self.progress.add('item')
+            yield {'type': 'item', 'ctag': name, 'app_label': app_label,
+                   'model': model, 'object_id': object_id,
+                   'created': created and created.isoformat()}
@@ -0,0 +1,101 @@
+"""
+Deletes the tagged items whose objects no longer exist.
+"""
+from django.contrib.contenttypes.models import ContentType
+from django.core.management.base import BaseCommand
+from django.core.management.base import CommandError
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models import Exists
+from django.db.models import OuterRef
+
+from ctags.models import CTaggedItem
+
+
+class Command(BaseCommand):
+    help = ('Deletes the CTaggedItem rows pointing to deleted objects, '
+            'scanning each content type in chunks ordered by pk.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Only report the orphaned rows, without deleting them.')
+        parser.add_argument(
+            '--model', action='append', dest='models', default=[],
+            help='Only scan the items of this app_label.model, '
+                 'can be repeated.')
+        parser.add_argument(
+            '--include-stale', action='store_true',
+            help='Also delete the items of content types whose model '
+                 'is no longer installed.')
+        parser.add_argument(
+            '--chunk-size', type=int, default=10000,
+            help='Number of rows scanned per query.')
+        parser.add_argument(
+            '--database', default=DEFAULT_DB_ALIAS,
+            help='Database to clean up.')
+
+    def handle(self, **options):
+        self.db = options['database']
+        self.chunk_size = options['chunk_size']
+        self.dry_run = options['dry_run']
+        content_types = ContentType.objects.db_manager(self.db).filter(
+            pk__in=CTaggedItem.objects.using(self.db).values(
+                'content_type').distinct())
+        if options['models']:
+            content_types = content_types.filter(pk__in=[
+                self.get_content_type(model).pk
+                for model in options['models']])
+
+        total = 0
+        for content_type in content_types.order_by('pk'):
+            model = content_type.model_class()
+            if model is None and not options['include_stale']:
+                self.stdout.write('%s.%s: skipped, model not installed' %
+                                  content_type.natural_key())
+                continue
+            scanned, orphans = self.collect(content_type, model)
+            total += orphans
+            self.stdout.write('%s.%s: %d orphans out of %d items' % (
+                content_type.natural_key() + (orphans, scanned)))
+        self.stdout.write('%s %d orphaned items.' % (
+            self.dry_run and 'Found' or 'Deleted', total))
+
+    def get_content_type(self, label):
+        """
+        Returns the content type of the ``app_label.model`` ``label``.
+        """
+        try:
+            app_label, model_name = label.lower().split('.')
+            return ContentType.objects.db_manager(
+                self.db).get_by_natural_key(app_label, model_name)
+        except (ValueError, ContentType.DoesNotExist):
+            raise CommandError('Invalid model: %s' % label)
+
+    def collect(self, content_type, model):
+        """
+        Scans the items of ``content_type`` chunk by chunk, deleting
+        those without object. Returns the numbers of scanned and of
+        orphaned items.
+        """
+        items = CTaggedItem.objects.using(self.db).filter(
+            content_type=content_type)
+        scanned = orphans = 0
+        last_pk = 0
+        while True:
+            pks = list(items.filter(pk__gt=last_pk).order_by(
+                'pk').values_list('pk', flat=True)[:self.chunk_size])
+            if not pks:
+                break
+            chunk = items.filter(pk__gte=pks[0], pk__lte=pks[-1])
+            if model is not None:
+                chunk = chunk.filter(~Exists(
+                    model._base_manager.using(self.db).filter(
+                        pk=OuterRef('object_id'))))
+            orphan_pks = list(chunk.values_list('pk', flat=True))
+            if orphan_pks and not self.dry_run:
+                CTaggedItem.objects.using(self.db).filter(
+                    pk__in=orphan_pks).delete()
+            scanned += len(pks)
+            orphans += len(orphan_pks)
+            last_pk = pks[-1]
+        return scanned, orphans
@@ -0,0 +1,38 @@
+"""
+Displays the hierarchy of the ctags, optionally rebuilding its closure
+table.
+"""
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS
+
+from ctags import hierarchy
+from ctags.models import CTag
+
+
+class Command(BaseCommand):
+    help = ('Lists the ctags as a tree, optionally computing the closure '
+            'table again from their parent links.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rebuild', action='store_true',
+            help='Compute the closure table again, after writes which '
+                 'sent no signals.')
+        parser.add_argument(
+            '--database', default=DEFAULT_DB_ALIAS,
+            help='Database to use.')
+
+    def handle(self, **options):
+        db = options['database']
+        if options['rebuild']:
+            count = hierarchy.rebuild(using=db)
+            self.stdout.write('Rebuilt %d closure rows.' % count)
+        children = {}
+        for ctag in CTag.objects.using(db).only('name_en', 'parent'):
+            children.setdefault(ctag.parent_id, []).append(ctag)
+        stack = [(ctag, 0) for ctag in reversed(children.get(None, []))]
+        while stack:
+            ctag, level = stack.pop()
+            self.stdout.write('%s%s' % ('  ' * level, ctag.name_en))
+            stack.extend((child, level + 1)
+                         for child in reversed(children.get(ctag.pk, [])))
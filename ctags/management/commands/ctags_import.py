@@ -0,0 +1,190 @@
+"""
+Loads ctags, aliases and tagged items from JSONL or CSV records, as
+written by ``ctags_export``.
+"""
+import sys
+
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.core.management.base import BaseCommand
+from django.core.management.base import CommandError
+from django.db import DEFAULT_DB_ALIAS
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from ctags import hierarchy
+from ctags.models import CTag
+from ctags.models import CTagAliasEn
+from ctags.models import CTaggedItem
+from ctags.transfer import FORMATS
+from ctags.transfer import TAG_FIELDS
+from ctags.transfer import Progress
+from ctags.transfer import guess_format
+from ctags.transfer import read_records
+
+
+class Command(BaseCommand):
+    help = ('Imports ctags, aliases and tagged items from JSONL or CSV. '
+            'Ctags are matched by name_en and content types by natural '
+            'key; existing rows are left untouched.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'input', nargs='?', default='-',
+            help='File to read from, defaults to the standard input.')
+        parser.add_argument(
+            '--format', choices=FORMATS,
+            help='Record format, guessed from the input file by default.')
+        parser.add_argument(
+            '--chunk-size', type=int, default=5000,
+            help='Number of rows inserted per transaction.')
+        parser.add_argument(
+            '--database', default=DEFAULT_DB_ALIAS,
+            help='Database to import into.')
+
+    def handle(self, **options):
+        input = options['input']
+        format = options['format'] or guess_format(input)
+        self.db = options['database']
+        self.chunk_size = options['chunk_size']
+        self.progress = Progress(self.stderr, verbose=options['verbosity'])
+        self.skipped = {}
+        self.tag_ids = dict(CTag.objects.using(self.db).values_list(
+            'name_en', 'pk'))
+        self.content_types = {}
+        self.pending = {'tag': [], 'alias': [], 'item': []}
+        # The parent names of the created ctags, linked once all the
+        # ctags are read.
+        self.parents = {}
+
+        if input == '-':
+            stream = sys.stdin
+        else:
+            stream = open(input, encoding='utf-8', newline='')
+        try:
+            for record in read_records(stream, format):
+                kind = record.get('type')
+                if kind not in self.pending:
+                    raise CommandError('Unknown record type: %r' % kind)
+                if kind != 'tag' and self.pending['tag']:
+                    # Aliases and items refer to the ctags read so far.
+                    self.flush('tag')
+                self.pending[kind].append(record)
+                if len(self.pending[kind]) >= self.chunk_size:
+                    self.flush(kind)
+            for kind in self.pending:
+                self.flush(kind)
+            self.link_parents()
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+
+        if options['verbosity']:
+            self.progress.report(final=True)
+            for reason, count in sorted(self.skipped.items()):
+                self.stderr.write('Skipped %d records: %s' % (count, reason))
+
+    def skip(self, reason):
+        self.skipped[reason] = self.skipped.get(reason, 0) + 1
+
+    def flush(self, kind):
+        records, self.pending[kind] = self.pending[kind], []
+        if not records:
+            return
+        create = {'tag': self.create_tags,
+                  'alias': self.create_aliases,
+                  'item': self.create_items}[kind]
+        with transaction.atomic(using=self.db):
+            # bulk_create sends no model signals.
+            create(records)
+        self.progress.add(kind, len(records))
+
+    def create_tags(self, records):
+        tags = [CTag(**{field: record[field] for field in TAG_FIELDS
+                        if field in record})
+                for record in records
+                if record['name_en'] not in self.tag_ids]
+        for record in records:
+            if (record.get('parent') is not None and
+                    record['name_en'] not in self.tag_ids):
+                self.parents[record['name_en']] = record['parent']
+        CTag.objects.using(self.db).bulk_create(
+            tags, ignore_conflicts=True)
+        created = dict(CTag.objects.using(self.db).filter(
+            name_en__in=[tag.name_en for tag in tags]).values_list(
+                'name_en', 'pk'))
+        self.tag_ids.update(created)
+        # bulk_create sends no signals.
+        hierarchy.add_roots(created.values(), self.db)
+
+    def link_parents(self):
+        """
+        Sets the parents of the created ctags, then computes the closure
+        table again.
+        """
+        tags = []
+        for name, parent in self.parents.items():
+            parent_id = self.tag_ids.get(parent)
+            if parent_id is None:
+                self.skip('unknown parent')
+                continue
+            tags.append(CTag(pk=self.tag_ids[name], parent_id=parent_id))
+        if not tags:
+            return
+        with transaction.atomic(using=self.db):
+            # bulk_update sends no signals.
+            CTag.objects.using(self.db).bulk_update(
+                tags, ['parent'], batch_size=self.chunk_size)
+            hierarchy.rebuild(self.db)
+
+    def create_aliases(self, records):
+        aliases = []
+        for record in records:
+            target = self.tag_ids.get(record['target'])
+            if target is None:
+                self.skip('unknown alias target')
+                continue
+            aliases.append(CTagAliasEn(name=record['name'], target=target))
+        CTagAliasEn.objects.using(self.db).bulk_create(
+            aliases, ignore_conflicts=True)
+
+    def get_content_type_id(self, app_label, model):
+        key = (app_label, model)
+        if key not in self.content_types:
+            try:
+                self.content_types[key] = ContentType.objects.db_manager(
+                    self.db).get_by_natural_key(app_label, model).pk
+            except ContentType.DoesNotExist:
+                self.content_types[key] = None
+        return self.content_types[key]
+
+    def create_items(self, records):
+        items = []
+        for record in records:
+            ctag_id = self.tag_ids.get(record['ctag'])
+            if ctag_id is None:
+                self.skip('unknown ctag')
+                continue
+            content_type_id = self.get_content_type_id(
+                record['app_label'], record['model'])
+            if content_type_id is None:
+                self.skip('unknown content type')
+                continue
+            created = record.get('created')
+            if created is not None:
+                try:
+                    created = parse_datetime(created)
+                except ValueError:
+                    created = None
+                if created is None:
+                    self.skip('invalid created timestamp')
+                    continue
+                if settings.USE_TZ and timezone.is_naive(created):
+                    created = timezone.make_aware(created)
+            # The original timestamp is kept, so that the trending scores
+            # decay from it.
+            items.append(CTaggedItem(
+                ctag_id=ctag_id, content_type_id=content_type_id,
+                object_id=record['object_id'], created=created))
+        CTag.objects.bulk_add_items(items, self.db, self.chunk_size)
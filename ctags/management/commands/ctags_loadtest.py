@@ -0,0 +1,99 @@
+"""
+Load tests the list, cloud and detail pages of a tagged model.
+"""
+import json
+
+from django.apps import apps
+from django.core.management.base import BaseCommand
+from django.core.management.base import CommandError
+from django.db import DEFAULT_DB_ALIAS
+
+from ctags import loadtest
+from ctags.registry import registry
+
+
+class Command(BaseCommand):
+    help = ('Requests the tagged object lists, tag clouds and tag detail '
+            'pages of a model concurrently through the WSGI handler, and '
+            'reports the throughput and latency percentiles as JSON.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--model',
+            help='app_label.model of the pages, the first registered model '
+                 'by default.')
+        parser.add_argument(
+            '--requests', type=int, default=1000,
+            help='Number of requests.')
+        parser.add_argument(
+            '--concurrency', type=int, default=8,
+            help='Number of clients requesting concurrently.')
+        parser.add_argument(
+            '--processes', action='store_true',
+            help='Run the clients in processes rather than threads.')
+        parser.add_argument(
+            '--warmup', type=int, default=50,
+            help='Number of requests made before measuring.')
+        parser.add_argument(
+            '--num', type=int, default=20,
+            help='Number of the most used ctags whose pages are requested.')
+        parser.add_argument(
+            '--create', type=int, metavar='OBJECTS',
+            help='Tag the first OBJECTS instances of the model with '
+                 'synthetic ctags first.')
+        parser.add_argument(
+            '--tags', type=int, default=200,
+            help='Number of synthetic ctags.')
+        parser.add_argument(
+            '--tags-per-object', type=int, default=5,
+            help='Number of synthetic ctags per instance.')
+        parser.add_argument(
+            '--delete', action='store_true',
+            help='Delete the synthetic ctags and their items afterwards.')
+        parser.add_argument(
+            '--seed', type=int, default=0,
+            help='Seed of the synthetic data and of the requests.')
+        parser.add_argument(
+            '--database', default=DEFAULT_DB_ALIAS,
+            help='Database the synthetic data is written to.')
+
+    def handle(self, **options):
+        if options['model']:
+            model = self.get_model(options['model'])
+        elif registry:
+            model = registry[0]
+        else:
+            raise CommandError('No model is registered.')
+        db = options['database']
+
+        if options['create']:
+            count = loadtest.create_dataset(
+                model, options['create'], options['tags'],
+                options['tags_per_object'], options['seed'], db)
+            self.stderr.write('Created %d tagged items.' % count)
+        try:
+            try:
+                paths = loadtest.get_paths(
+                    model, options['num'],
+                    options['warmup'] + options['requests'], options['seed'])
+            except ValueError as e:
+                raise CommandError(e)
+            if options['warmup']:
+                loadtest.run(model, paths[:options['warmup']],
+                             options['concurrency'], options['processes'])
+            report = loadtest.run(model, paths[options['warmup']:],
+                                  options['concurrency'],
+                                  options['processes'])
+        finally:
+            if options['delete']:
+                loadtest.delete_dataset(db)
+        self.stdout.write(json.dumps(report, indent=2, sort_keys=True))
+
+    def get_model(self, label):
+        """
+        Returns the model of the ``app_label.model`` ``label``.
+        """
+        try:
+            return apps.get_model(label)
+        except (LookupError, ValueError):
+            raise CommandError('Invalid model: %s' % label)
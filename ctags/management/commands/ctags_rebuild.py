@@ -0,0 +1,62 @@
+"""
+Rebuilds data derived from the tagged items in a pool of processes.
+"""
+from django.core.management.base import BaseCommand
+from django.core.management.base import CommandError
+from django.db import DEFAULT_DB_ALIAS
+
+from ctags import rebuild
+
+
+class Command(BaseCommand):
+    help = ('Rebuilds data derived from the tagged items, such as the '
+            'trending scores, mapping partitions of the items in parallel.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'rebuilder',
+            help='Name of a rebuilder (%s, or one of the CTAGS_REBUILDERS '
+                 'setting) or dotted path of a Rebuilder class.' %
+                 ', '.join(sorted(rebuild.REBUILDERS)))
+        parser.add_argument(
+            '--workers', type=int,
+            help='Number of worker processes, the number of CPUs by '
+                 'default. 1 runs in this process.')
+        parser.add_argument(
+            '--partition-size', type=int, default=100000,
+            help='Number of items per partition.')
+        parser.add_argument(
+            '--state',
+            help='File recording the partitions done, '
+                 'ctags-rebuild-<rebuilder>.state by default.')
+        parser.add_argument(
+            '--resume', action='store_true',
+            help='Resume the interrupted run recorded in the state file.')
+        parser.add_argument(
+            '--database', default=DEFAULT_DB_ALIAS,
+            help='Database to use.')
+
+    def handle(self, **options):
+        name = options['rebuilder']
+        try:
+            rebuild.get_rebuilder(name)
+        except ImportError:
+            raise CommandError('Unknown rebuilder: %s' % name)
+        state = options['state'] or 'ctags-rebuild-%s.state' % name
+        verbose = options['verbosity'] > 0
+
+        def progress(done, total):
+            if verbose:
+                self.stderr.write('%d/%d partitions' % (done, total))
+
+        try:
+            result = rebuild.run(
+                name, using=options['database'], workers=options['workers'],
+                partition_size=options['partition_size'], state=state,
+                resume=options['resume'], progress=progress)
+        except ValueError as e:
+            raise CommandError(e)
+        if isinstance(result, int):
+            self.stdout.write('Rebuilt %s: %d.' % (name, result))
+        else:
+            self.stdout.write('Rebuilt %s: %d entries.' % (name, len(result)))
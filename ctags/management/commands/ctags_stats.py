@@ -0,0 +1,38 @@
+"""
+Reports the call statistics aggregated by ``ctags.instrumentation.stats``.
+"""
+import json
+
+from django.core.management.base import BaseCommand
+
+from ctags.instrumentation import stats
+
+
+class Command(BaseCommand):
+    help = 'Dumps the aggregated statistics of the ctags manager calls.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--json', action='store_true',
+            help='Output the statistics as JSON.')
+        parser.add_argument(
+            '--reset', action='store_true',
+            help='Clear the statistics once reported.')
+
+    def handle(self, **options):
+        snapshot = stats.snapshot()
+        if options['json']:
+            self.stdout.write(json.dumps(snapshot, indent=2, sort_keys=True))
+        else:
+            self.stdout.write('%-60s %8s %8s %8s %6s %10s %10s' % (
+                'call', 'calls', 'queries', 'rows', 'slow',
+                'avg ms', 'max ms'))
+            ordered = sorted(snapshot.items(),
+                             key=lambda item: item[1]['time'], reverse=True)
+            for key, entry in ordered:
+                self.stdout.write('%-60s %8d %8d %8d %6d %10.2f %10.2f' % (
+                    key, entry['calls'], entry['queries'], entry['rows'],
+                    entry['slow'], entry['time'] * 1000 / entry['calls'],
+                    entry['max_time'] * 1000))
+        if options['reset']:
+            stats.reset()
@@ -0,0 +1,46 @@
+"""
+Reports or rebuilds the trending scores of the ctags.
+"""
+from django.apps import apps
+from django.core.management.base import BaseCommand
+from django.core.management.base import CommandError
+from django.db import DEFAULT_DB_ALIAS
+
+from ctags import trending
+from ctags.models import CTag
+
+
+class Command(BaseCommand):
+    help = 'Lists the trending ctags, optionally rebuilding their scores.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rebuild', action='store_true',
+            help='Compute all the scores again from the tagged items.')
+        parser.add_argument(
+            '--model',
+            help='Only consider the items of this app_label.model.')
+        parser.add_argument(
+            '--num', type=int, default=20,
+            help='Number of ctags listed.')
+        parser.add_argument(
+            '--database', default=DEFAULT_DB_ALIAS,
+            help='Database to use.')
+
+    def handle(self, **options):
+        model = options['model'] and self.get_model(options['model'])
+        if options['rebuild']:
+            count = trending.rebuild(using=options['database'])
+            self.stdout.write('Rebuilt %d scores.' % count)
+        for ctag in CTag.objects.trending(model, options['num'],
+                                          using=options['database']):
+            self.stdout.write('%10.2f  %s' % (ctag.score, ctag.name_en))
+
+    def get_model(self, label):
+        """
+        Returns the model of the ``app_label.model`` ``label``.
+        """
+        try:
+            return apps.get_model(label)
+        except (LookupError, ValueError):
+            raise CommandError('Invalid model: %s' % label)
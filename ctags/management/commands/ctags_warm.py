@@ -0,0 +1,144 @@
+"""
+Fills the caches of ``ctags.facets`` after a deploy.
+"""
+import time
+from concurrent.futures import FIRST_COMPLETED
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import wait
+
+from django.apps import apps
+from django.core.management.base import BaseCommand
+from django.core.management.base import CommandError
+from django.db import DEFAULT_DB_ALIAS
+from django.db import connections
+
+from ctags import facets
+from ctags import settings
+from ctags.registry import registry
+
+
+class Command(BaseCommand):
+    help = ('Computes the tag clouds of the registered models, then the '
+            'related ctags, facets, count and first listing page of their '
+            'most used ctags, into the cache.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--model', action='append', dest='models', default=[],
+            help='Only warm this app_label.model, can be repeated. '
+                 'Defaults to the registered models.')
+        parser.add_argument(
+            '--num', type=int, default=20,
+            help='Number of the most used ctags of each model warmed.')
+        parser.add_argument(
+            '--per-page', type=int, default=20,
+            help='Number of objects of the listing pages.')
+        parser.add_argument(
+            '--workers', type=int, default=4,
+            help='Number of queries run concurrently.')
+        parser.add_argument(
+            '--budget', type=float, default=60,
+            help='Number of seconds after which no query is started.')
+        parser.add_argument(
+            '--database', default=DEFAULT_DB_ALIAS,
+            help='Database to use.')
+
+    def handle(self, **options):
+        if not settings.CTAGS_FACET_CACHE:
+            raise CommandError('The CTAGS_FACET_CACHE setting is disabled, '
+                               'there is no cache to warm.')
+        self.db = options['database']
+        self.verbosity = options['verbosity']
+        self.deadline = time.monotonic() + options['budget']
+        models = [self.get_model(name) for name in options['models']]
+        self.counts = {'warmed': 0, 'skipped': 0, 'failed': 0}
+
+        with ThreadPoolExecutor(options['workers']) as pool:
+            # The clouds come first, their counts ranking the ctags.
+            clouds = self.run(pool, [
+                (facets.get_cloud, (model,), {'using': self.db})
+                for model in models or registry])
+            # Then the most used ctags of all the models, one rank after
+            # the other.
+            tops = [(model, sorted(cloud, key=lambda ctag: -ctag.count)[
+                :options['num']]) for model, cloud in clouds]
+            tasks = []
+            for rank in range(options['num']):
+                for model, ctags in tops:
+                    if rank < len(ctags):
+                        tasks.extend([
+                            (facets.get_related_tags, ([ctags[rank]], model),
+                             {'counts': True, 'using': self.db}),
+                            (facets.get_facets, (model, [ctags[rank]]),
+                             {'per_page': options['per_page'],
+                              'using': self.db}),
+                            # Read by TaggedObjectList.
+                            (facets.get_count, (model, [ctags[rank]]),
+                             {'using': self.db}),
+                            (facets.get_objects, (model, [ctags[rank]]),
+                             {'per_page': options['per_page'],
+                              'using': self.db}),
+                        ])
+            self.run(pool, tasks)
+
+        self.stdout.write('%(warmed)d warmed, %(skipped)d skipped, '
+                          '%(failed)d failed.' % self.counts)
+
+    def get_model(self, label):
+        """
+        Returns the model of the ``app_label.model`` ``label``.
+        """
+        try:
+            return apps.get_model(label)
+        except (LookupError, ValueError):
+            raise CommandError('Invalid model: %s' % label)
+
+    def call(self, func, args, kwargs):
+        """
+        Runs a task in a worker thread, unless the budget is spent.
+        """
+        if time.monotonic() >= self.deadline:
+            return False, None
+        try:
+            return True, func(*args, **kwargs)
+        finally:
+            # The connection belongs to the worker thread.
+            connections[self.db].close()
+
+    def run(self, pool, tasks):
+        """
+        Runs ``tasks`` on ``pool``, returning the list of the first
+        argument and result of each task which completed.
+        """
+        futures = {pool.submit(self.call, *task): task for task in tasks}
+        results = []
+        pending = set(futures)
+        while pending:
+            timeout = self.deadline - time.monotonic()
+            done, pending = wait(pending, max(timeout, 0),
+                                 return_when=FIRST_COMPLETED)
+            for future in done:
+                task = futures[future]
+                try:
+                    ran, result = future.result()
+                except Exception as e:
+                    self.counts['failed'] += 1
+                    self.stderr.write('%s%r: %s' % (
+                        task[0].__name__, task[1], e))
+                    continue
+                if ran:
+                    self.counts['warmed'] += 1
+                    results.append((task[1][0], result))
+                    if self.verbosity > 1:
+                        self.stdout.write('%s%r' % (
+                            task[0].__name__, task[1]))
+                else:
+                    self.counts['skipped'] += 1
+            if timeout <= 0:
+                # The tasks not started yet are dropped; those running
+                # complete when the pool shuts down.
+                for future in pending:
+                    if future.cancel():
+                        self.counts['skipped'] += 1
+                break
+        return results
@@ -3,7 +3,10 @@ Custom managers for tagging.
 """
 from django.contrib.contenttypes.models import ContentType
 from django.db import models
+from django.db import router
+from django.db.models import F
 
+from ctags.facets import get_facets
 from ctags.models import CTag
 from ctags.models import CTaggedItem
 
@@ -27,27 +30,59 @@ class ModelTagManager(models.Manager):
         return CTag.objects.usage_for_model(self.model, *args, **kwargs)
 
 
-class ModelTaggedItemManager(models.Manager):
+class CTagQuerySetMixin(object):
+    """
+    Filters and annotations of the instances of a model by their tags,
+    which can be chained with any other ``QuerySet`` method.
+    """
+    def with_tags(self, tags, include_descendants=False):
+        return CTaggedItem.objects.get_by_model(
+            self, tags, include_descendants=include_descendants)
+
+    def with_any_tags(self, tags, include_descendants=False):
+        return CTaggedItem.objects.get_union_by_model(
+            self, tags, include_descendants=include_descendants)
+
+    def without_tags(self, tags, include_descendants=False):
+        return CTaggedItem.objects.exclude_by_model(
+            self, tags, include_descendants=include_descendants)
+
+    def annotate_tag_count(self, tags=None, name='tag_count'):
+        return CTaggedItem.objects.annotate_tag_count(self, tags, name)
+
+    def facets(self, tags, **kwargs):
+        return get_facets(self, tags, **kwargs)
+
+
+class CTagQuerySet(CTagQuerySetMixin, models.QuerySet):
+    pass
+
+
+class ModelTaggedItemManager(models.Manager.from_queryset(CTagQuerySet)):
     """
     A manager for retrieving model instances based on their tags.
     """
-    def related_to(self, obj, queryset=None, num=None):
+    def related_to(self, obj, queryset=None, num=None, using=None):
         if queryset is None:
-            return CTaggedItem.objects.get_related(obj, self.model, num=num)
-        else:
-            return CTaggedItem.objects.get_related(obj, queryset, num=num)
+            queryset = self.model
+        return CTaggedItem.objects.get_related(
+            obj, queryset, num=num, using=using or self._db)
 
-    def with_all(self, tags, queryset=None):
+    def with_all(self, tags, queryset=None, using=None,
+                 include_descendants=False):
         if queryset is None:
-            return CTaggedItem.objects.get_by_model(self.model, tags)
-        else:
-            return CTaggedItem.objects.get_by_model(queryset, tags)
+            queryset = self.model
+        return CTaggedItem.objects.get_by_model(
+            queryset, tags, using=using or self._db,
+            include_descendants=include_descendants)
 
-    def with_any(self, tags, queryset=None):
+    def with_any(self, tags, queryset=None, using=None,
+                 include_descendants=False):
         if queryset is None:
-            return CTaggedItem.objects.get_union_by_model(self.model, tags)
-        else:
-            return CTaggedItem.objects.get_union_by_model(queryset, tags)
+            queryset = self.model
+        return CTaggedItem.objects.get_union_by_model(
+            queryset, tags, using=using or self._db,
+            include_descendants=include_descendants)
 
 
 class TagDescriptor(object):
@@ -61,6 +96,10 @@ class TagDescriptor(object):
             tag_manager = ModelTagManager()
             tag_manager.model = owner
             return tag_manager
+        elif isinstance(getattr(owner, 'ctags', None),
+                        RelatedCTagDescriptor):
+            # Served by prefetch_related('ctags') when used.
+            return instance.ctags.all()
         else:
             return CTag.objects.get_for_object(instance)
 
@@ -69,3 +108,66 @@ class TagDescriptor(object):
 
     def __delete__(self, instance):
         CTag.objects.update_tags(instance, None)
+
+
+class RelatedCTagManager(models.Manager):
+    """
+    A manager of the ctags of a model instance, which supports
+    ``prefetch_related``.
+    """
+    def __init__(self, instance, cache_name):
+        super(RelatedCTagManager, self).__init__()
+        self.model = CTag
+        self.instance = instance
+        self.cache_name = cache_name
+
+    def _apply_rel_filters(self, queryset):
+        db = self._db or router.db_for_read(CTag, instance=self.instance)
+        ctype = ContentType.objects.db_manager(db).get_for_model(
+            self.instance)
+        return queryset.using(db).filter(items__content_type=ctype.pk,
+                                         items__object_id=self.instance.pk)
+
+    def get_queryset(self):
+        try:
+            return self.instance._prefetched_objects_cache[self.cache_name]
+        except (AttributeError, KeyError):
+            return self._apply_rel_filters(
+                super(RelatedCTagManager, self).get_queryset())
+
+    def get_prefetch_queryset(self, instances, queryset=None):
+        if queryset is None:
+            queryset = super(RelatedCTagManager, self).get_queryset()
+        queryset._add_hints(instance=instances[0])
+        queryset = queryset.using(queryset._db or self._db)
+        ctype = ContentType.objects.db_manager(queryset.db).get_for_model(
+            instances[0])
+        # A single query joining the items, each ctag being returned
+        # once per object it is associated with.
+        queryset = queryset.filter(
+            items__content_type=ctype.pk,
+            items__object_id__in={obj.pk for obj in instances}).annotate(
+                _prefetch_object_id=F('items__object_id'))
+        return (queryset,
+                lambda ctag: ctag._prefetch_object_id,
+                lambda obj: obj.pk,
+                False,
+                self.cache_name,
+                False)
+
+    def get_prefetch_querysets(self, instances, querysets=None):
+        return self.get_prefetch_queryset(
+            instances, querysets[0] if querysets else None)
+
+
+class RelatedCTagDescriptor(object):
+    """
+    A descriptor providing a ``RelatedCTagManager`` for model instances.
+    """
+    def __init__(self, name):
+        self.name = name
+
+    def __get__(self, instance, owner):
+        if instance is None:
+            return self
+        return RelatedCTagManager(instance, self.name)
@@ -0,0 +1,26 @@
+# Generated by Django 4.1.13 on 2026-10-19 10:22
+
+from django.db import migrations, models
+import django.db.models.functions.text
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ctags', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='ctag',
+            index=models.Index(django.db.models.functions.text.Lower('name_en'), name='ctags_ctag_lower_name_en'),
+        ),
+        migrations.AddIndex(
+            model_name='ctaggeditem',
+            index=models.Index(fields=['content_type', 'object_id', 'ctag'], name='ctags_item_ct_object_ctag'),
+        ),
+        migrations.AddIndex(
+            model_name='ctaggeditem',
+            index=models.Index(fields=['content_type', 'ctag', 'object_id'], name='ctags_item_ct_ctag_object'),
+        ),
+    ]
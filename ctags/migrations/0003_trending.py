@@ -0,0 +1,50 @@
+# Generated by Django 4.1.13 on 2026-10-19 10:29
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('ctags', '0002_composite_indexes'),
+    ]
+
+    operations = [
+        # Added without default first, so that existing rows stay null
+        # until backfilled rather than all getting the migration's date.
+        migrations.AddField(
+            model_name='ctaggeditem',
+            name='created',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='created'),
+        ),
+        migrations.AlterField(
+            model_name='ctaggeditem',
+            name='created',
+            field=models.DateTimeField(blank=True, default=django.utils.timezone.now, editable=False, null=True, verbose_name='created'),
+        ),
+        migrations.CreateModel(
+            name='CTagTrend',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('log_score', models.FloatField(verbose_name='log score')),
+                ('last_used', models.DateTimeField(verbose_name='last used')),
+                ('content_type', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='contenttypes.contenttype', verbose_name='content type')),
+                ('ctag', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='trends', to='ctags.ctag', verbose_name='ctag')),
+            ],
+            options={
+                'verbose_name': 'ctag trend',
+                'verbose_name_plural': 'ctag trends',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='ctagtrend',
+            index=models.Index(fields=['content_type', 'log_score'], name='ctags_trend_ct_score'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='ctagtrend',
+            unique_together={('ctag', 'content_type')},
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 4.1.13 on 2026-10-19 10:31
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('ctags', '0003_trending'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CTagChange',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('object_id', models.PositiveIntegerField(verbose_name='object id')),
+                ('ctag_id', models.PositiveIntegerField(verbose_name='ctag id')),
+                ('added', models.BooleanField(verbose_name='added')),
+                ('created', models.DateTimeField(db_index=True, default=django.utils.timezone.now, verbose_name='created')),
+                ('content_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='contenttypes.contenttype', verbose_name='content type')),
+            ],
+            options={
+                'verbose_name': 'ctag change',
+                'verbose_name_plural': 'ctag changes',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='ctagchange',
+            index=models.Index(fields=['content_type', 'object_id', 'ctag_id'], name='ctags_change_object_ctag'),
+        ),
+    ]
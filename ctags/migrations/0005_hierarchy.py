@@ -0,0 +1,54 @@
+# Generated by Django 4.1.13 on 2026-10-19 10:39
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def add_closure_roots(apps, schema_editor):
+    """
+    Existing ctags are roots, linked to themselves only.
+    """
+    CTag = apps.get_model('ctags', 'CTag')
+    CTagClosure = apps.get_model('ctags', 'CTagClosure')
+    db = schema_editor.connection.alias
+    CTagClosure.objects.using(db).bulk_create(
+        [CTagClosure(ancestor_id=pk, descendant_id=pk, depth=0)
+         for pk in CTag.objects.using(db).values_list('pk', flat=True)],
+        batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ctags', '0004_changelog'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ctag',
+            name='parent',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='children', to='ctags.ctag', verbose_name='parent'),
+        ),
+        migrations.CreateModel(
+            name='CTagClosure',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('depth', models.PositiveSmallIntegerField(verbose_name='depth')),
+                ('ancestor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='descendant_links', to='ctags.ctag', verbose_name='ancestor')),
+                ('descendant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ancestor_links', to='ctags.ctag', verbose_name='descendant')),
+            ],
+            options={
+                'verbose_name': 'ctag closure',
+                'verbose_name_plural': 'ctag closures',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='ctagclosure',
+            index=models.Index(fields=['descendant', 'depth'], name='ctags_closure_descendant'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='ctagclosure',
+            unique_together={('ancestor', 'descendant')},
+        ),
+        migrations.RunPython(add_closure_roots, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.1.13 on 2026-10-19 10:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ctags', '0005_hierarchy'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='ctaggeditem',
+            index=models.Index(fields=['ctag', 'id'], name='ctags_item_ctag_id'),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 4.1.13 on 2026-10-19 11:10
+
+import math
+
+from django.db import migrations, models
+
+
+def merge_duplicate_trends(apps, schema_editor):
+    """
+    Merges the scores of the ctags having several rows for all the
+    content types into one, so that the constraint can be added.
+    """
+    CTagTrend = apps.get_model('ctags', 'CTagTrend')
+    db = schema_editor.connection.alias
+    trends = CTagTrend.objects.using(db).filter(content_type=None)
+    duplicated = trends.values('ctag').annotate(
+        rows=models.Count('pk')).filter(rows__gt=1).values_list(
+            'ctag', flat=True)
+    for ctag_id in list(duplicated):
+        rows = list(trends.filter(ctag=ctag_id).order_by('pk'))
+        kept = rows[0]
+        for row in rows[1:]:
+            high, low = sorted((kept.log_score, row.log_score), reverse=True)
+            kept.log_score = high + math.log1p(math.exp(low - high))
+            kept.last_used = max(kept.last_used, row.last_used)
+        kept.save(update_fields=['log_score', 'last_used'])
+        trends.filter(pk__in=[row.pk for row in rows[1:]]).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ctags', '0006_mixed_pages'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_trends,
+                             migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='ctagtrend',
+            constraint=models.UniqueConstraint(condition=models.Q(('content_type', None)), fields=('ctag',), name='ctags_trend_ctag_all'),
+        ),
+    ]
@@ -1,24 +1,83 @@
 """
 Models and managers for tagging.
 """
+import math
+
+from asgiref.sync import sync_to_async
 from django.contrib.contenttypes.fields import GenericForeignKey
 from django.contrib.contenttypes.models import ContentType
-from django.db import connection
+from django.core.exceptions import ValidationError
+from django.db import close_old_connections
+from django.db import connections
 from django.db import models
+from django.db import router
+from django.db import transaction
+from django.db.models import Case
+from django.db.models import Count
+from django.db.models import Exists
+from django.db.models import FloatField
+from django.db.models import OuterRef
+from django.db.models import Subquery
+from django.db.models import Sum
+from django.db.models import Value
+from django.db.models import When
+from django.db.models.functions import Cast
+from django.db.models.functions import Coalesce
 from django.db.models.functions import Lower
+from django.db.models.functions import Mod
 from django.db.models.query_utils import Q
 #from django.db.utils import IntegrityError
+from django.utils import timezone
 from django.utils.encoding import smart_str
 from django.utils.translation import gettext as _
 
 from ctags import settings
+from ctags.generic import fetch_content_objects
+from ctags.instrumentation import instrumented
 from ctags.utils import LOGARITHMIC
 from ctags.utils import calculate_cloud
 from ctags.utils import get_queryset_and_model
+from ctags.utils import get_tag
 from ctags.utils import get_tag_list
 
 
-qn = connection.ops.quote_name
+def _get_queryset_and_model(queryset_or_model, using=None):
+    """
+    ``get_queryset_and_model`` with the queryset bound to ``using``
+    when given, so its ``db`` is the alias raw queries must run on.
+    """
+    queryset, model = get_queryset_and_model(queryset_or_model)
+    if using is not None:
+        queryset = queryset.using(using)
+    return queryset, model
+
+
+def _read_in_thread(func):
+    """
+    Wraps the blocking read ``func`` for use in async code.
+
+    Unless ``CTAGS_ASYNC_CONCURRENT_READS`` is disabled, each call runs
+    in a worker thread with its own database connection, so that
+    independent reads awaited together, with ``asyncio.gather`` for
+    instance, run concurrently.
+    """
+    if not settings.CTAGS_ASYNC_CONCURRENT_READS:
+        return sync_to_async(func)
+
+    def read(*args, **kwargs):
+        try:
+            return func(*args, **kwargs)
+        finally:
+            close_old_connections()
+    return sync_to_async(read, thread_sensitive=False)
+
+
+# The objects sampled by the approximate usage are those whose primary
+# key hashes below a threshold, with Knuth's multiplicative hash, so that
+# successive calls sample the same objects. The products of the keys of
+# ``CTaggedItem.object_id`` range fit 64-bit integers.
+SAMPLE_MULTIPLIER = 2654435761
+SAMPLE_MODULUS = 2 ** 32
 
 
 ############
@@ -27,105 +86,292 @@ qn = connection.ops.quote_name
 
 class TagManager(models.Manager):
 
-    def update_tags(self, obj, tag_ids):
+    @instrumented
+    def update_tags(self, obj, tag_ids, using=None):
         """
         Replace the given object's ctags with ctags of the given IDs.
+
+        The changes are written to ``using``, defaulting to the database
+        routed for writing ``CTaggedItem`` rows of ``obj``.
         """
-        ctype = ContentType.objects.get_for_model(obj)
-        current_tags = list(self.filter(items__content_type__pk=ctype.pk,
-                                        items__object_id=obj.pk))
+        if tag_ids is None:
+            tag_ids = []
+        db = using or router.db_for_write(CTaggedItem, instance=obj)
+        ctype = ContentType.objects.db_manager(db).get_for_model(obj)
+        current_tags = list(self.using(db).filter(
+            items__content_type__pk=ctype.pk, items__object_id=obj.pk))
 
         # Remove ctags which no longer apply
         tags_for_removal = [ctag for ctag in current_tags
                             if ctag.id not in tag_ids]
         if len(tags_for_removal):
-            CTaggedItem._default_manager.filter(
+            CTaggedItem._default_manager.using(db).filter(
                 content_type__pk=ctype.pk,
                 object_id=obj.pk,
-                tag__in=tags_for_removal).delete()
+                ctag__in=tags_for_removal).delete()
         # Add new ctags, using id (not pk) for speed.
         # https://stackoverflow.com/questions/2165865/x/53100893#53100893
         current_tag_ids = [ctag.id for ctag in current_tags]
         for tag_id in tag_ids:
             if tag_id not in current_tag_ids:
-                ctag, created = self.get_or_create(id=tag_id)
-                CTaggedItem._default_manager.get_or_create(
+                ctag, created = self.using(db).get_or_create(id=tag_id)
+                CTaggedItem._default_manager.using(db).get_or_create(
                     content_type_id=ctype.pk,
                     object_id=obj.pk,
                     ctag=ctag,
                 )
 
-    def add_tag(self, obj, name_en):
+    @instrumented
+    def add_tag(self, obj, name_en, using=None):
         """
         Associates the given object with a ctag.
         """
+        db = using or router.db_for_write(CTaggedItem, instance=obj)
         try:
-            ctag = self.get(name_en=name_en)
+            ctag = self.using(db).get(name_en=name_en)
         except CTag.DoesNotExist:
             return
-        ctype = ContentType.objects.get_for_model(obj)
-        CTaggedItem._default_manager.get_or_create(
+        ctype = ContentType.objects.db_manager(db).get_for_model(obj)
+        CTaggedItem._default_manager.using(db).get_or_create(
             ctag=ctag, content_type=ctype, object_id=obj.pk)
 
-    def get_for_object(self, obj):
+    @instrumented
+    def bulk_add_tags(self, assignments, using=None, batch_size=1000):
+        """
+        Associates objects with ctags in bulk, ``assignments`` being an
+        iterable of ``(obj, tag_ids)`` pairs, with ``bulk_add_items``.
+        Returns the number of associations created.
+        """
+        db = using or router.db_for_write(CTaggedItem)
+        content_types = ContentType.objects.db_manager(db)
+
+        def get_items():
+            for obj, tag_ids in assignments:
+                ctype = content_types.get_for_model(obj)
+                for tag_id in tag_ids:
+                    yield CTaggedItem(ctag_id=tag_id, content_type_id=ctype.pk,
+                                      object_id=obj.pk)
+        return self.bulk_add_items(get_items(), db, batch_size)
+
+    @instrumented
+    def bulk_add_items(self, items, using=None, batch_size=1000):
+        """
+        Inserts the given unsaved ``CTaggedItem`` instances in bulk,
+        ``batch_size`` at a time. Returns the number of items inserted.
+
+        The associations which already exist are skipped, and no model
+        signals are sent. The rows are written to ``using``, defaulting
+        to the database routed for writing ``CTaggedItem`` rows. Only
+        the inserted items are logged in the change log, removed from the
+        object cache and counted in the trending scores, as of their
+        ``created`` timestamp.
+        """
+        from ctags.facets import bump_generation
+
+        db = using or router.db_for_write(CTaggedItem)
+        inserted = 0
+        batch = []
+        for item in items:
+            batch.append(item)
+            if len(batch) >= batch_size:
+                inserted += self._insert_items(batch, db)
+                batch = []
+        if batch:
+            inserted += self._insert_items(batch, db)
+        bump_generation()
+        return inserted
+
+    def _insert_items(self, items, db):
+        """
+        Inserts those of ``items`` whose association does not exist yet,
+        read with a query per content type.
+        """
+        from ctags import trending
+        from ctags.changelog import record_items
+        from ctags.objectcache import invalidate_items
+
+        manager = CTaggedItem._default_manager.using(db)
+        new = {}
+        for item in items:
+            new.setdefault((item.content_type_id, item.object_id,
+                            item.ctag_id), item)
+        objects = {}
+        for content_type_id, object_id, ctag_id in new:
+            object_ids, tag_ids = objects.setdefault(
+                content_type_id, (set(), set()))
+            object_ids.add(object_id)
+            tag_ids.add(ctag_id)
+        for content_type_id, (object_ids, tag_ids) in objects.items():
+            for object_id, ctag_id in manager.filter(
+                    content_type=content_type_id, object_id__in=object_ids,
+                    ctag__in=tag_ids).values_list('object_id', 'ctag_id'):
+                new.pop((content_type_id, object_id, ctag_id), None)
+        items = list(new.values())
+        # Conflicts remain possible with concurrent writers.
+        manager.bulk_create(items, ignore_conflicts=True)
+        record_items(items, True, db)
+        invalidate_items(items, db)
+        trending.record_items(items, db)
+        return len(items)
+
+    @instrumented
+    def merge(self, source, target, using=None):
+        """
+        Merges the ``source`` ctag into the ``target`` one: the items
+        tagged with ``source`` are tagged with ``target`` instead, the
+        aliases of ``source`` point to ``target``, ``source`` is deleted
+        and its English name becomes an alias of ``target``.
+
+        Raises ``ValueError`` when ``source`` and ``target`` are the same
+        ctag.
+        """
+        from ctags.changelog import record
+        from ctags.facets import bump_generation
+        from ctags.objectcache import invalidate
+
+        if source.pk == target.pk:
+            raise ValueError(_('A ctag cannot be merged into itself.'))
+        db = using or router.db_for_write(self.model, instance=source)
+        items = CTaggedItem._default_manager.using(db)
+        aliases = CTagAliasEn._default_manager.using(db)
+        with transaction.atomic(using=db):
+            # Move the items in a single UPDATE, skipping those already
+            # tagged with the target, which are deleted with the source.
+            moved = items.filter(ctag=source).exclude(Exists(items.filter(
+                ctag=target,
+                content_type=OuterRef('content_type'),
+                object_id=OuterRef('object_id'))))
+            if settings.CTAGS_CHANGE_LOG or settings.CTAGS_OBJECT_CACHE:
+                # The UPDATE sends no signals, collect the moved objects
+                # beforehand.
+                objects = list(moved.values_list('content_type_id',
+                                                 'object_id'))
+                invalidate(objects, db)
+            if settings.CTAGS_CHANGE_LOG:
+                record([(content_type_id, object_id, tag_id, added)
+                        for content_type_id, object_id in objects
+                        for tag_id, added in ((source.pk, False),
+                                              (target.pk, True))], db)
+            moved.update(ctag=target)
+            aliases.filter(target=source.pk).update(target=target.pk)
+            name = source.name_en
+            source.delete()
+            aliases.update_or_create(name=name,
+                                     defaults={'target': target.pk})
+        bump_generation()
+
+    @instrumented
+    def get_for_object(self, obj, using=None):
         """
         Create a queryset matching all ctags associated with the given
         object.
         """
-        ctype = ContentType.objects.get_for_model(obj)
-        return self.filter(items__content_type__pk=ctype.pk,
-                           items__object_id=obj.pk)
+        db = using or router.db_for_read(self.model, instance=obj)
+        ctype = ContentType.objects.db_manager(db).get_for_model(obj)
+        return self.using(db).filter(items__content_type__pk=ctype.pk,
+                                     items__object_id=obj.pk)
 
     def _get_usage(self, model, counts=False, min_count=None,
-                   extra_joins=None, extra_criteria=None, params=None):
+                   extra_joins=None, extra_criteria=None, params=None,
+                   using=None, include_descendants=False):
         """
         Perform the custom SQL query for ``usage_for_model`` and
         ``usage_for_queryset``.
+
+        With ``include_descendants``, the items of each ctag are joined
+        through the closure table, so that each ctag counts the distinct
+        objects tagged with it or any of its descendants.
         """
         if min_count is not None:
             counts = True
 
+        db = using or router.db_for_read(model)
+        qn = connections[db].ops.quote_name
+        params = list(params or [])
+        ctag_table = qn(self.model._meta.db_table)
+        ctag_columns = ', '.join(
+            '%s.%s' % (ctag_table, qn(field.column))
+            for field in self.model._meta.concrete_fields)
         model_table = qn(model._meta.db_table)
         model_pk = '%s.%s' % (model_table, qn(model._meta.pk.column))
+        tagged_item_table = qn(CTaggedItem._meta.db_table)
+        ctag_id = qn(CTaggedItem._meta.get_field('ctag').column)
+        if include_descendants:
+            closure_table = qn(CTagClosure._meta.db_table)
+            ctag_join = """
+            INNER JOIN %(closure)s
+                ON %(ctag)s.id = %(closure)s.%(ancestor_id)s
+            INNER JOIN %(tagged_item)s
+                ON %(closure)s.%(descendant_id)s = %(tagged_item)s.%(ctag_id)s
+            """ % {
+                'ctag': ctag_table,
+                'closure': closure_table,
+                'ancestor_id': qn(
+                    CTagClosure._meta.get_field('ancestor').column),
+                'descendant_id': qn(
+                    CTagClosure._meta.get_field('descendant').column),
+                'tagged_item': tagged_item_table,
+                'ctag_id': ctag_id,
+            }
+            # An object may be tagged with several descendants.
+            count = 'COUNT(DISTINCT %s)' % model_pk
+        else:
+            ctag_join = """
+            INNER JOIN %(tagged_item)s
+                ON %(ctag)s.id = %(tagged_item)s.%(ctag_id)s
+            """ % {
+                'ctag': ctag_table,
+                'tagged_item': tagged_item_table,
+                'ctag_id': ctag_id,
+            }
+            count = 'COUNT(%s)' % model_pk
         query = """
-        SELECT DISTINCT %(ctag)s.id%(count_sql)s
+        SELECT DISTINCT %(ctag_columns)s%(count_sql)s
         FROM
             %(ctag)s
-            INNER JOIN %(tagged_item)s
-                ON %(ctag)s.id = %(tagged_item)s.tag_id
+            %(ctag_join)s
             INNER JOIN %(model)s
                 ON %(tagged_item)s.object_id = %(model_pk)s
             %%s
         WHERE %(tagged_item)s.content_type_id = %(content_type_id)s
             %%s
-        GROUP BY %(ctag)s.id
+        GROUP BY %(ctag_columns)s
         %%s""" % {
-            'ctag': qn(self.model._meta.db_table),
-            'count_sql': counts and (', COUNT(%s)' % model_pk) or '',
-            'tagged_item': qn(CTaggedItem._meta.db_table),
+            'ctag': ctag_table,
+            'ctag_columns': ctag_columns,
+            'ctag_join': ctag_join,
+            'count_sql': counts and (', %s' % count) or '',
+            'tagged_item': tagged_item_table,
             'model': model_table,
             'model_pk': model_pk,
-            'content_type_id': ContentType.objects.get_for_model(model).pk,
+            'content_type_id': ContentType.objects.db_manager(
+                db).get_for_model(model).pk,
         }
 
         min_count_sql = ''
         if min_count is not None:
-            min_count_sql = 'HAVING COUNT(%s) >= %%s' % model_pk
+            min_count_sql = 'HAVING %s >= %%s' % count
             params.append(min_count)
 
-        cursor = connection.cursor()
-        cursor.execute(query % (extra_joins, extra_criteria, min_count_sql),
+        cursor = connections[db].cursor()
+        cursor.execute(query % (extra_joins or '', extra_criteria or '',
+                                min_count_sql),
                        params)
+        field_names = [field.attname
+                       for field in self.model._meta.concrete_fields]
+        field_count = len(field_names)
         ctags = []
         for row in cursor.fetchall():
-            t = self.model(*row[:2])
+            t = self.model.from_db(db, field_names, row[:field_count])
             if counts:
-                t.count = row[2]
+                t.count = row[field_count]
             ctags.append(t)
         return ctags
 
+    @instrumented
     def usage_for_model(self, model, counts=False, min_count=None,
-                        filters=None):
+                        filters=None, using=None, include_descendants=False,
+                        approximate=False):
         """
         Obtain a list of ctags associated with instances of the given
         Model class.
@@ -142,19 +388,36 @@ class TagManager(models.Manager):
         used by a subset of the Model's instances, pass a dictionary
         of field lookups to be applied to the given Model as the
         ``filters`` argument.
+
+        If ``include_descendants`` is True, the usage of each ctag
+        includes the instances tagged with any of its descendants.
+
+        If ``approximate`` is True, the counts are estimated, see
+        ``usage_for_queryset``.
+
+        The query runs on ``using``, defaulting to the database routed
+        for reading the Model.
         """
         if filters is None:
             filters = {}
 
         queryset = model._default_manager.filter()
+        if using is not None:
+            queryset = queryset.using(using)
         for k, v in filters.items():
             # Add support for both Django 4 and inferior versions
             queryset.query.add_q(Q((k, v)))
-        usage = self.usage_for_queryset(queryset, counts, min_count)
+        usage = self.usage_for_queryset(
+            queryset, counts, min_count,
+            include_descendants=include_descendants,
+            approximate=approximate)
 
         return usage
 
-    def usage_for_queryset(self, queryset, counts=False, min_count=None):
+    @instrumented
+    def usage_for_queryset(self, queryset, counts=False, min_count=None,
+                           using=None, include_descendants=False,
+                           approximate=False):
         """
         Obtain a list of ctags associated with instances of a model
         contained in the given queryset.
@@ -166,8 +429,30 @@ class TagManager(models.Manager):
         If ``min_count`` is given, only ctags which have a ``count``
         greater than or equal to ``min_count`` will be returned.
         Passing a value for ``min_count`` implies ``counts=True``.
+
+        If ``include_descendants`` is True, the usage of each ctag
+        includes the instances tagged with any of its descendants.
+
+        If ``approximate`` is True, the counts are estimated from a
+        deterministic sample of ``CTAGS_APPROXIMATE_SAMPLE_SIZE`` of the
+        instances, unless the queryset holds fewer, and each ctag gets a
+        ``count_error`` attribute bounding the error of its ``count`` at
+        a 95% confidence level, 0 for exact counts. Implies
+        ``counts=True``. Ctags absent from the sample are left out.
+
+        The query runs on ``using``, defaulting to the database of the
+        queryset.
         """
-        compiler = queryset.query.get_compiler(using=queryset.db)
+        db = using or queryset.db
+        if approximate:
+            return self._get_approximate_usage(queryset, min_count, db,
+                                               include_descendants)
+        return self._get_queryset_usage(queryset, counts, min_count, db,
+                                        include_descendants)
+
+    def _get_queryset_usage(self, queryset, counts, min_count, db,
+                            include_descendants):
+        compiler = queryset.query.get_compiler(using=db)
         where, params = compiler.compile(queryset.query.where)
         extra_joins = ' '.join(compiler.get_from_clause()[0][1:])
 
@@ -176,9 +461,78 @@ class TagManager(models.Manager):
         else:
             extra_criteria = ''
         return self._get_usage(queryset.model, counts, min_count,
-                               extra_joins, extra_criteria, params)
+                               extra_joins, extra_criteria, params, db,
+                               include_descendants)
 
-    def related_for_model(self, ctags, model, counts=False, min_count=None):
+    def _get_approximate_usage(self, queryset, min_count, db,
+                               include_descendants):
+        """
+        Scales the usage of the ctags among a sample of the instances of
+        ``queryset`` up to the whole of it.
+        """
+        total = queryset.using(db).order_by().count()
+        size = settings.CTAGS_APPROXIMATE_SAMPLE_SIZE
+        if total <= size:
+            ctags = self._get_queryset_usage(queryset, True, min_count, db,
+                                             include_descendants)
+            for ctag in ctags:
+                ctag.count_error = 0
+            return ctags
+        rate = size / float(total)
+        sample = queryset.alias(ctags_sample=Mod(
+            Cast('pk', models.BigIntegerField()) * SAMPLE_MULTIPLIER,
+            SAMPLE_MODULUS,
+        )).filter(ctags_sample__lt=int(rate * SAMPLE_MODULUS))
+        ctags = []
+        for ctag in self._get_queryset_usage(sample, True, None, db,
+                                             include_descendants):
+            # Each instance is sampled with probability ``rate``, so the
+            # sampled count is binomial.
+            sampled = ctag.count
+            ctag.count = int(round(sampled / rate))
+            ctag.count_error = int(math.ceil(
+                1.96 * math.sqrt(sampled * (1 - rate)) / rate))
+            if min_count is None or ctag.count >= min_count:
+                ctags.append(ctag)
+        return ctags
+
+    @instrumented
+    def trending(self, model=None, num=10, window=None, using=None):
+        """
+        Obtain a list of the ``num`` ctags with the highest exponentially
+        decayed usage, giving each ctag a ``score`` attribute with that
+        usage.
+
+        If a Model class is given, only its instances are considered.
+
+        If ``window`` is given as a ``timedelta``, only ctags used within
+        that period are returned.
+
+        The ranking is read from the ``CTagTrend`` table, see
+        ``ctags.trending``.
+        """
+        from ctags.trending import current_score
+
+        db = using or router.db_for_read(CTagTrend)
+        trends = CTagTrend.objects.using(db).select_related('ctag')
+        if model is None:
+            trends = trends.filter(content_type__isnull=True)
+        else:
+            trends = trends.filter(content_type=ContentType.objects.db_manager(
+                db).get_for_model(model))
+        if window is not None:
+            trends = trends.filter(last_used__gte=timezone.now() - window)
+        now = timezone.now()
+        ctags = []
+        for trend in trends.order_by('-log_score')[:num]:
+            ctag = trend.ctag
+            ctag.score = current_score(trend.log_score, now)
+            ctags.append(ctag)
+        return ctags
+
+    @instrumented
+    def related_for_model(self, ctags, model, counts=False, min_count=None,
+                          using=None):
         """
         Obtain a list of ctags related to a given list of ctags - that
         is, other ctags used by items which have all the given ctags.
@@ -190,37 +544,44 @@ class TagManager(models.Manager):
         If ``min_count`` is given, only ctags which have a ``count``
         greater than or equal to ``min_count`` will be returned.
         Passing a value for ``min_count`` implies ``counts=True``.
+
+        The query runs on ``using``, defaulting to the database routed
+        for reading ``CTaggedItem`` rows.
         """
         if min_count is not None:
             counts = True
 
+        db = using or router.db_for_read(CTaggedItem)
+        qn = connections[db].ops.quote_name
         ctags = get_tag_list(ctags)
         tag_count = len(ctags)
         tagged_item_table = qn(CTaggedItem._meta.db_table)
         query = """
-        SELECT %(ctag)s.id, %(ctag)s.name%(count_sql)s
+        SELECT %(ctag)s.id, %(ctag)s.name_en%(count_sql)s
         FROM %(tagged_item)s INNER JOIN %(ctag)s ON
-             %(tagged_item)s.tag_id = %(ctag)s.id
+             %(tagged_item)s.%(ctag_id)s = %(ctag)s.id
         WHERE %(tagged_item)s.content_type_id = %(content_type_id)s
           AND %(tagged_item)s.object_id IN
           (
               SELECT %(tagged_item)s.object_id
               FROM %(tagged_item)s, %(ctag)s
               WHERE %(tagged_item)s.content_type_id = %(content_type_id)s
-                AND %(ctag)s.id = %(tagged_item)s.tag_id
+                AND %(ctag)s.id = %(tagged_item)s.%(ctag_id)s
                 AND %(ctag)s.id IN (%(tag_id_placeholders)s)
               GROUP BY %(tagged_item)s.object_id
               HAVING COUNT(%(tagged_item)s.object_id) = %(tag_count)s
           )
           AND %(ctag)s.id NOT IN (%(tag_id_placeholders)s)
-        GROUP BY %(ctag)s.id, %(ctag)s.name
+        GROUP BY %(ctag)s.id, %(ctag)s.name_en
         %(min_count_sql)s
-        ORDER BY %(ctag)s.name ASC""" % {
+        ORDER BY %(ctag)s.name_en ASC""" % {
             'ctag': qn(self.model._meta.db_table),
+            'ctag_id': qn(CTaggedItem._meta.get_field('ctag').column),
             'count_sql': counts and ', COUNT(%s.object_id)' %
                 tagged_item_table or '',
             'tagged_item': tagged_item_table,
-            'content_type_id': ContentType.objects.get_for_model(model).pk,
+            'content_type_id': ContentType.objects.db_manager(
+                db).get_for_model(model).pk,
             'tag_id_placeholders': ','.join(['%s'] * tag_count),
             'tag_count': tag_count,
             'min_count_sql': min_count is not None and (
@@ -231,7 +592,7 @@ class TagManager(models.Manager):
         if min_count is not None:
             params.append(min_count)
 
-        cursor = connection.cursor()
+        cursor = connections[db].cursor()
         cursor.execute(query, params)
         related = []
         for row in cursor.fetchall():
@@ -241,8 +602,10 @@ class TagManager(models.Manager):
             related.append(ctag)
         return related
 
+    @instrumented
     def cloud_for_model(self, model, steps=4, distribution=LOGARITHMIC,
-                        filters=None, min_count=None):
+                        filters=None, min_count=None, using=None,
+                        approximate=False):
         """
         Obtain a list of ctags associated with instances of the given
         Model, giving each ctag a ``count`` attribute indicating how
@@ -264,137 +627,276 @@ class TagManager(models.Manager):
         To limit the ctags displayed in the cloud to those with a
         ``count`` greater than or equal to ``min_count``, pass a value
         for the ``min_count`` argument.
+
+        If ``approximate`` is True, the counts are estimated from a
+        sample of the instances, see ``usage_for_queryset``. The few
+        font sizes of a cloud seldom depend on the exact counts.
         """
         ctags = list(self.usage_for_model(model, counts=True, filters=filters,
-                                         min_count=min_count))
+                                          min_count=min_count, using=using,
+                                          approximate=approximate))
         return calculate_cloud(ctags, steps, distribution)
 
+    @instrumented
+    def usage_for_models(self, models, counts=False, min_count=None,
+                         filters=None, weights=None, using=None):
+        """
+        Obtain a list of ctags associated with instances of any of the
+        given Model classes, from a single grouped query.
 
-class TaggedItemManager(models.Manager):
-    """
-    FIXME There's currently no way to get the ``GROUP BY`` and ``HAVING``
-          SQL clauses required by many of this manager's methods into
-          Django's ORM.
+        ``counts`` and ``min_count`` behave as for ``usage_for_model``.
+        ``filters`` may map some of the Model classes to dictionaries
+        of field lookups restricting their instances, and ``weights``
+        to the factor by which their associations count, the ``count``
+        attribute then holding the weighted usage.
 
-          For now, we manually execute a query to retrieve the PKs of
-          objects we're interested in, then use the ORM's ``__in``
-          lookup to return a ``QuerySet``.
+        The query runs on ``using``, defaulting to the database routed
+        for reading ``CTaggedItem`` rows.
+        """
+        if min_count is not None:
+            counts = True
+        if not models:
+            return []
+        filters = filters or {}
+        weights = weights or {}
+
+        db = using or router.db_for_read(CTaggedItem)
+        content_types = ContentType.objects.db_manager(db)
+        condition = Q()
+        weight_cases = []
+        for model in models:
+            # The semi-join on the model skips the items of deleted
+            # objects, as the join of usage_for_model does.
+            objects = model._default_manager.using(db).filter(
+                **filters.get(model, {}))
+            model_condition = Q(
+                items__content_type=content_types.get_for_model(model).pk,
+                items__object_id__in=objects.values('pk'))
+            condition |= model_condition
+            weight_cases.append(When(model_condition, then=Value(
+                float(weights.get(model, 1)))))
+        # The annotations reuse the join on the items of the filter.
+        ctags = self.using(db).filter(condition)
+        if not counts:
+            return list(ctags.distinct())
+        if weights:
+            count = Sum(Case(*weight_cases, output_field=FloatField()))
+        else:
+            count = Count('items')
+        ctags = ctags.annotate(count=count)
+        if min_count is not None:
+            ctags = ctags.filter(count__gte=min_count)
+        return list(ctags)
+
+    @instrumented
+    def cloud_for_models(self, models, steps=4, distribution=LOGARITHMIC,
+                         filters=None, weights=None, min_count=None,
+                         using=None):
+        """
+        Obtain a list of ctags associated with instances of any of the
+        given Model classes, with the ``count`` and ``font_size``
+        attributes of ``cloud_for_model``.
 
-          Now that the queryset-refactor branch is in the trunk, this can be
-          tidied up significantly.
+        ``filters`` and ``weights`` are described in
+        ``usage_for_models``.
+        """
+        ctags = self.usage_for_models(models, counts=True, filters=filters,
+                                      weights=weights, min_count=min_count,
+                                      using=using)
+        return calculate_cloud(ctags, steps, distribution)
+
+    async def aupdate_tags(self, obj, tag_ids, using=None):
+        """
+        Asynchronous version of ``update_tags``.
+        """
+        if tag_ids is None:
+            tag_ids = []
+        db = using or router.db_for_write(CTaggedItem, instance=obj)
+        ctype = await sync_to_async(
+            ContentType.objects.db_manager(db).get_for_model)(obj)
+        current_tags = [ctag async for ctag in self.using(db).filter(
+            items__content_type__pk=ctype.pk, items__object_id=obj.pk)]
+
+        # Remove ctags which no longer apply
+        tags_for_removal = [ctag for ctag in current_tags
+                            if ctag.id not in tag_ids]
+        if len(tags_for_removal):
+            await CTaggedItem._default_manager.using(db).filter(
+                content_type__pk=ctype.pk,
+                object_id=obj.pk,
+                ctag__in=tags_for_removal).adelete()
+        current_tag_ids = [ctag.id for ctag in current_tags]
+        for tag_id in tag_ids:
+            if tag_id not in current_tag_ids:
+                ctag, created = await self.using(db).aget_or_create(id=tag_id)
+                await CTaggedItem._default_manager.using(db).aget_or_create(
+                    content_type_id=ctype.pk,
+                    object_id=obj.pk,
+                    ctag=ctag,
+                )
+
+    async def aget_for_object(self, obj, using=None):
+        """
+        Asynchronous version of ``get_for_object``, returning a list.
+        """
+        db = using or router.db_for_read(self.model, instance=obj)
+        ctype = await sync_to_async(
+            ContentType.objects.db_manager(db).get_for_model)(obj)
+        return [ctag async for ctag in self.using(db).filter(
+            items__content_type__pk=ctype.pk, items__object_id=obj.pk)]
+
+    async def ausage_for_model(self, model, *args, **kwargs):
+        """
+        Asynchronous version of ``usage_for_model``.
+        """
+        return await _read_in_thread(self.usage_for_model)(
+            model, *args, **kwargs)
+
+    async def ausage_for_queryset(self, queryset, *args, **kwargs):
+        """
+        Asynchronous version of ``usage_for_queryset``.
+        """
+        return await _read_in_thread(self.usage_for_queryset)(
+            queryset, *args, **kwargs)
+
+    async def arelated_for_model(self, ctags, model, *args, **kwargs):
+        """
+        Asynchronous version of ``related_for_model``.
+        """
+        return await _read_in_thread(self.related_for_model)(
+            ctags, model, *args, **kwargs)
+
+    async def acloud_for_model(self, model, *args, **kwargs):
+        """
+        Asynchronous version of ``cloud_for_model``.
+        """
+        return await _read_in_thread(self.cloud_for_model)(
+            model, *args, **kwargs)
+
+    async def ausage_for_models(self, models, *args, **kwargs):
+        """
+        Asynchronous version of ``usage_for_models``.
+        """
+        return await _read_in_thread(self.usage_for_models)(
+            models, *args, **kwargs)
+
+    async def acloud_for_models(self, models, *args, **kwargs):
+        """
+        Asynchronous version of ``cloud_for_models``.
+        """
+        return await _read_in_thread(self.cloud_for_models)(
+            models, *args, **kwargs)
+
+
+class TaggedItemManager(models.Manager):
     """
+    The filters on ctags are ``EXISTS`` subqueries correlated to the
+    objects, so that the querysets returned can be combined with any
+    other filter, annotation or ``values()`` call.
+    """
+
+    def _get_items_of(self, queryset, model):
+        """
+        Returns the items of the objects of the outer ``queryset``.
+        """
+        content_type = ContentType.objects.db_manager(
+            queryset.db).get_for_model(model)
+        return self.filter(content_type=content_type.pk,
+                           object_id=OuterRef('pk'))
 
-    def get_by_model(self, queryset_or_model, ctags):
+    def _with_ctags(self, items, ctags, include_descendants=False):
+        """
+        Filters ``items`` on the given ctags, or on them and their
+        descendants through the closure table.
+        """
+        ctag_ids = [ctag.pk for ctag in ctags]
+        if include_descendants:
+            return items.filter(ctag__in=CTagClosure.objects.filter(
+                ancestor__in=ctag_ids).values('descendant'))
+        return items.filter(ctag__in=ctag_ids)
+
+    @instrumented
+    def get_by_model(self, queryset_or_model, ctags, using=None,
+                     include_descendants=False):
         """
         Create a ``QuerySet`` containing instances of the specified
         model associated with a given ctag or list of ctags.
+
+        If ``include_descendants`` is True, an instance associated with
+        a descendant of a ctag counts as associated with the ctag.
         """
         ctags = get_tag_list(ctags)
-        tag_count = len(ctags)
-        if tag_count == 0:
+        queryset, model = _get_queryset_and_model(queryset_or_model, using)
+        if not len(ctags):
             # No existing ctags were given
-            queryset, model = get_queryset_and_model(queryset_or_model)
-            return model._default_manager.none()
-        elif tag_count == 1:
-            # Optimisation for single ctag - fall through to the simpler
-            # query below.
-            ctag = ctags[0]
-        else:
-            return self.get_intersection_by_model(queryset_or_model, ctags)
-
-        queryset, model = get_queryset_and_model(queryset_or_model)
-        content_type = ContentType.objects.get_for_model(model)
-        opts = self.model._meta
-        tagged_item_table = qn(opts.db_table)
-        return queryset.extra(
-            tables=[opts.db_table],
-            where=[
-                '%s.content_type_id = %%s' % tagged_item_table,
-                '%s.tag_id = %%s' % tagged_item_table,
-                '%s.%s = %s.object_id' % (qn(model._meta.db_table),
-                                          qn(model._meta.pk.column),
-                                          tagged_item_table)
-            ],
-            params=[content_type.pk, ctag.pk],
-        )
-
-    def get_intersection_by_model(self, queryset_or_model, ctags):
+            return queryset.none()
+        items = self._get_items_of(queryset, model)
+        # One lookup of the (content_type, object_id, ctag) index per
+        # ctag.
+        return queryset.filter(*[
+            Exists(self._with_ctags(items, [ctag], include_descendants))
+            for ctag in ctags])
+
+    @instrumented
+    def get_intersection_by_model(self, queryset_or_model, ctags,
+                                  using=None, include_descendants=False):
         """
         Create a ``QuerySet`` containing instances of the specified
         model associated with *all* of the given list of ctags.
         """
-        ctags = get_tag_list(ctags)
-        tag_count = len(ctags)
-        queryset, model = get_queryset_and_model(queryset_or_model)
+        return self.get_by_model(queryset_or_model, ctags, using,
+                                 include_descendants)
 
-        if not tag_count:
-            return model._default_manager.none()
-
-        model_table = qn(model._meta.db_table)
-        # This query selects the ids of all objects which have all the
-        # given ctags.
-        query = """
-        SELECT %(model_pk)s
-        FROM %(model)s, %(tagged_item)s
-        WHERE %(tagged_item)s.content_type_id = %(content_type_id)s
-          AND %(tagged_item)s.tag_id IN (%(tag_id_placeholders)s)
-          AND %(model_pk)s = %(tagged_item)s.object_id
-        GROUP BY %(model_pk)s
-        HAVING COUNT(%(model_pk)s) = %(tag_count)s""" % {
-            'model_pk': '%s.%s' % (model_table, qn(model._meta.pk.column)),
-            'model': model_table,
-            'tagged_item': qn(self.model._meta.db_table),
-            'content_type_id': ContentType.objects.get_for_model(model).pk,
-            'tag_id_placeholders': ','.join(['%s'] * tag_count),
-            'tag_count': tag_count,
-        }
-
-        cursor = connection.cursor()
-        cursor.execute(query, [ctag.pk for ctag in ctags])
-        object_ids = [row[0] for row in cursor.fetchall()]
-        if len(object_ids) > 0:
-            return queryset.filter(pk__in=object_ids)
-        else:
-            return model._default_manager.none()
-
-    def get_union_by_model(self, queryset_or_model, ctags):
+    @instrumented
+    def get_union_by_model(self, queryset_or_model, ctags, using=None,
+                           include_descendants=False):
         """
         Create a ``QuerySet`` containing instances of the specified
         model associated with *any* of the given list of ctags.
         """
         ctags = get_tag_list(ctags)
-        tag_count = len(ctags)
-        queryset, model = get_queryset_and_model(queryset_or_model)
-
-        if not tag_count:
-            return model._default_manager.none()
-
-        model_table = qn(model._meta.db_table)
-        # This query selects the ids of all objects which have any of
-        # the given ctags.
-        query = """
-        SELECT %(model_pk)s
-        FROM %(model)s, %(tagged_item)s
-        WHERE %(tagged_item)s.content_type_id = %(content_type_id)s
-          AND %(tagged_item)s.tag_id IN (%(tag_id_placeholders)s)
-          AND %(model_pk)s = %(tagged_item)s.object_id
-        GROUP BY %(model_pk)s""" % {
-            'model_pk': '%s.%s' % (model_table, qn(model._meta.pk.column)),
-            'model': model_table,
-            'tagged_item': qn(self.model._meta.db_table),
-            'content_type_id': ContentType.objects.get_for_model(model).pk,
-            'tag_id_placeholders': ','.join(['%s'] * tag_count),
-        }
-
-        cursor = connection.cursor()
-        cursor.execute(query, [ctag.pk for ctag in ctags])
-        object_ids = [row[0] for row in cursor.fetchall()]
-        if len(object_ids) > 0:
-            return queryset.filter(pk__in=object_ids)
-        else:
-            return model._default_manager.none()
-
-    def get_related(self, obj, queryset_or_model, num=None):
+        queryset, model = _get_queryset_and_model(queryset_or_model, using)
+        if not len(ctags):
+            return queryset.none()
+        return queryset.filter(Exists(self._with_ctags(
+            self._get_items_of(queryset, model), ctags,
+            include_descendants)))
+
+    @instrumented
+    def exclude_by_model(self, queryset_or_model, ctags, using=None,
+                         include_descendants=False):
+        """
+        Create a ``QuerySet`` containing instances of the specified
+        model associated with *none* of the given list of ctags.
+        """
+        ctags = get_tag_list(ctags)
+        queryset, model = _get_queryset_and_model(queryset_or_model, using)
+        if not len(ctags):
+            return queryset
+        return queryset.filter(~Exists(self._with_ctags(
+            self._get_items_of(queryset, model), ctags,
+            include_descendants)))
+
+    @instrumented
+    def annotate_tag_count(self, queryset_or_model, ctags=None,
+                           name='tag_count', using=None):
+        """
+        Create a ``QuerySet`` of instances of the specified model with
+        a ``name`` attribute holding the number of their ctags, or of
+        the given ctags only.
+        """
+        queryset, model = _get_queryset_and_model(queryset_or_model, using)
+        items = self._get_items_of(queryset, model)
+        if ctags is not None:
+            items = items.filter(ctag__in=[
+                ctag.pk for ctag in get_tag_list(ctags)])
+        counts = items.order_by().values('object_id').annotate(
+            count=Count('pk')).values('count')
+        return queryset.annotate(**{name: Coalesce(
+            Subquery(counts, output_field=models.IntegerField()), 0)})
+
+    @instrumented
+    def get_related(self, obj, queryset_or_model, num=None, using=None):
         """
         Retrieve a list of instances of the specified model which share
         ctags with the model instance ``obj``, ordered by the number of
@@ -403,19 +905,21 @@ class TaggedItemManager(models.Manager):
         If ``num`` is given, a maximum of ``num`` instances will be
         returned.
         """
-        queryset, model = get_queryset_and_model(queryset_or_model)
+        queryset, model = _get_queryset_and_model(queryset_or_model, using)
+        qn = connections[queryset.db].ops.quote_name
         model_table = qn(model._meta.db_table)
-        content_type = ContentType.objects.get_for_model(obj)
-        related_content_type = ContentType.objects.get_for_model(model)
+        content_types = ContentType.objects.db_manager(queryset.db)
+        content_type = content_types.get_for_model(obj)
+        related_content_type = content_types.get_for_model(model)
         query = """
         SELECT %(model_pk)s, COUNT(related_tagged_item.object_id) AS %(count)s
         FROM %(model)s, %(tagged_item)s, %(ctag)s,
              %(tagged_item)s related_tagged_item
         WHERE %(tagged_item)s.object_id = %%s
           AND %(tagged_item)s.content_type_id = %(content_type_id)s
-          AND %(ctag)s.id = %(tagged_item)s.tag_id
+          AND %(ctag)s.id = %(tagged_item)s.%(ctag_id)s
           AND related_tagged_item.content_type_id = %(related_content_type_id)s
-          AND related_tagged_item.tag_id = %(tagged_item)s.tag_id
+          AND related_tagged_item.%(ctag_id)s = %(tagged_item)s.%(ctag_id)s
           AND %(model_pk)s = related_tagged_item.object_id"""
         if content_type.pk == related_content_type.pk:
             # Exclude the given instance itself if determining related
@@ -434,6 +938,7 @@ class TaggedItemManager(models.Manager):
             'model': model_table,
             'tagged_item': qn(self.model._meta.db_table),
             'ctag': tagging_table,
+            'ctag_id': qn(self.model._meta.get_field('ctag').column),
             'content_type_id': content_type.pk,
             'related_content_type_id': related_content_type.pk,
             # Hardcoding this for now just to get tests working again - this
@@ -441,7 +946,7 @@ class TaggedItemManager(models.Manager):
             'limit_offset': num is not None and 'LIMIT %s' or '',
         }
 
-        cursor = connection.cursor()
+        cursor = connections[queryset.db].cursor()
         params = [obj.pk]
         if num is not None:
             params.append(num)
@@ -456,6 +961,79 @@ class TaggedItemManager(models.Manager):
         else:
             return []
 
+    @instrumented
+    def get_mixed_page(self, ctag, models=None, after=None, limit=20,
+                       select_related_for=None, using=None):
+        """
+        Retrieve a page of the objects of the given models, or of all
+        models, tagged with ``ctag``, the most recently tagged first.
+
+        Returns a ``(objects, cursor)`` tuple, ``cursor`` being the value
+        of ``after`` fetching the next page, or ``None`` after the last
+        one. The items are paginated on their primary key rather than
+        with an offset, so that every page is read from the
+        ``(ctag, id)`` index, and their objects are then fetched with a
+        query per model, so that a page costs ``1 + number of models``
+        queries.
+
+        Objects deleted without their tagged items are skipped, so a page
+        may hold fewer than ``limit`` objects while not being the last.
+        """
+        ctag = get_tag(ctag)
+        if ctag is None:
+            return [], None
+        db = using or router.db_for_read(self.model)
+        items = self.using(db).filter(ctag=ctag.pk)
+        if models:
+            content_types = ContentType.objects.db_manager(
+                db).get_for_models(*models)
+            items = items.filter(content_type__in=[
+                content_type.pk for content_type in content_types.values()])
+        if after is not None:
+            items = items.filter(pk__lt=after)
+        items = list(items.order_by('-pk')[:limit])
+        fetch_content_objects(items, select_related_for, using=db)
+        cursor = items[-1].pk if len(items) == limit else None
+        return [item.object for item in items
+                if item.object is not None], cursor
+
+    async def aget_by_model(self, queryset_or_model, ctags, using=None,
+                            include_descendants=False):
+        """
+        Asynchronous version of ``get_by_model``. The ``QuerySet``
+        returned is still lazy, and is meant to be consumed with
+        ``async for``.
+        """
+        return await _read_in_thread(self.get_by_model)(
+            queryset_or_model, ctags, using=using,
+            include_descendants=include_descendants)
+
+    async def aget_union_by_model(self, queryset_or_model, ctags,
+                                  using=None, include_descendants=False):
+        """
+        Asynchronous version of ``get_union_by_model``.
+        """
+        return await _read_in_thread(self.get_union_by_model)(
+            queryset_or_model, ctags, using=using,
+            include_descendants=include_descendants)
+
+    async def aget_mixed_page(self, ctag, models=None, after=None, limit=20,
+                              select_related_for=None, using=None):
+        """
+        Asynchronous version of ``get_mixed_page``.
+        """
+        return await _read_in_thread(self.get_mixed_page)(
+            ctag, models=models, after=after, limit=limit,
+            select_related_for=select_related_for, using=using)
+
+    async def aget_related(self, obj, queryset_or_model, num=None,
+                           using=None):
+        """
+        Asynchronous version of ``get_related``.
+        """
+        return await _read_in_thread(self.get_related)(
+            obj, queryset_or_model, num=num, using=using)
+
 
 ##########
 # Models #
@@ -487,16 +1065,75 @@ class CTag(models.Model):
     approved_es = models.BooleanField(default=False)
     approved_pt = models.BooleanField(default=False)
 
+    parent = models.ForeignKey(
+        'self',
+        verbose_name=_('parent'),
+        null=True,
+        blank=True,
+        related_name='children',
+        on_delete=models.SET_NULL)
+
     objects = TagManager()
 
     class Meta:
         ordering = (Lower('name_en'),)
+        indexes = [
+            # Backs the ordering above
+            models.Index(Lower('name_en'), name='ctags_ctag_lower_name_en'),
+        ]
         verbose_name = _('ctag')
         verbose_name_plural = _('ctags')
 
     def __str__(self):
         return _(self.name_en)
 
+    def clean(self):
+        """
+        Refuses to make a ctag a descendant of itself.
+        """
+        from ctags.hierarchy import is_descendant
+
+        if self.pk is None or self.parent_id is None:
+            return
+        if is_descendant(self.parent_id, self.pk,
+                         router.db_for_write(CTag, instance=self)):
+            raise ValidationError({'parent': _(
+                'A ctag cannot be a descendant of itself.')})
+
+
+class CTagClosure(models.Model):
+    """
+    A path from a ctag down to one of its descendants, or to itself at
+    depth 0. See ``ctags.hierarchy``.
+    """
+    ancestor = models.ForeignKey(
+        CTag,
+        verbose_name=_('ancestor'),
+        related_name='descendant_links',
+        on_delete=models.CASCADE)
+
+    descendant = models.ForeignKey(
+        CTag,
+        verbose_name=_('descendant'),
+        related_name='ancestor_links',
+        on_delete=models.CASCADE)
+
+    depth = models.PositiveSmallIntegerField(_('depth'))
+
+    class Meta:
+        # The unique index on (ancestor, descendant) serves the
+        # expansion of ctags to their descendants.
+        unique_together = (('ancestor', 'descendant'),)
+        indexes = [
+            models.Index(fields=['descendant', 'depth'],
+                         name='ctags_closure_descendant'),
+        ]
+        verbose_name = _('ctag closure')
+        verbose_name_plural = _('ctag closures')
+
+    def __str__(self):
+        return '%s > %s' % (self.ancestor_id, self.descendant_id)
+
 class CTagAliasEn(models.Model):
     """
     Little more than a pointer and a display name (used for autocompletion).
@@ -527,13 +1164,109 @@ class CTaggedItem(models.Model):
     object = GenericForeignKey(
         'content_type', 'object_id')
 
+    # Null for the rows tagged before it was introduced, unless backfilled.
+    created = models.DateTimeField(
+        _('created'), null=True, blank=True,
+        default=timezone.now, editable=False)
+
     objects = TaggedItemManager()
 
     class Meta:
         # Enforce unique ctag association per object
         unique_together = (('ctag', 'content_type', 'object_id'),)
+        # The queries filter on the content type first, then on either
+        # the objects or the ctags.
+        indexes = [
+            models.Index(fields=['content_type', 'object_id', 'ctag'],
+                         name='ctags_item_ct_object_ctag'),
+            models.Index(fields=['content_type', 'ctag', 'object_id'],
+                         name='ctags_item_ct_ctag_object'),
+            # Backs the pages of get_mixed_page.
+            models.Index(fields=['ctag', 'id'], name='ctags_item_ctag_id'),
+        ]
         verbose_name = _('tagged item')
         verbose_name_plural = _('tagged items')
 
     def __str__(self):
         return '%s [%s]' % (smart_str(self.object), smart_str(self.ctag))
+
+
+class CTagTrend(models.Model):
+    """
+    Exponentially decayed usage score of a ctag, for one content type or
+    for all of them when ``content_type`` is null.
+
+    The score is stored as ``log_score``, the logarithm of the sum of
+    ``exp(decay * (used - EPOCH))`` over the times the ctag was used.
+    Decaying all the scores by the same factor preserving their order,
+    ranking needs no update as time passes.
+    """
+    ctag = models.ForeignKey(
+        CTag,
+        verbose_name=_('ctag'),
+        related_name='trends',
+        on_delete=models.CASCADE)
+
+    content_type = models.ForeignKey(
+        ContentType,
+        verbose_name=_('content type'),
+        null=True, blank=True,
+        on_delete=models.CASCADE)
+
+    log_score = models.FloatField(_('log score'))
+
+    last_used = models.DateTimeField(_('last used'))
+
+    class Meta:
+        unique_together = (('ctag', 'content_type'),)
+        constraints = [
+            # The NULLs of the rows of all the content types never
+            # conflict in the unique index above.
+            models.UniqueConstraint(fields=['ctag'],
+                                    condition=Q(content_type=None),
+                                    name='ctags_trend_ctag_all'),
+        ]
+        indexes = [
+            models.Index(fields=['content_type', 'log_score'],
+                         name='ctags_trend_ct_score'),
+        ]
+        verbose_name = _('ctag trend')
+        verbose_name_plural = _('ctag trends')
+
+    def __str__(self):
+        return '%s [%s]' % (smart_str(self.ctag), self.log_score)
+
+
+class CTagChange(models.Model):
+    """
+    An entry of the log of the ctags added to and removed from objects,
+    read in ``id`` order by downstream consumers. See ``ctags.changelog``.
+    """
+    id = models.BigAutoField(primary_key=True)
+
+    content_type = models.ForeignKey(
+        ContentType,
+        verbose_name=_('content type'),
+        on_delete=models.CASCADE)
+
+    object_id = models.PositiveIntegerField(_('object id'))
+
+    # Not a foreign key, so that changes outlive the ctags.
+    ctag_id = models.PositiveIntegerField(_('ctag id'))
+
+    added = models.BooleanField(_('added'))
+
+    created = models.DateTimeField(
+        _('created'), default=timezone.now, db_index=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['content_type', 'object_id', 'ctag_id'],
+                         name='ctags_change_object_ctag'),
+        ]
+        verbose_name = _('ctag change')
+        verbose_name_plural = _('ctag changes')
+
+    def __str__(self):
+        return '%s %s %s.%s' % (self.added and '+' or '-', self.ctag_id,
+                                self.content_type_id, self.object_id)
@@ -0,0 +1,162 @@
+"""
+Read-through cache of the ctag ids of each object, shared by the
+processes through the default cache.
+
+The ids are packed as unsigned 32-bit integers, and turned into ``CTag``
+instances from an in-process copy of the vocabulary, so that a warm
+lookup makes no database query. The entries are invalidated by the
+writes of ``CTaggedItem`` rows when the ``CTAGS_OBJECT_CACHE`` setting
+is enabled; otherwise every lookup reads the database.
+"""
+import struct
+import threading
+
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
+from django.db import router
+from django.db import transaction
+
+from ctags import settings
+from ctags.autotag import GENERATION_CACHE_KEY
+from ctags.models import CTag
+from ctags.models import CTaggedItem
+
+
+def make_key(content_type_id, object_id):
+    return 'ctags.object.%d.%d' % (content_type_id, object_id)
+
+
+def pack(tag_ids):
+    return struct.pack('<%dI' % len(tag_ids), *tag_ids)
+
+
+def unpack(data):
+    return struct.unpack('<%dI' % (len(data) // 4), data)
+
+
+def _get_keys(objects, using):
+    """
+    Returns the ``(content_type_id, object_id)`` pair of each of
+    ``objects``.
+    """
+    content_types = ContentType.objects.db_manager(using)
+    return [(content_types.get_for_model(obj).pk, obj.pk) for obj in objects]
+
+
+def get_tag_ids_many(objects, using=None):
+    """
+    Returns a dictionary of the tuple of ctag ids of each of ``objects``
+    by ``(content_type_id, object_id)``, from a single cache lookup and,
+    for the objects missing from the cache, a query per content type.
+    """
+    db = using or router.db_for_read(CTaggedItem)
+    keys = _get_keys(objects, db)
+    tag_ids = {}
+    if settings.CTAGS_OBJECT_CACHE:
+        cached = cache.get_many([make_key(*key) for key in keys])
+        for key in keys:
+            data = cached.get(make_key(*key))
+            if data is not None:
+                tag_ids[key] = unpack(data)
+    missing = {}
+    for content_type_id, object_id in keys:
+        if (content_type_id, object_id) not in tag_ids:
+            missing.setdefault(content_type_id, set()).add(object_id)
+    if not missing:
+        return tag_ids
+    fetched = {}
+    items = CTaggedItem._default_manager.using(db)
+    for content_type_id, object_ids in missing.items():
+        for object_id in object_ids:
+            fetched[content_type_id, object_id] = []
+        for object_id, ctag_id in items.filter(
+                content_type=content_type_id,
+                object_id__in=object_ids).values_list(
+                    'object_id', 'ctag_id').order_by('ctag_id'):
+            fetched[content_type_id, object_id].append(ctag_id)
+    for key, ids in fetched.items():
+        tag_ids[key] = tuple(ids)
+    if settings.CTAGS_OBJECT_CACHE:
+        cache.set_many({make_key(*key): pack(ids)
+                        for key, ids in fetched.items()},
+                       settings.CTAGS_OBJECT_CACHE_TIMEOUT)
+    return tag_ids
+
+
+def get_tag_ids(obj, using=None):
+    """
+    Returns the tuple of the ids of the ctags of ``obj``.
+    """
+    return list(get_tag_ids_many([obj], using).values())[0]
+
+
+_lock = threading.Lock()
+_vocabularies = {}
+
+
+def get_vocabulary(using=None, refresh=False):
+    """
+    Returns the dictionary of all the ctags by id, loaded once per
+    process and database, and again when the vocabulary changed since.
+    """
+    db = using or router.db_for_read(CTag)
+    generation = cache.get_or_set(GENERATION_CACHE_KEY, 0, None)
+    with _lock:
+        loaded = _vocabularies.get(db)
+        if refresh or loaded is None or loaded[0] != generation:
+            loaded = _vocabularies[db] = (generation, {
+                tag.pk: tag for tag in CTag.objects.using(db)})
+        return loaded[1]
+
+
+def get_tags_many(objects, using=None):
+    """
+    Returns a dictionary of the list of ``CTag`` of each of ``objects``
+    by ``(content_type_id, object_id)``, ordered like ctags are.
+    """
+    tag_ids = get_tag_ids_many(objects, using)
+    vocabulary = get_vocabulary(using)
+    if any(tag_id not in vocabulary
+           for ids in tag_ids.values() for tag_id in ids):
+        # The ctag was created too recently for this copy.
+        vocabulary = get_vocabulary(using, refresh=True)
+    return {key: sorted((vocabulary[tag_id] for tag_id in ids
+                         if tag_id in vocabulary),
+                        key=lambda tag: tag.name_en.lower())
+            for key, ids in tag_ids.items()}
+
+
+def get_tags(obj, using=None):
+    """
+    Returns the list of the ``CTag`` of ``obj``.
+    """
+    return list(get_tags_many([obj], using).values())[0]
+
+
+def invalidate(keys, using=None):
+    """
+    Removes the entries of the ``(content_type_id, object_id)`` pairs
+    ``keys`` from the cache, when it is enabled, once the current
+    transaction of the ``using`` database commits: removed any earlier,
+    a concurrent lookup could cache the rows about to change again.
+    """
+    if settings.CTAGS_OBJECT_CACHE:
+        cache_keys = [make_key(*key) for key in set(keys)]
+        transaction.on_commit(lambda: cache.delete_many(cache_keys),
+                              using=using)
+
+
+def invalidate_items(items, using=None):
+    """
+    Removes the entries of the objects of the given ``CTaggedItem``
+    instances from the cache, once the transaction commits.
+    """
+    invalidate(((item.content_type_id, item.object_id) for item in items),
+               using)
+
+
+def item_changed(sender, instance, using=None, **kwargs):
+    """
+    ``post_save`` and ``post_delete`` receiver of ``CTaggedItem``.
+    """
+    invalidate_items([instance], using)
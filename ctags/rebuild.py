@@ -0,0 +1,271 @@
+"""
+Parallel rebuilds of the data derived from the tagged items, such as the
+trending scores, after bulk imports.
+
+A ``Rebuilder`` maps the tagged items of a partition, a content type and
+a range of object ids, to a partial result, then merges the partial
+results and saves the whole. ``run`` maps the partitions in a pool of
+processes, each with its own database connection, and appends the
+partial results to a state file as they complete, so that an
+interrupted run resumes where it stopped.
+"""
+import os
+import pickle
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import as_completed
+
+from django.core.cache import cache
+from django.db import connections
+from django.db import router
+from django.utils.module_loading import import_string
+
+from ctags import objectcache
+from ctags import settings
+from ctags import trending
+from ctags.models import CTaggedItem
+
+# The items of a content type whose object id is at least ``start`` and
+# less than ``stop``, or without upper bound when ``stop`` is None. All
+# the items of an object belong to the same partition.
+Partition = namedtuple('Partition', ('content_type_id', 'start', 'stop'))
+
+
+class Rebuilder(object):
+    """
+    Base class of the rebuilds. The partial results must be picklable,
+    to be sent back by the worker processes and kept in the state file.
+    """
+    # Fields of the tagged items given to ``map``.
+    fields = ('ctag_id', 'content_type_id', 'object_id')
+
+    def map(self, rows):
+        """
+        Returns the partial result of the tuples of ``fields`` of the
+        items of a partition, ordered by object id.
+        """
+        raise NotImplementedError
+
+    def merge(self, results):
+        """
+        Returns the result of the list of partial results, in the order
+        of their partitions.
+        """
+        raise NotImplementedError
+
+    def save(self, result, using):
+        """
+        Stores ``result`` on the ``using`` database.
+        """
+
+
+class TrendingRebuilder(Rebuilder):
+    """
+    Computes the trending scores of the ctags, like
+    ``ctags.trending.rebuild``.
+    """
+    fields = ('ctag_id', 'content_type_id', 'created')
+
+    def map(self, rows):
+        scores = {}
+        for ctag_id, content_type_id, created in rows:
+            if created is None:
+                continue
+            weight = trending.log_weight(created)
+            for key in ((ctag_id, content_type_id), (ctag_id, None)):
+                trending.add_score(scores, key, weight, created)
+        return scores
+
+    def merge(self, results):
+        scores = {}
+        for partial in results:
+            for key, (log_score, last_used) in partial.items():
+                trending.add_score(scores, key, log_score, last_used)
+        return scores
+
+    def save(self, result, using):
+        trending.save_scores(result, using)
+
+
+class ObjectCacheRebuilder(Rebuilder):
+    """
+    Fills the cache of ``ctags.objectcache`` with the ctag ids of every
+    tagged object, from the workers. The result is the number of
+    objects.
+    """
+    fields = ('content_type_id', 'object_id', 'ctag_id')
+
+    def map(self, rows):
+        count = 0
+        entries = {}
+        current = None
+        tag_ids = []
+        for content_type_id, object_id, ctag_id in rows:
+            if (content_type_id, object_id) != current:
+                if current is not None:
+                    entries[objectcache.make_key(*current)] = (
+                        objectcache.pack(sorted(tag_ids)))
+                current = (content_type_id, object_id)
+                tag_ids = []
+                count += 1
+                if len(entries) >= 1000:
+                    cache.set_many(entries,
+                                   settings.CTAGS_OBJECT_CACHE_TIMEOUT)
+                    entries = {}
+            tag_ids.append(ctag_id)
+        if current is not None:
+            entries[objectcache.make_key(*current)] = objectcache.pack(
+                sorted(tag_ids))
+        cache.set_many(entries, settings.CTAGS_OBJECT_CACHE_TIMEOUT)
+        return count
+
+    def merge(self, results):
+        return sum(results)
+
+
+# Rebuilders available by name, along with the ``CTAGS_REBUILDERS``
+# setting.
+REBUILDERS = {
+    'trending': 'ctags.rebuild.TrendingRebuilder',
+    'objectcache': 'ctags.rebuild.ObjectCacheRebuilder',
+}
+
+
+def get_rebuilder(name):
+    """
+    Returns an instance of the rebuilder registered as ``name``, or of
+    the class at the dotted path ``name``.
+    """
+    paths = dict(REBUILDERS, **settings.CTAGS_REBUILDERS)
+    return import_string(paths.get(name, name))()
+
+
+def get_partitions(using=None, partition_size=100000):
+    """
+    Returns the list of the partitions of about ``partition_size`` items
+    covering all the tagged items, from a query per partition.
+    """
+    db = using or router.db_for_read(CTaggedItem)
+    items = CTaggedItem._default_manager.using(db)
+    partitions = []
+    for content_type_id in items.order_by('content_type').values_list(
+            'content_type', flat=True).distinct():
+        object_ids = items.filter(content_type=content_type_id).order_by(
+            'object_id').values_list('object_id', flat=True)
+        start = object_ids.first()
+        while start is not None:
+            stop = object_ids.filter(object_id__gte=start)[
+                partition_size:partition_size + 1].first()
+            if stop == start:
+                # A single object has more items than a partition.
+                stop = object_ids.filter(object_id__gt=start).first()
+            partitions.append(Partition(content_type_id, start, stop))
+            start = stop
+    return partitions
+
+
+def map_partition(name, using, partition, chunk_size=10000):
+    """
+    Returns the partial result of the rebuilder ``name`` for
+    ``partition``.
+    """
+    rebuilder = get_rebuilder(name)
+    items = CTaggedItem._default_manager.using(using).filter(
+        content_type=partition.content_type_id,
+        object_id__gte=partition.start)
+    if partition.stop is not None:
+        items = items.filter(object_id__lt=partition.stop)
+    return rebuilder.map(items.order_by('object_id').values_list(
+        *rebuilder.fields).iterator(chunk_size=chunk_size))
+
+
+def _init_worker():
+    import django
+
+    # Sets Django up again in the processes started rather than forked.
+    django.setup()
+
+
+def _read_state(path, name, using):
+    """
+    Returns the partitions and the dictionary of the partial results by
+    partition index recorded in the state file at ``path``, up to the
+    last complete record.
+    """
+    results = {}
+    with open(path, 'rb') as stream:
+        header = pickle.load(stream)
+        if header[:2] != (name, using):
+            raise ValueError('%s is the state of another rebuild.' % path)
+        while True:
+            try:
+                index, result = pickle.load(stream)
+            except (EOFError, pickle.UnpicklingError):
+                break
+            results[index] = result
+    return header[2], results
+
+
+def run(name, using=None, workers=None, partition_size=100000, state=None,
+        resume=False, progress=None):
+    """
+    Runs the rebuilder ``name`` on ``workers`` processes, the number of
+    CPUs by default, or in the calling process when ``workers`` is 1.
+    Returns the merged result.
+
+    The partial results are recorded in the ``state`` file, if given,
+    which is removed once the result is saved. With ``resume``, the
+    partitions recorded in an existing state file are not mapped again.
+
+    ``progress``, if given, is called with the number of partitions done
+    and their total after each one.
+    """
+    db = using or router.db_for_read(CTaggedItem)
+    rebuilder = get_rebuilder(name)
+    if resume and state and os.path.exists(state):
+        partitions, results = _read_state(state, name, db)
+    else:
+        partitions, results = get_partitions(db, partition_size), {}
+        if state:
+            with open(state, 'wb') as stream:
+                pickle.dump((name, db, partitions), stream)
+    pending = [index for index in range(len(partitions))
+               if index not in results]
+
+    stream = state and open(state, 'ab')
+    try:
+        def done(index, result):
+            results[index] = result
+            if stream:
+                pickle.dump((index, result), stream)
+                stream.flush()
+            if progress is not None:
+                progress(len(results), len(partitions))
+
+        if workers == 1:
+            for index in pending:
+                done(index, map_partition(name, db, partitions[index]))
+        elif pending:
+            # The workers must not share the connections of this process.
+            connections.close_all()
+            pool = ProcessPoolExecutor(workers, initializer=_init_worker)
+            futures = {pool.submit(map_partition, name, db,
+                                   partitions[index]): index
+                       for index in pending}
+            try:
+                for future in as_completed(futures):
+                    done(futures[future], future.result())
+            finally:
+                for future in futures:
+                    future.cancel()
+                pool.shutdown()
+    finally:
+        if stream:
+            stream.close()
+
+    result = rebuilder.merge([results[index]
+                              for index in range(len(partitions))])
+    rebuilder.save(result, db)
+    if state:
+        os.remove(state)
+    return result
@@ -1,8 +1,14 @@
 """
 Registry for tagging.
 """
+from django.contrib.contenttypes.fields import GenericRelation
+from django.contrib.contenttypes.models import ContentType
+from django.db.models import signals
+
 from ctags.managers import ModelTaggedItemManager
+from ctags.managers import RelatedCTagDescriptor
 from ctags.managers import TagDescriptor
+from ctags.models import CTaggedItem
 
 registry = []
 
@@ -14,10 +20,30 @@ class AlreadyRegistered(Exception):
     pass
 
 
+def delete_tagged_items(sender, instance, using, **kwargs):
+    """
+    ``post_delete`` receiver removing the tagged items of the deleted
+    ``instance``.
+    """
+    content_type = ContentType.objects.db_manager(using).get_for_model(
+        instance)
+    CTaggedItem.objects.using(using).filter(
+        content_type=content_type, object_id=instance.pk).delete()
+
+
 def register(model, tag_descriptor_attr='tags',
-             tagged_item_manager_attr='tagged'):
+             tagged_item_manager_attr='tagged', delete_tags=False,
+             relations=False):
     """
     Sets the given model class up for working with tags.
+
+    If ``delete_tags`` is True, the tagged items of the model's
+    instances are deleted along with them.
+
+    If ``relations`` is True, the model is also given a ``ctagged_items``
+    ``GenericRelation`` to its tagged items and a ``ctags`` relation to
+    its ctags, which both support ``prefetch_related``. The tagged items
+    are then deleted along with the instances, as by ``delete_tags``.
     """
     if model in registry:
         raise AlreadyRegistered(
@@ -40,6 +66,17 @@ def register(model, tag_descriptor_attr='tags',
             )
         )
 
+    if relations:
+        for attr in ('ctagged_items', 'ctags'):
+            if hasattr(model, attr):
+                raise AttributeError(
+                    "'%s' already has an attribute '%s'. You cannot "
+                    "register it with relations." % (
+                        model._meta.object_name,
+                        attr,
+                    )
+                )
+
     # Add tag descriptor
     setattr(model, tag_descriptor_attr, TagDescriptor())
 
@@ -47,5 +84,13 @@ def register(model, tag_descriptor_attr='tags',
     ModelTaggedItemManager().contribute_to_class(
         model, tagged_item_manager_attr)
 
+    if relations:
+        GenericRelation(CTaggedItem).contribute_to_class(
+            model, 'ctagged_items')
+        setattr(model, 'ctags', RelatedCTagDescriptor('ctags'))
+
+    if delete_tags:
+        signals.post_delete.connect(delete_tagged_items, sender=model)
+
     # Finally register in registry
     registry.append(model)
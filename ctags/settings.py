@@ -11,3 +11,58 @@ MAX_TAG_LENGTH = getattr(settings, 'MAX_TAG_LENGTH', 50)
 # Whether to force all tags to lowercase
 # before they are saved to the database.
 FORCE_LOWERCASE_TAGS = getattr(settings, 'FORCE_LOWERCASE_TAGS', False)
+
+# Dotted paths of receivers connected to the
+# ``ctags.instrumentation.manager_call`` signal at startup,
+# e.g. ``ctags.instrumentation.log_call`` or ``ctags.instrumentation.stats``.
+CTAGS_INSTRUMENTATION_RECEIVERS = getattr(
+    settings, 'CTAGS_INSTRUMENTATION_RECEIVERS', [])
+
+# Duration in seconds from which a manager call is reported as slow,
+# or None to never report calls as slow.
+CTAGS_SLOW_CALL_THRESHOLD = getattr(
+    settings, 'CTAGS_SLOW_CALL_THRESHOLD', None)
+
+# Interval in seconds between two merges of the in-process call
+# statistics into the cache.
+CTAGS_STATS_FLUSH_INTERVAL = getattr(
+    settings, 'CTAGS_STATS_FLUSH_INTERVAL', 60)
+
+# Whether the asynchronous reads of the managers run each in a thread of
+# their own, concurrently, rather than in the thread shared by Django's
+# ``sync_to_async``. Concurrent reads do not see the uncommitted changes
+# of the calling thread's transaction.
+CTAGS_ASYNC_CONCURRENT_READS = getattr(
+    settings, 'CTAGS_ASYNC_CONCURRENT_READS', True)
+
+# Whether the trending scores of the ctags are updated as they are used.
+CTAGS_TRENDING = getattr(settings, 'CTAGS_TRENDING', False)
+
+# Duration in seconds after which a use of a ctag counts half as much
+# in its trending score.
+CTAGS_TRENDING_HALF_LIFE = getattr(
+    settings, 'CTAGS_TRENDING_HALF_LIFE', 7 * 24 * 3600)
+
+# Whether the ctags added to and removed from objects are logged in the
+# ``CTagChange`` table, for downstream consumers.
+CTAGS_CHANGE_LOG = getattr(settings, 'CTAGS_CHANGE_LOG', False)
+
+# Whether the ctag ids of each object are cached by ``ctags.objectcache``,
+# and the number of seconds they are kept, or None to keep them forever.
+CTAGS_OBJECT_CACHE = getattr(settings, 'CTAGS_OBJECT_CACHE', False)
+CTAGS_OBJECT_CACHE_TIMEOUT = getattr(
+    settings, 'CTAGS_OBJECT_CACHE_TIMEOUT', 24 * 3600)
+
+# Whether ``ctags.facets`` caches its results, and the number of seconds
+# they are kept, bounding how stale the objects listed may get.
+CTAGS_FACET_CACHE = getattr(settings, 'CTAGS_FACET_CACHE', False)
+CTAGS_FACET_CACHE_TIMEOUT = getattr(settings, 'CTAGS_FACET_CACHE_TIMEOUT', 300)
+
+# Number of objects sampled by the approximate usage of the ctags. Smaller
+# sets of objects are counted exactly.
+CTAGS_APPROXIMATE_SAMPLE_SIZE = getattr(
+    settings, 'CTAGS_APPROXIMATE_SAMPLE_SIZE', 10000)
+
+# Dotted paths of ``ctags.rebuild.Rebuilder`` classes by name, run by the
+# ``ctags_rebuild`` command in addition to the built-in ones.
+CTAGS_REBUILDERS = getattr(settings, 'CTAGS_REBUILDERS', {})
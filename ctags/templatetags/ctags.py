@@ -1,6 +1,7 @@
 """
 Templatetags for ctags.
 """
+from asgiref.sync import sync_to_async
 from django.apps.registry import apps
 from django.template import Library
 from django.template import Node
@@ -8,6 +9,7 @@ from django.template import TemplateSyntaxError
 from django.template import Variable
 from django.utils.translation import gettext as _
 
+from ctags.facets import get_cloud
 from ctags.models import CTag
 from ctags.models import CTaggedItem
 from ctags.utils import LINEAR
@@ -17,6 +19,91 @@ from ctags.utils import LOGARITHMIC
 register = Library()
 
 
+def _get_model(model_name, tag_name):
+    model = apps.get_model(*model_name.split('.'))
+    if model is None:
+        raise TemplateSyntaxError(
+            _('%(tag)s tag was given an invalid model: %(model)s') % {
+                'tag': tag_name,
+                'model': model_name,
+            })
+    return model
+
+
+def load_ctags_for_model(model, counts=False):
+    """
+    Loads the data of the ``ctags_for_model`` tag.
+    """
+    return CTag.objects.usage_for_model(
+        _get_model(model, 'ctags_for_model'), counts=counts)
+
+
+def load_ctag_cloud_for_model(model, **kwargs):
+    """
+    Loads the data of the ``ctag_cloud_for_model`` tag, for a model or
+    a comma separated list of models. The cloud of a model is cached
+    with ``CTAGS_FACET_CACHE``.
+    """
+    if ',' in model:
+        return CTag.objects.cloud_for_models(
+            [_get_model(name, 'ctag_cloud_for_model')
+             for name in model.split(',')], **kwargs)
+    return get_cloud(_get_model(model, 'ctag_cloud_for_model'), **kwargs)
+
+
+def load_ctags_for_object(obj):
+    """
+    Loads the data of the ``ctags_for_object`` tag.
+    """
+    return CTag.objects.get_for_object(obj)
+
+
+def load_ctagged_objects(tag, model):
+    """
+    Loads the data of the ``ctagged_objects`` tag.
+    """
+    return CTaggedItem.objects.get_by_model(
+        _get_model(model, 'ctagged_objects'), tag)
+
+
+async def aload_ctags_for_model(model, counts=False):
+    """
+    Asynchronous version of ``load_ctags_for_model``, for views which
+    load the data up front and pass it in the template context.
+    """
+    return await CTag.objects.ausage_for_model(
+        _get_model(model, 'ctags_for_model'), counts=counts)
+
+
+async def aload_ctag_cloud_for_model(model, **kwargs):
+    """
+    Asynchronous version of ``load_ctag_cloud_for_model``.
+    """
+    if ',' in model:
+        return await CTag.objects.acloud_for_models(
+            [_get_model(name, 'ctag_cloud_for_model')
+             for name in model.split(',')], **kwargs)
+    return await sync_to_async(get_cloud)(
+        _get_model(model, 'ctag_cloud_for_model'), **kwargs)
+
+
+async def aload_ctags_for_object(obj):
+    """
+    Asynchronous version of ``load_ctags_for_object``.
+    """
+    return await CTag.objects.aget_for_object(obj)
+
+
+async def aload_ctagged_objects(tag, model):
+    """
+    Asynchronous version of ``load_ctagged_objects``, evaluating the
+    ``QuerySet``.
+    """
+    queryset = await CTaggedItem.objects.aget_by_model(
+        _get_model(model, 'ctagged_objects'), tag)
+    return [obj async for obj in queryset]
+
+
 class TagsForModelNode(Node):
     def __init__(self, model, context_var, counts):
         self.model = model
@@ -24,13 +111,8 @@ class TagsForModelNode(Node):
         self.counts = counts
 
     def render(self, context):
-        model = apps.get_model(*self.model.split('.'))
-        if model is None:
-            raise TemplateSyntaxError(
-                _('ctags_for_model tag was given an invalid model: %s') %
-                self.model)
-        context[self.context_var] = CTag.objects.usage_for_model(
-            model, counts=self.counts)
+        context[self.context_var] = load_ctags_for_model(
+            self.model, counts=self.counts)
         return ''
 
 
@@ -41,13 +123,8 @@ class TagCloudForModelNode(Node):
         self.kwargs = kwargs
 
     def render(self, context):
-        model = apps.get_model(*self.model.split('.'))
-        if model is None:
-            raise TemplateSyntaxError(
-                _('ctag_cloud_for_model tag was given an invalid model: %s') %
-                self.model)
-        context[self.context_var] = CTag.objects.cloud_for_model(
-            model, **self.kwargs)
+        context[self.context_var] = load_ctag_cloud_for_model(
+            self.model, **self.kwargs)
         return ''
 
 
@@ -58,7 +135,7 @@ class TagsForObjectNode(Node):
 
     def render(self, context):
         context[self.context_var] = \
-            CTag.objects.get_for_object(self.obj.resolve(context))
+            load_ctags_for_object(self.obj.resolve(context))
         return ''
 
 
@@ -69,13 +146,8 @@ class TaggedObjectsNode(Node):
         self.model = model
 
     def render(self, context):
-        model = apps.get_model(*self.model.split('.'))
-        if model is None:
-            raise TemplateSyntaxError(
-                _('ctagged_objects tag was given an invalid model: %s') %
-                self.model)
-        context[self.context_var] = CTaggedItem.objects.get_by_model(
-            model, self.tag.resolve(context))
+        context[self.context_var] = load_ctagged_objects(
+            self.tag.resolve(context), self.model)
         return ''
 
 
@@ -136,7 +208,9 @@ def do_ctag_cloud_for_model(parser, token):
 
        {% ctag_cloud_for_model [model] as [varname] %}
 
-    The model is specified in ``[appname].[modelname]`` format.
+    The model is specified in ``[appname].[modelname]`` format. Several
+    models may be given separated by commas, without spaces, for a cloud
+    of the tags of all their instances.
 
     Extended usage::
 
@@ -162,6 +236,7 @@ def do_ctag_cloud_for_model(parser, token):
        {% ctag_cloud_for_model products.Widget as widget_tags %}
        {% ctag_cloud_for_model products.Widget as widget_tags
                    with steps=9 min_count=3 distribution=log %}
+       {% ctag_cloud_for_model products.Widget,blog.Entry as site_tags %}
 
     """
     bits = token.contents.split()
@@ -0,0 +1,35 @@
+"""
+Models of the ctags tests.
+"""
+from django.db import models
+
+from ctags.fields import TagField
+from ctags.registry import register
+
+
+class Article(models.Model):
+    title = models.CharField(max_length=100)
+
+    def __str__(self):
+        return self.title
+
+
+register(Article)
+
+
+class Event(models.Model):
+    title = models.CharField(max_length=100)
+
+    def __str__(self):
+        return self.title
+
+
+register(Event, relations=True)
+
+
+class Post(models.Model):
+    title = models.CharField(max_length=100)
+    tags = TagField()
+
+    def __str__(self):
+        return self.title
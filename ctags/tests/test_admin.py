@@ -0,0 +1,40 @@
+"""
+Tests of the ctags admin.
+"""
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ctags.tests.test_queries import create_articles
+from ctags.tests.test_queries import create_tags
+
+
+class TagAdminTestCase(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.tags = create_tags(5)
+        create_articles(5, cls.tags)
+        cls.user = User.objects.create_superuser(
+            'admin', 'admin@example.com', 'password')
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def test_changelist(self):
+        response = self.client.get(
+            reverse('admin:ctags_ctag_changelist'), {'o': '9'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([tag.usage for tag in
+                          response.context['cl'].result_list], [3] * 5)
+
+    def test_change(self):
+        # The change form does not count the items of the ctag.
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse(
+                'admin:ctags_ctag_change', args=[self.tags[0].pk]))
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse([query for query in queries.captured_queries
+                          if 'GROUP BY' in query['sql']])
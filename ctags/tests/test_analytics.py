@@ -0,0 +1,99 @@
+"""
+Tests of the incidence matrix of the tagged items.
+"""
+from unittest import mock
+
+from django.contrib.contenttypes.models import ContentType
+from django.test import TestCase
+
+from ctags.analytics import IncidenceMatrix
+from ctags.models import CTag
+from ctags.models import CTaggedItem
+from ctags.tests.models import Article
+from ctags.tests.models import Post
+from ctags.tests.test_queries import create_articles
+from ctags.tests.test_queries import create_tags
+from ctags.tests.test_queries import get_tag_indexes
+
+
+class IncidenceMatrixTestCase(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.tags = create_tags(5)
+        cls.articles = create_articles(4, cls.tags)
+        cls.post = Post.objects.create(title='post')
+        CTag.objects.bulk_add_tags([(cls.post, [cls.tags[0].pk])])
+        content_type = ContentType.objects.get_for_model(Article)
+        # The ctag ids of each article, by row key.
+        cls.expected = {
+            (content_type.pk, article.pk): {
+                cls.tags[tag_index].pk
+                for tag_index in get_tag_indexes(index, len(cls.tags))}
+            for index, article in enumerate(cls.articles)}
+
+    def get_expected_counts(self):
+        counts = {}
+        for tag_ids in self.expected.values():
+            for tag_id in tag_ids:
+                for other_tag_id in tag_ids:
+                    if tag_id < other_tag_id:
+                        pair = (tag_id, other_tag_id)
+                        counts[pair] = counts.get(pair, 0) + 1
+        return counts
+
+    def get_pairs(self, counts):
+        # The pairs are ordered by column rather than by ctag id.
+        return {tuple(sorted(pair)): count for pair, count in counts.items()}
+
+    def check_matrix(self, matrix):
+        self.assertEqual(matrix.shape, (4, 5))
+        self.assertEqual(sorted(matrix.objects), sorted(self.expected))
+        self.assertEqual(list(matrix.indptr), [0, 3, 6, 9, 12])
+        for index, key in enumerate(matrix.objects):
+            row = list(matrix.row(index))
+            self.assertEqual(row, sorted(row))
+            self.assertEqual({matrix.tag_ids[column] for column in row},
+                             self.expected[key])
+        self.assertEqual(
+            {matrix.tag_ids[column]: int(frequency) for column, frequency
+             in enumerate(matrix.tag_frequencies())},
+            {tag.pk: 3 if tag in self.tags[2:4] else 2 for tag in self.tags})
+        expected = self.get_expected_counts()
+        self.assertEqual(self.get_pairs(matrix.cooccurrence()), expected)
+        self.assertEqual(
+            self.get_pairs(matrix.cooccurrence(min_count=2)),
+            {pair: count for pair, count in expected.items() if count >= 2})
+        self.assertEqual(
+            self.get_pairs(matrix.jaccard(min_count=2)),
+            {(self.tags[1].pk, self.tags[2].pk): 2 / 3.0,
+             (self.tags[2].pk, self.tags[3].pk): 2 / 4.0,
+             (self.tags[3].pk, self.tags[4].pk): 2 / 3.0})
+
+    def test_from_database(self):
+        matrix = IncidenceMatrix.from_database([Article], chunk_size=2)
+        self.check_matrix(matrix)
+        self.assertEqual(
+            matrix.to_scipy().toarray().tolist(),
+            [[int(column in matrix.row(index))
+              for column in range(len(matrix.tag_ids))]
+             for index in range(len(matrix.objects))])
+        # The post adds a row, of an already known ctag.
+        self.assertEqual(IncidenceMatrix.from_database().shape, (5, 5))
+
+    def test_without_scipy(self):
+        matrix = IncidenceMatrix.from_database([Article])
+        with mock.patch('ctags.analytics.numpy', None), \
+                mock.patch('ctags.analytics.sparse', None):
+            self.check_matrix(matrix)
+            with self.assertRaises(ImportError):
+                matrix.to_scipy()
+
+    def test_empty(self):
+        CTaggedItem.objects.all().delete()
+        matrix = IncidenceMatrix.from_database()
+        self.assertEqual(matrix.shape, (0, 0))
+        self.assertEqual(matrix.to_scipy().shape, (0, 0))
+        self.assertEqual(list(matrix.tag_frequencies()), [])
+        self.assertEqual(matrix.cooccurrence(), {})
+        self.assertEqual(matrix.jaccard(), {})
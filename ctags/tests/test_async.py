@@ -0,0 +1,158 @@
+"""
+Tests of the asynchronous methods of the ctags managers.
+"""
+import asyncio
+import threading
+from unittest import mock
+
+from asgiref.sync import sync_to_async
+from django.test import TestCase
+from django.test import TransactionTestCase
+
+from ctags.models import CTag
+from ctags.models import CTaggedItem
+from ctags.tests.models import Article
+from ctags.tests.models import Event
+from ctags.tests.test_queries import create_articles
+from ctags.tests.test_queries import create_tags
+
+
+def get_names(ctags):
+    return sorted((ctag.name_en, getattr(ctag, 'count', None))
+                  for ctag in ctags)
+
+
+class AsyncTestMixin(object):
+
+    def create_data(self):
+        self.tags = create_tags(5)
+        self.articles = create_articles(5, self.tags)
+        self.event = Event.objects.create(title='event')
+        CTag.objects.bulk_add_tags([(self.event, [self.tags[0].pk])])
+
+    def get_reads(self):
+        """
+        Returns the pairs of equivalent asynchronous and synchronous
+        reads.
+        """
+        tags = self.tags[:2]
+        article = self.articles[0]
+        queryset = Article.objects.filter(title__in=['article0', 'article1'])
+        return [
+            (CTag.objects.ausage_for_model(Article, counts=True),
+             lambda: CTag.objects.usage_for_model(Article, counts=True)),
+            (CTag.objects.ausage_for_queryset(queryset, counts=True),
+             lambda: CTag.objects.usage_for_queryset(queryset, counts=True)),
+            (CTag.objects.arelated_for_model(tags, Article, counts=True),
+             lambda: CTag.objects.related_for_model(tags, Article,
+                                                    counts=True)),
+            (CTag.objects.acloud_for_model(Article),
+             lambda: CTag.objects.cloud_for_model(Article)),
+            (CTag.objects.ausage_for_models([Article, Event], counts=True),
+             lambda: CTag.objects.usage_for_models([Article, Event],
+                                                   counts=True)),
+            (CTag.objects.acloud_for_models([Article, Event]),
+             lambda: CTag.objects.cloud_for_models([Article, Event])),
+            (CTaggedItem.objects.aget_related(article, Article),
+             lambda: CTaggedItem.objects.get_related(article, Article)),
+        ]
+
+    async def check_reads(self):
+        """
+        Checks that the asynchronous reads, awaited together, return
+        the results of the synchronous ones.
+        """
+        reads = self.get_reads()
+        results = await asyncio.gather(*[read for read, _ in reads])
+        for result, (_, read) in zip(results, reads):
+            expected = await sync_to_async(read)()
+            if expected and isinstance(expected[0], CTag):
+                self.assertEqual(get_names(result), get_names(expected))
+                self.assertEqual(
+                    [getattr(ctag, 'font_size', None) for ctag in result],
+                    [getattr(ctag, 'font_size', None) for ctag in expected])
+            else:
+                self.assertEqual(result, expected)
+
+
+class AsyncTestCase(AsyncTestMixin, TestCase):
+    """
+    The reads run in the thread of the test, within its transaction.
+    """
+    def setUp(self):
+        self.create_data()
+        patcher = mock.patch('ctags.settings.CTAGS_ASYNC_CONCURRENT_READS',
+                             False)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def test_reads(self):
+        await self.check_reads()
+
+    async def test_get_by_model(self):
+        queryset = await CTaggedItem.objects.aget_by_model(
+            Article, self.tags[:2])
+        self.assertEqual(
+            sorted([article.title async for article in queryset]),
+            ['article0', 'article4'])
+        queryset = await CTaggedItem.objects.aget_union_by_model(
+            Article, self.tags[:2])
+        self.assertEqual(
+            sorted([article.title async for article in queryset]),
+            ['article0', 'article1', 'article3', 'article4'])
+
+    async def test_get_mixed_page(self):
+        pages = []
+        cursor = None
+        while True:
+            page = await CTaggedItem.objects.aget_mixed_page(
+                self.tags[0], after=cursor, limit=2)
+            self.assertEqual(page, await sync_to_async(
+                CTaggedItem.objects.get_mixed_page)(
+                    self.tags[0], after=cursor, limit=2))
+            pages.append(page[0])
+            cursor = page[1]
+            if cursor is None:
+                break
+        self.assertEqual(
+            {obj for objects in pages for obj in objects},
+            {self.articles[0], self.articles[3], self.articles[4],
+             self.event})
+
+    async def test_update_tags(self):
+        article = self.articles[0]
+        tag_ids = [self.tags[3].pk, self.tags[0].pk]
+        await CTag.objects.aupdate_tags(article, tag_ids)
+        self.assertEqual(
+            sorted(ctag.pk for ctag in
+                   await CTag.objects.aget_for_object(article)),
+            sorted(tag_ids))
+        await CTag.objects.aupdate_tags(article, None)
+        self.assertEqual(await CTag.objects.aget_for_object(article), [])
+        self.assertEqual(await CTag.objects.aget_for_object(self.event),
+                         [self.tags[0]])
+
+
+class ConcurrentReadsTestCase(AsyncTestMixin, TransactionTestCase):
+    """
+    The reads run in threads of their own, with their own connections,
+    so they only see committed data.
+    """
+    def setUp(self):
+        self.create_data()
+
+    async def test_reads(self):
+        # Both reads must be running for either to complete.
+        barrier = threading.Barrier(2, timeout=5)
+        usage_for_model = CTag.objects.usage_for_model
+
+        def wait_for_each_other(*args, **kwargs):
+            barrier.wait()
+            return usage_for_model(*args, **kwargs)
+
+        with mock.patch.object(CTag.objects, 'usage_for_model',
+                               wait_for_each_other):
+            results = await asyncio.gather(*[
+                CTag.objects.ausage_for_model(Article) for _ in range(2)])
+        self.assertEqual(len(results[0]), 5)
+        await self.check_reads()
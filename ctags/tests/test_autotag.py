@@ -0,0 +1,84 @@
+"""
+Tests of the automatic tagging of texts.
+"""
+from django.test import SimpleTestCase
+from django.test import TestCase
+
+from ctags import autotag
+from ctags.models import CTag
+from ctags.models import CTagAliasEn
+from ctags.tests.models import Article
+
+
+class TagMatcherTestCase(SimpleTestCase):
+
+    def test_overlapping_names(self):
+        matcher = autotag.TagMatcher(
+            [('he', 1), ('she', 2), ('his', 3), ('hers', 4)])
+        # Only "she" and "hers" stand as whole words.
+        self.assertEqual(matcher.match('ushers she hers'), {2: 1, 4: 1})
+        self.assertEqual(matcher.match('ushers'), {})
+
+    def test_word_boundaries(self):
+        matcher = autotag.TagMatcher(
+            [('cat', 1), ('hot dog', 2), ('c++', 3)])
+        self.assertEqual(matcher.match('Cat, category, CAT.'), {1: 2})
+        self.assertEqual(matcher.match('a hot dog, hot dogs'), {2: 1})
+        # A name ending with punctuation matches before any character.
+        self.assertEqual(matcher.match('c++11 and c++'), {3: 2})
+        self.assertEqual(matcher.match('abc++'), {})
+
+    def test_japanese_names(self):
+        matcher = autotag.TagMatcher([('東京', 1), ('京都', 2)])
+        self.assertEqual(matcher.match('東京都と京都'), {1: 1, 2: 2})
+
+    def test_same_name(self):
+        matcher = autotag.TagMatcher([('cat', 1), (' Cat ', 1), ('cat', 2),
+                                      ('', 3)])
+        self.assertEqual(matcher.match('a cat'), {1: 1, 2: 1})
+        self.assertEqual(matcher.match(''), {})
+        self.assertEqual(matcher.match(None), {})
+
+
+class AutotagTestCase(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.cat = CTag.objects.create(
+            name_en='cat', name_ja='猫', name_es='gato', name_pt='gata')
+        cls.dog = CTag.objects.create(
+            name_en='dog', name_ja='犬', name_es='perro', name_pt='cachorro')
+        CTagAliasEn.objects.create(target=cls.cat.pk, name='kitten')
+        # An alias of a deleted ctag is ignored.
+        CTagAliasEn.objects.create(target=0, name='puppy')
+
+    def test_suggest_tags(self):
+        self.assertEqual(
+            autotag.suggest_tags('A kitten, un gato y un perro, 猫.'),
+            {self.cat.pk: 3, self.dog.pk: 1})
+        self.assertEqual(autotag.suggest_tags('a puppy'), {})
+        self.assertEqual(
+            autotag.suggest_tags('cat, dog and kitten', min_hits=2),
+            {self.cat.pk: 2})
+
+    def test_vocabulary_changed(self):
+        self.assertEqual(autotag.suggest_tags('a bird'), {})
+        bird = CTag.objects.create(
+            name_en='bird', name_ja='鳥', name_es='pájaro', name_pt='pássaro')
+        self.assertEqual(autotag.suggest_tags('a bird'), {bird.pk: 1})
+        CTagAliasEn.objects.create(target=bird.pk, name='parrot')
+        self.assertEqual(autotag.suggest_tags('a parrot'), {bird.pk: 1})
+        bird.delete()
+        self.assertEqual(autotag.suggest_tags('a bird'), {})
+
+    def test_autotag(self):
+        articles = Article.objects.bulk_create([
+            Article(title='A cat and a dog'),
+            Article(title='Kitten'),
+            Article(title='Nothing'),
+            Article(title='')])
+        autotag.autotag(articles, ['title'])
+        self.assertEqual(
+            [sorted(CTag.objects.get_for_object(article).values_list(
+                'name_en', flat=True)) for article in articles],
+            [['cat', 'dog'], ['cat'], [], []])
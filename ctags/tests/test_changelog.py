@@ -0,0 +1,51 @@
+"""
+Tests of the ctag change log.
+"""
+from django.contrib.contenttypes.models import ContentType
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from ctags import changelog
+from ctags.models import CTagChange
+from ctags.tests.models import Article
+
+
+class CompactTestCase(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        content_type = ContentType.objects.get_for_model(Article)
+        # Five alternating changes of each of four ctags on five objects.
+        changelog.record(
+            (content_type.pk, object_id, ctag_id, index % 2 == 0)
+            for index in range(5)
+            for object_id in range(5)
+            for ctag_id in range(4))
+
+    def get_latest(self, changes):
+        latest = {}
+        for change in changes:
+            latest[change.content_type_id, change.object_id,
+                   change.ctag_id] = change.id
+        return sorted(latest.values())
+
+    def test_compact(self):
+        expected = self.get_latest(CTagChange.objects.order_by('id'))
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(changelog.compact(chunk_size=7), 80)
+        self.assertEqual(list(CTagChange.objects.order_by(
+            'id').values_list('id', flat=True)), expected)
+        # The superseded changes are deleted chunk by chunk.
+        self.assertEqual(len([query for query in queries.captured_queries
+                              if query['sql'].startswith('DELETE')]), 12)
+
+    def test_compact_upto(self):
+        changes = list(CTagChange.objects.order_by('id'))
+        upto = changes[59].id
+        # The changes after upto are kept, and only supersede each other.
+        expected = sorted(self.get_latest(changes[:60]) +
+                          [change.id for change in changes[60:]])
+        changelog.compact(upto, chunk_size=7)
+        self.assertEqual(list(CTagChange.objects.order_by(
+            'id').values_list('id', flat=True)), expected)
@@ -0,0 +1,234 @@
+"""
+Tests of the management commands of ctags.
+"""
+import datetime
+import io
+import os
+import tempfile
+from unittest import mock
+
+from django.contrib.contenttypes.models import ContentType
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+from django.utils import timezone
+
+from ctags import trending
+from ctags.models import CTag
+from ctags.models import CTagChange
+from ctags.models import CTagClosure
+from ctags.models import CTagTrend
+from ctags.models import CTaggedItem
+from ctags.tests.models import Article
+from ctags.tests.test_queries import create_tags
+
+
+def get_scores():
+    """
+    Returns the trending ``log_score`` by ``(ctag_id, content_type_id)``.
+    """
+    return {(ctag_id, content_type_id): log_score
+            for ctag_id, content_type_id, log_score in
+            CTagTrend.objects.values_list(
+                'ctag_id', 'content_type_id', 'log_score')}
+
+
+def write_records(lines):
+    """
+    Returns the path of a temporary JSONL file of ``lines``.
+    """
+    descriptor, path = tempfile.mkstemp(suffix='.jsonl')
+    with os.fdopen(descriptor, 'w', encoding='utf-8') as stream:
+        stream.write('\n'.join(lines) + '\n')
+    return path
+
+
+class ImportTestCase(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.tags = create_tags(2)
+        cls.articles = Article.objects.bulk_create(
+            [Article(title='article%d' % index) for index in range(2)])
+
+    @mock.patch('ctags.settings.CTAGS_CHANGE_LOG', True)
+    def test_import_items(self):
+        CTag.objects.bulk_add_tags([(self.articles[0], [self.tags[0].pk])])
+        path = write_records([
+            '{"type": "item", "ctag": "%s", "app_label": "tests", '
+            '"model": "article", "object_id": %d}' % (tag.name_en, article.pk)
+            for tag in self.tags for article in self.articles])
+        try:
+            call_command('ctags_import', path, verbosity=0)
+        finally:
+            os.remove(path)
+        self.assertEqual(CTaggedItem.objects.count(), 4)
+        # The association which existed is not logged again.
+        self.assertEqual(CTagChange.objects.count(), 4)
+
+    @mock.patch('ctags.settings.CTAGS_TRENDING', True)
+    def test_round_trip(self):
+        content_type = ContentType.objects.get_for_model(Article)
+        now = timezone.now()
+        items = [CTaggedItem(ctag=tag, content_type=content_type,
+                             object_id=article.pk)
+                 for tag in self.tags for article in self.articles]
+        for index, item in enumerate(items):
+            item.created = now - datetime.timedelta(days=30 * index)
+        CTag.objects.bulk_add_items(items)
+        expected = sorted(item.created for item in items)
+        trending.rebuild()
+        scores = get_scores()
+        for suffix in ('.jsonl', '.csv'):
+            with self.subTest(suffix=suffix):
+                descriptor, path = tempfile.mkstemp(suffix=suffix)
+                os.close(descriptor)
+                try:
+                    call_command('ctags_export', path, verbosity=0)
+                    CTaggedItem.objects.all().delete()
+                    CTagTrend.objects.all().delete()
+                    call_command('ctags_import', path, verbosity=0)
+                finally:
+                    os.remove(path)
+                self.assertEqual(sorted(CTaggedItem.objects.values_list(
+                    'created', flat=True)), expected)
+                # The imported uses decay from their original timestamps.
+                imported = get_scores()
+                self.assertEqual(imported.keys(), scores.keys())
+                for key, score in imported.items():
+                    self.assertAlmostEqual(score, scores[key])
+
+
+class HierarchyTransferTestCase(TestCase):
+
+    def get_closure(self):
+        return set(CTagClosure.objects.values_list(
+            'ancestor__name_en', 'descendant__name_en', 'depth'))
+
+    def test_round_trip(self):
+        tags = create_tags(4)
+        # The children are exported before their parents.
+        for child, parent in ((0, 1), (1, 2)):
+            tags[child].parent = tags[parent]
+            tags[child].save()
+        parents = dict(CTag.objects.values_list(
+            'name_en', 'parent__name_en'))
+        closure = self.get_closure()
+        for suffix in ('.jsonl', '.csv'):
+            with self.subTest(suffix=suffix):
+                descriptor, path = tempfile.mkstemp(suffix=suffix)
+                os.close(descriptor)
+                try:
+                    call_command('ctags_export', path, records='tag',
+                                 verbosity=0)
+                    CTag.objects.all().delete()
+                    call_command('ctags_import', path, verbosity=0)
+                finally:
+                    os.remove(path)
+                self.assertEqual(dict(CTag.objects.values_list(
+                    'name_en', 'parent__name_en')), parents)
+                self.assertEqual(self.get_closure(), closure)
+
+
+class GarbageCollectTestCase(TestCase):
+
+    def test_invalid_model(self):
+        for label in ('tests', 'tests.missing', 'tests.article.title'):
+            with self.subTest(label=label):
+                with self.assertRaisesMessage(CommandError, label):
+                    call_command('ctags_gc', model=[label], verbosity=0)
+
+
+class ExportTestCase(TestCase):
+
+    def test_export_model(self):
+        tags = create_tags(1)
+        article = Article.objects.create(title='article')
+        CTag.objects.bulk_add_tags([(article, [tags[0].pk])])
+        descriptor, path = tempfile.mkstemp(suffix='.jsonl')
+        os.close(descriptor)
+        try:
+            call_command('ctags_export', path, records='item',
+                         model=['tests.Article'], verbosity=0)
+            with open(path, encoding='utf-8') as stream:
+                self.assertEqual(len(stream.readlines()), 1)
+        finally:
+            os.remove(path)
+
+    def test_standard_output(self):
+        tags = create_tags(2)
+        article = Article.objects.create(title='article')
+        CTag.objects.bulk_add_tags([(article, [tag.pk for tag in tags])])
+        for format, lines in (('jsonl', 4), ('csv', 5)):
+            with self.subTest(format=format):
+                stdout = io.StringIO()
+                call_command('ctags_export', format=format, verbosity=0,
+                             stdout=stdout)
+                self.assertEqual(len(stdout.getvalue().splitlines()), lines)
+                self.assertTrue(stdout.getvalue().endswith('\n'))
+                self.assertNotIn('\n\n', stdout.getvalue())
+
+    def test_invalid_model(self):
+        for label in ('tests', 'tests.missing', 'tests.article.title'):
+            with self.subTest(label=label):
+                with self.assertRaisesMessage(CommandError, label):
+                    call_command('ctags_export', model=[label], verbosity=0)
+
+
+class TrendingTestCase(TestCase):
+
+    def test_invalid_model(self):
+        for label in ('tests', 'tests.missing', 'missing.article'):
+            with self.subTest(label=label):
+                with self.assertRaisesMessage(CommandError, label):
+                    call_command('ctags_trending', model=label)
+
+
+class BackfillCreatedTestCase(TestCase):
+
+    def test_invalid_model_field(self):
+        for spec in ('tests.article', 'tests.missing.title',
+                     'tests.article.missing'):
+            with self.subTest(spec=spec):
+                with self.assertRaisesMessage(CommandError, spec):
+                    call_command('ctags_backfill_created', model=[spec])
+
+    def test_stale_content_type(self):
+        stale = ContentType.objects.create(app_label='gone', model='thing')
+        CTaggedItem.objects.create(ctag=create_tags(1)[0],
+                                   content_type=stale, object_id=1,
+                                   created=None)
+        stdout = io.StringIO()
+        call_command('ctags_backfill_created', model=['gone.thing.created'],
+                     stdout=stdout)
+        self.assertEqual(stdout.getvalue(),
+                         'gone.thing.created: skipped, model not installed\n')
+        self.assertIsNone(CTaggedItem.objects.get().created)
+
+
+class WarmTestCase(TestCase):
+
+    @mock.patch('ctags.settings.CTAGS_FACET_CACHE', True)
+    def test_invalid_model(self):
+        for label in ('tests', 'tests.missing'):
+            with self.subTest(label=label):
+                with self.assertRaisesMessage(CommandError, label):
+                    call_command('ctags_warm', model=[label])
+
+
+class BudgetTestCase(TestCase):
+
+    def test_invalid_model(self):
+        for label in ('tests', 'tests.missing'):
+            with self.subTest(label=label):
+                with self.assertRaisesMessage(CommandError, label):
+                    call_command('ctags_budget', model=[label])
+
+
+class LoadTestTestCase(TestCase):
+
+    def test_invalid_model(self):
+        for label in ('tests', 'tests.missing'):
+            with self.subTest(label=label):
+                with self.assertRaisesMessage(CommandError, label):
+                    call_command('ctags_loadtest', model=label)
@@ -0,0 +1,87 @@
+"""
+Tests of the detection of near-duplicate ctags.
+"""
+from django.test import SimpleTestCase
+from django.test import TestCase
+
+from ctags.duplicates import DuplicateIndex
+from ctags.duplicates import find_duplicates
+from ctags.duplicates import normalize_name
+from ctags.models import CTag
+from ctags.models import CTagAliasEn
+
+
+class NormalizeNameTestCase(SimpleTestCase):
+
+    def test_normalize_name(self):
+        self.assertEqual(normalize_name('Japanese-American'),
+                         'japaneseamerican')
+        self.assertEqual(normalize_name(' Café  au lait! '), 'cafeaulait')
+        self.assertEqual(normalize_name('STRASSE'), normalize_name('Straße'))
+        # The voicing marks of the kana are significant.
+        self.assertEqual(normalize_name('ガギ'), 'ガギ')
+        self.assertNotEqual(normalize_name('ガギ'), normalize_name('カキ'))
+        self.assertEqual(normalize_name('---'), '')
+
+
+class DuplicateIndexTestCase(SimpleTestCase):
+
+    def test_find(self):
+        index = DuplicateIndex([
+            ('name_en', 1, 'Japanese-American'),
+            ('name_en', 1, 'japanese'),
+            ('name_en', 2, 'Japanese American'),
+            ('name_en', 3, 'Japanese Americans'),
+            ('name_en', 4, 'Chinese'),
+            ('name_en', 5, '---'),
+            # Names of different languages are not compared.
+            ('name_ja', 6, 'Japanese American'),
+        ])
+        self.assertEqual(
+            [(duplicate.tag_id, duplicate.other_tag_id, duplicate.field)
+             for duplicate in index.find()],
+            [(1, 2, 'name_en'), (2, 3, 'name_en'), (1, 3, 'name_en')])
+        duplicates = index.find(threshold=0.95)
+        self.assertEqual(len(duplicates), 1)
+        self.assertEqual(duplicates[0].score, 1.0)
+        self.assertEqual(duplicates[0].name, 'Japanese-American')
+        self.assertEqual(duplicates[0].other_name, 'Japanese American')
+
+    def test_short_names(self):
+        index = DuplicateIndex([('name_en', 1, 'ab'), ('name_en', 2, 'A.B.'),
+                                ('name_en', 3, 'abc')])
+        self.assertEqual(
+            [(duplicate.tag_id, duplicate.other_tag_id)
+             for duplicate in index.find()], [(1, 2)])
+
+    def test_max_frequency(self):
+        entries = [('name_en', tag_id, 'common %d' % tag_id)
+                   for tag_id in range(10)]
+        entries.append(('name_en', 10, 'common 1'))
+        # The pair still shares the rare trigram "on1".
+        self.assertEqual(
+            [(duplicate.tag_id, duplicate.other_tag_id)
+             for duplicate in DuplicateIndex(
+                 entries, max_frequency=2).find()], [(1, 10)])
+        # Without any indexed trigram in common, nothing is compared.
+        entries = [('name_en', tag_id, 'common') for tag_id in range(3)]
+        self.assertEqual(DuplicateIndex(entries, max_frequency=2).find(), [])
+
+
+class FindDuplicatesTestCase(TestCase):
+
+    def test_find_duplicates(self):
+        cat = CTag.objects.create(
+            name_en='Cat', name_ja='猫', name_es='gato', name_pt='gato')
+        kitten = CTag.objects.create(
+            name_en='Kitten', name_ja='子猫', name_es='gatito',
+            name_pt='gatinho')
+        CTagAliasEn.objects.create(target=cat.pk, name='kitten')
+        duplicates = find_duplicates()
+        self.assertEqual(
+            [(duplicate.field, duplicate.name, duplicate.other_name)
+             for duplicate in duplicates],
+            [('name_en', 'Kitten', 'kitten')])
+        self.assertEqual(
+            {duplicates[0].tag_id, duplicates[0].other_tag_id},
+            {cat.pk, kitten.pk})
@@ -0,0 +1,25 @@
+"""
+Tests of the bulk retrieval of the tagged objects.
+"""
+from django.contrib.contenttypes.models import ContentType
+from django.test import TestCase
+
+from ctags.generic import fetch_content_objects
+from ctags.models import CTag
+from ctags.models import CTaggedItem
+from ctags.tests.models import Article
+from ctags.tests.test_queries import create_tags
+
+
+class FetchContentObjectsTestCase(TestCase):
+
+    def test_stale_content_type(self):
+        tag = create_tags(1)[0]
+        article = Article.objects.create(title='article')
+        CTag.objects.bulk_add_tags([(article, [tag.pk])])
+        stale = ContentType.objects.create(app_label='gone', model='thing')
+        CTaggedItem.objects.create(ctag=tag, content_type=stale,
+                                   object_id=article.pk)
+        items = list(CTaggedItem.objects.order_by('pk'))
+        fetch_content_objects(items)
+        self.assertEqual([item.object for item in items], [article, None])
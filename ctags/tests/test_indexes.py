@@ -0,0 +1,89 @@
+"""
+Indexes used by the main queries of the managers, read from the query
+plans of SQLite.
+"""
+from unittest import skipUnless
+
+from django.db import connection
+from django.test import TestCase
+
+from ctags.models import CTag
+from ctags.models import CTaggedItem
+from ctags.tests.models import Article
+from ctags.tests.test_queries import create_articles
+from ctags.tests.test_queries import create_tags
+
+
+class QueryRecorder(object):
+    """
+    Database execute wrapper recording the queries it lets through.
+    """
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        self.queries.append((sql, params))
+        return execute(sql, params, many, context)
+
+
+def get_plan(func):
+    """
+    Returns the lines of the query plans of the queries made by calling
+    ``func``.
+    """
+    recorder = QueryRecorder()
+    with connection.execute_wrapper(recorder):
+        func()
+    plan = []
+    with connection.cursor() as cursor:
+        for sql, params in recorder.queries:
+            cursor.execute('EXPLAIN QUERY PLAN %s' % sql, params)
+            plan.extend(row[-1] for row in cursor.fetchall())
+    return plan
+
+
+@skipUnless(connection.vendor == 'sqlite', 'Reads the plans of SQLite.')
+class IndexTestCase(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.tags = create_tags(5)
+        cls.articles = create_articles(20, cls.tags)
+
+    def assertSearches(self, plan, index):
+        self.assertIn(index, ' '.join(plan))
+        for line in plan:
+            # The items are never scanned, only searched.
+            self.assertFalse(line.startswith('SCAN ctags_ctaggeditem') or
+                             line.startswith('SCAN U'), plan)
+
+    def test_get_for_object(self):
+        plan = get_plan(lambda: list(CTag.objects.get_for_object(
+            self.articles[3])))
+        self.assertSearches(plan, 'ctags_item_ct_object_ctag')
+
+    def test_usage_for_model(self):
+        plan = get_plan(lambda: CTag.objects.usage_for_model(
+            Article, counts=True))
+        self.assertSearches(plan, 'ctags_item_ct_ctag_object')
+
+    def test_related_for_model(self):
+        plan = get_plan(lambda: CTag.objects.related_for_model(
+            self.tags[0], Article, counts=True))
+        self.assertSearches(plan, 'ctags_item_ct_object_ctag')
+        self.assertSearches(plan, 'ctags_item_ct_ctag_object')
+
+    def test_get_by_model(self):
+        plan = get_plan(lambda: list(CTaggedItem.objects.get_by_model(
+            Article, self.tags[:2])))
+        self.assertSearches(plan, 'COVERING INDEX')
+
+    def test_get_mixed_page(self):
+        plan = get_plan(lambda: CTaggedItem.objects.get_mixed_page(
+            self.tags[0]))
+        self.assertSearches(plan, 'ctags_item_ctag_id')
+
+    def test_ordering(self):
+        plan = get_plan(lambda: list(CTag.objects.all()))
+        self.assertIn('ctags_ctag_lower_name_en', ' '.join(plan))
+        self.assertNotIn('TEMP B-TREE FOR ORDER BY', ' '.join(plan))
@@ -0,0 +1,34 @@
+"""
+Tests of the instrumentation of the ctags managers.
+"""
+from django.core.cache import cache
+from django.test import SimpleTestCase
+
+from ctags.instrumentation import CallStats
+from ctags.models import TagManager
+
+
+class CallStatsTestCase(SimpleTestCase):
+
+    def setUp(self):
+        self.stats = CallStats()
+        self.stats.reset()
+        self.addCleanup(self.stats.reset)
+
+    def call(self):
+        self.stats(sender=TagManager, method='usage_for_model',
+                   content_type='tests.article', queries=1, rows=3,
+                   duration=0.01)
+
+    def test_flush(self):
+        key = 'TagManager.usage_for_model tests.article'
+        # The first call is flushed at once.
+        self.call()
+        self.assertEqual(cache.get(CallStats.cache_key)[key]['calls'], 1)
+        self.assertEqual(self.stats.pending, {})
+        # The next ones within the interval are pending.
+        self.call()
+        self.assertEqual(cache.get(CallStats.cache_key)[key]['calls'], 1)
+        self.assertEqual(self.stats.snapshot()[key]['calls'], 2)
+        self.stats.flush()
+        self.assertEqual(cache.get(CallStats.cache_key)[key]['calls'], 2)
@@ -0,0 +1,31 @@
+"""
+Tests of the load testing dataset.
+"""
+from django.test import TestCase
+
+from ctags import loadtest
+from ctags.models import CTag
+from ctags.models import CTagClosure
+from ctags.models import CTaggedItem
+from ctags.tests.models import Article
+
+
+class DatasetTestCase(TestCase):
+
+    def test_create_dataset(self):
+        Article.objects.bulk_create(
+            [Article(title='article%d' % index) for index in range(20)])
+        created = loadtest.create_dataset(Article, objects=10, num_tags=8,
+                                          tags_per_object=3)
+        self.assertEqual(created, CTaggedItem.objects.count())
+        self.assertEqual(CTaggedItem.objects.values(
+            'object_id').distinct().count(), 10)
+        tags = CTag.objects.filter(name_en__startswith=loadtest.PREFIX)
+        self.assertEqual(tags.count(), 8)
+        self.assertEqual(CTagClosure.objects.filter(
+            ancestor__in=tags, depth=0).count(), 8)
+        # Creating it again adds nothing.
+        self.assertEqual(loadtest.create_dataset(
+            Article, objects=10, num_tags=8, tags_per_object=3), 0)
+        loadtest.delete_dataset()
+        self.assertFalse(CTaggedItem.objects.exists())
@@ -0,0 +1,370 @@
+"""
+Tests of the ctags models and of their managers.
+"""
+from unittest import mock
+
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError
+from django.db import transaction
+from django.test import TestCase
+from django.utils import timezone
+
+from ctags import objectcache
+from ctags import trending
+from ctags.forms import TagAdminForm
+from ctags.models import SAMPLE_MODULUS
+from ctags.models import SAMPLE_MULTIPLIER
+from ctags.models import CTag
+from ctags.models import CTagAliasEn
+from ctags.models import CTagChange
+from ctags.models import CTagTrend
+from ctags.models import CTaggedItem
+from ctags.tests.models import Article
+from ctags.tests.models import Event
+from ctags.tests.test_queries import create_articles
+from ctags.tests.test_queries import create_tags
+from ctags.tests.test_queries import get_tag_indexes
+from ctags.utils import LINEAR
+
+
+class MergeTestCase(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.tags = create_tags(5)
+        cls.articles = create_articles(5, cls.tags)
+
+    def test_merge(self):
+        CTag.objects.merge(self.tags[0], self.tags[1])
+        self.assertFalse(CTag.objects.filter(pk=self.tags[0].pk).exists())
+        self.assertEqual(
+            CTagAliasEn.objects.get(name='tag0').target, self.tags[1].pk)
+        # Articles 0, 3 and 4 had tag0, 0 and 4 having tag1 already.
+        self.assertEqual(
+            set(CTaggedItem.objects.get_by_model(Article, self.tags[1])),
+            {self.articles[index] for index in (0, 1, 3, 4)})
+
+    def test_merge_into_itself(self):
+        with self.assertRaises(ValueError):
+            CTag.objects.merge(self.tags[0], self.tags[0])
+        self.assertTrue(CTag.objects.filter(pk=self.tags[0].pk).exists())
+        self.assertEqual(CTaggedItem.objects.filter(
+            ctag=self.tags[0]).count(), 3)
+
+    @mock.patch('ctags.settings.CTAGS_OBJECT_CACHE', True)
+    def test_merge_invalidates_on_commit(self):
+        article = self.articles[3]
+        cache.clear()
+        objectcache.get_tag_ids(article)
+        with self.captureOnCommitCallbacks() as callbacks:
+            CTag.objects.merge(self.tags[0], self.tags[1])
+            # The merge is not committed yet, the entry remains.
+            with self.assertNumQueries(0):
+                objectcache.get_tag_ids(article)
+        self.assertEqual(len(callbacks), 1)
+        callbacks[0]()
+        self.assertEqual(objectcache.get_tag_ids(article),
+                         tuple(self.tags[index].pk for index in (1, 3, 4)))
+
+
+class HierarchyTestCase(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.root, cls.child, cls.grandchild = create_tags(3)
+        cls.child.parent = cls.root
+        cls.child.save()
+        cls.grandchild.parent = cls.child
+        cls.grandchild.save()
+
+    def test_clean(self):
+        self.root.parent = self.grandchild
+        with self.assertRaises(ValidationError) as context:
+            self.root.full_clean()
+        self.assertIn('parent', context.exception.message_dict)
+        self.grandchild.parent = self.root
+        self.grandchild.full_clean()
+
+    def test_admin_form(self):
+        data = {field: getattr(self.root, field)
+                for field in TagAdminForm.Meta.fields}
+        data['parent'] = self.grandchild.pk
+        form = TagAdminForm(data, instance=self.root)
+        self.assertFalse(form.is_valid())
+        self.assertIn('parent', form.errors)
+
+    def test_save(self):
+        self.root.parent = self.child
+        with self.assertRaises(ValueError):
+            self.root.save()
+
+
+class TrendTestCase(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.tag = create_tags(1)[0]
+        cls.content_type = ContentType.objects.get_for_model(Article)
+
+    def test_record_usage(self):
+        now = timezone.now()
+        trending.record_usage(self.tag.pk, self.content_type.pk, now)
+        trending.record_usage(self.tag.pk, self.content_type.pk, now)
+        self.assertEqual(CTagTrend.objects.filter(
+            ctag=self.tag, content_type=None).count(), 1)
+        self.assertEqual(CTagTrend.objects.filter(
+            ctag=self.tag, content_type=self.content_type).count(), 1)
+
+    def test_unique_all(self):
+        CTagTrend.objects.create(ctag=self.tag, content_type=None,
+                                 log_score=1, last_used=timezone.now())
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            CTagTrend.objects.create(ctag=self.tag, content_type=None,
+                                     log_score=1, last_used=timezone.now())
+
+    @mock.patch('ctags.settings.CTAGS_TRENDING', True)
+    def test_bulk_add_items(self):
+        articles = Article.objects.bulk_create(
+            [Article(title='article%d' % index) for index in range(3)])
+        CTag.objects.bulk_add_tags([(articles[0], [self.tag.pk])])
+        CTag.objects.bulk_add_tags(
+            [(article, [self.tag.pk]) for article in articles])
+        scores = {(trend.ctag_id, trend.content_type_id): trend.log_score
+                  for trend in CTagTrend.objects.all()}
+        self.assertEqual(len(scores), 2)
+        trending.rebuild()
+        for trend in CTagTrend.objects.all():
+            self.assertAlmostEqual(
+                scores[trend.ctag_id, trend.content_type_id],
+                trend.log_score)
+
+
+@mock.patch('ctags.settings.CTAGS_CHANGE_LOG', True)
+class BulkAddTestCase(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.tags = create_tags(3)
+        cls.articles = Article.objects.bulk_create(
+            [Article(title='article%d' % index) for index in range(3)])
+
+    def test_bulk_add_tags(self):
+        tag_ids = [tag.pk for tag in self.tags[:2]]
+        self.assertEqual(CTag.objects.bulk_add_tags(
+            [(article, tag_ids) for article in self.articles[:2]],
+            batch_size=3), 4)
+        self.assertEqual(CTagChange.objects.filter(added=True).count(), 4)
+
+        # Only the associations created are logged.
+        tag_ids = [tag.pk for tag in self.tags]
+        self.assertEqual(CTag.objects.bulk_add_tags(
+            [(article, tag_ids + tag_ids) for article in self.articles],
+            batch_size=3), 5)
+        self.assertEqual(CTaggedItem.objects.count(), 9)
+        self.assertEqual(CTagChange.objects.filter(added=True).count(), 9)
+        self.assertEqual(
+            set(CTagChange.objects.values_list('object_id', 'ctag_id')),
+            set(CTaggedItem.objects.values_list('object_id', 'ctag_id')))
+
+
+class TaggedObjectsTestCase(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.tags = create_tags(5)
+        cls.articles = create_articles(5, cls.tags)
+        cls.untagged = Article.objects.create(title='untagged')
+        cls.root = CTag.objects.create(
+            name_en='root', name_ja='root-ja', name_es='root-es',
+            name_pt='root-pt')
+        cls.tags[1].parent = cls.root
+        cls.tags[1].save()
+
+    def get_titles(self, queryset):
+        return sorted(queryset.values_list('title', flat=True))
+
+    def test_with_tags(self):
+        tags = self.tags[:2]
+        with self.assertNumQueries(1):
+            self.assertEqual(
+                self.get_titles(Article.tagged.with_tags(tags)),
+                ['article0', 'article4'])
+        self.assertEqual(
+            self.get_titles(Article.tagged.with_tags('tag0 tag1')),
+            ['article0', 'article4'])
+        self.assertEqual(
+            self.get_titles(Article.tagged.with_any_tags(tags)),
+            ['article0', 'article1', 'article3', 'article4'])
+        self.assertEqual(
+            self.get_titles(Article.tagged.without_tags(tags)),
+            ['article2', 'untagged'])
+        self.assertEqual(
+            self.get_titles(CTaggedItem.objects.get_intersection_by_model(
+                Article, [tag.pk for tag in tags])),
+            ['article0', 'article4'])
+
+    def test_no_tags(self):
+        self.assertEqual(list(Article.tagged.with_tags('missing')), [])
+        self.assertEqual(list(Article.tagged.with_any_tags([])), [])
+        self.assertEqual(Article.tagged.without_tags([]).count(), 6)
+
+    def test_chaining(self):
+        # The filters combine with each other and with any other one,
+        # in any order.
+        queryset = Article.tagged.exclude(title='article4').with_tags(
+            self.tags[0]).without_tags(self.tags[3])
+        self.assertEqual(self.get_titles(queryset), ['article0'])
+        queryset = Article.tagged.with_any_tags(self.tags[:2]).filter(
+            title__in=['article1', 'article2'])
+        self.assertEqual(self.get_titles(queryset), ['article1'])
+        self.assertEqual(
+            list(Article.tagged.with_tags(self.tags[2]).order_by(
+                '-title').values_list('pk', flat=True)),
+            [self.articles[index].pk for index in (2, 1, 0)])
+
+    def test_include_descendants(self):
+        self.assertEqual(list(Article.tagged.with_tags(self.root)), [])
+        self.assertEqual(
+            self.get_titles(Article.tagged.with_tags(
+                self.root, include_descendants=True)),
+            ['article0', 'article1', 'article4'])
+        self.assertEqual(
+            self.get_titles(Article.tagged.with_any_tags(
+                [self.root, self.tags[3]], include_descendants=True)),
+            ['article0', 'article1', 'article2', 'article3', 'article4'])
+        self.assertEqual(
+            self.get_titles(Article.tagged.without_tags(
+                self.root, include_descendants=True)),
+            ['article2', 'article3', 'untagged'])
+
+    def test_annotate_tag_count(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(
+                dict(Article.tagged.annotate_tag_count().values_list(
+                    'title', 'tag_count')),
+                {'article0': 3, 'article1': 3, 'article2': 3,
+                 'article3': 3, 'article4': 3, 'untagged': 0})
+        queryset = Article.tagged.annotate_tag_count(
+            self.tags[:2], name='matches').filter(matches__gte=1).order_by(
+                '-matches', 'title')
+        self.assertEqual(
+            [(article.title, article.matches) for article in queryset],
+            [('article0', 2), ('article4', 2), ('article1', 1),
+             ('article3', 1)])
+
+
+class MultiModelUsageTestCase(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.tags = create_tags(5)
+        cls.articles = create_articles(5, cls.tags)
+        cls.events = Event.objects.bulk_create(
+            [Event(title='event%d' % index) for index in range(3)])
+        CTag.objects.bulk_add_tags([
+            (cls.events[0], [cls.tags[0].pk]),
+            (cls.events[1], [cls.tags[0].pk, cls.tags[1].pk]),
+            (cls.events[2], [cls.tags[4].pk])])
+
+    def get_counts(self, ctags):
+        return {ctag.name_en: ctag.count for ctag in ctags}
+
+    def test_usage_for_models(self):
+        with self.assertNumQueries(1):
+            ctags = CTag.objects.usage_for_models([Article, Event],
+                                                  counts=True)
+        # The sums of the usages of each model.
+        expected = {}
+        for model in (Article, Event):
+            for ctag in CTag.objects.usage_for_model(model, counts=True):
+                expected[ctag.name_en] = (expected.get(ctag.name_en, 0) +
+                                          ctag.count)
+        self.assertEqual(self.get_counts(ctags), expected)
+        self.assertEqual(expected, {'tag0': 5, 'tag1': 4, 'tag2': 3,
+                                    'tag3': 3, 'tag4': 4})
+        self.assertEqual(
+            sorted(ctag.name_en for ctag in CTag.objects.usage_for_models(
+                [Article, Event])), sorted(expected))
+        self.assertEqual(CTag.objects.usage_for_models([]), [])
+
+    def test_filters_and_weights(self):
+        self.assertEqual(
+            self.get_counts(CTag.objects.usage_for_models(
+                [Article, Event], counts=True,
+                filters={Article: {'title': 'article0'}})),
+            {'tag0': 3, 'tag1': 2, 'tag2': 1, 'tag4': 1})
+        self.assertEqual(
+            self.get_counts(CTag.objects.usage_for_models(
+                [Article, Event], counts=True, weights={Event: 2})),
+            {'tag0': 7, 'tag1': 5, 'tag2': 3, 'tag3': 3, 'tag4': 5})
+        self.assertEqual(
+            self.get_counts(CTag.objects.usage_for_models(
+                [Article, Event], min_count=4)),
+            {'tag0': 5, 'tag1': 4, 'tag4': 4})
+
+    def test_deleted_objects(self):
+        # The items of the deleted article are left behind.
+        self.articles[1].delete()
+        self.assertEqual(
+            self.get_counts(CTag.objects.usage_for_models(
+                [Article, Event], counts=True)),
+            {'tag0': 5, 'tag1': 3, 'tag2': 2, 'tag3': 2, 'tag4': 4})
+
+    def test_cloud_for_models(self):
+        ctags = CTag.objects.cloud_for_models(
+            [Article, Event], steps=3, distribution=LINEAR)
+        self.assertEqual(
+            {ctag.name_en: (ctag.count, ctag.font_size) for ctag in ctags},
+            {'tag0': (5, 3), 'tag1': (4, 2), 'tag2': (3, 1),
+             'tag3': (3, 1), 'tag4': (4, 2)})
+
+
+class ApproximateUsageTestCase(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.tags = create_tags(5)
+        cls.articles = create_articles(1000, cls.tags)
+
+    def get_exact(self):
+        return {ctag.pk: ctag.count
+                for ctag in CTag.objects.usage_for_model(Article, counts=True)}
+
+    @mock.patch('ctags.settings.CTAGS_APPROXIMATE_SAMPLE_SIZE', 100)
+    def test_estimate(self):
+        # The sample is the articles whose key hashes below the rate.
+        rate = 100 / 1000.0
+        sampled = {}
+        for index, article in enumerate(self.articles):
+            if (article.pk * SAMPLE_MULTIPLIER % SAMPLE_MODULUS <
+                    int(rate * SAMPLE_MODULUS)):
+                for tag_index in get_tag_indexes(index, len(self.tags)):
+                    tag_id = self.tags[tag_index].pk
+                    sampled[tag_id] = sampled.get(tag_id, 0) + 1
+        exact = self.get_exact()
+        for approximate in (
+                CTag.objects.usage_for_model(Article, approximate=True),
+                CTag.objects.usage_for_queryset(Article.objects.all(),
+                                                approximate=True),
+                CTag.objects.cloud_for_model(Article, approximate=True)):
+            self.assertEqual({ctag.pk: ctag.count for ctag in approximate},
+                             {tag_id: int(round(count / rate))
+                              for tag_id, count in sampled.items()})
+            for ctag in approximate:
+                self.assertGreater(ctag.count_error, 0)
+                self.assertLessEqual(abs(ctag.count - exact[ctag.pk]),
+                                     ctag.count_error)
+        # The exact counts are unchanged.
+        self.assertEqual(exact, {tag.pk: 600 for tag in self.tags})
+        self.assertFalse(any(
+            hasattr(ctag, 'count_error')
+            for ctag in CTag.objects.usage_for_model(Article, counts=True)))
+
+    @mock.patch('ctags.settings.CTAGS_APPROXIMATE_SAMPLE_SIZE', 1000)
+    def test_small_queryset(self):
+        usage = CTag.objects.usage_for_model(Article, approximate=True)
+        self.assertEqual({ctag.pk: ctag.count for ctag in usage},
+                         self.get_exact())
+        self.assertEqual({ctag.count_error for ctag in usage}, {0})
@@ -0,0 +1,137 @@
+"""
+Query budgets of the ctags APIs, checked on growing numbers of objects
+so that a query per object or per row is caught.
+"""
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase
+
+from ctags import budget
+from ctags import objectcache
+from ctags.models import CTag
+from ctags.models import CTaggedItem
+from ctags.tests.models import Article
+from ctags.tests.models import Post
+
+SIZES = (1, 10, 100)
+
+
+def create_tags(num):
+    return [CTag.objects.create(name_en='tag%d' % index,
+                                name_ja='tag%d-ja' % index,
+                                name_es='tag%d-es' % index,
+                                name_pt='tag%d-pt' % index)
+            for index in range(num)]
+
+
+def get_tag_indexes(index, num_tags):
+    """
+    Returns the indexes of the three consecutive ctags of the article
+    of index ``index``.
+    """
+    return [(index + offset) % num_tags for offset in range(3)]
+
+
+def create_articles(size, tags, model=Article):
+    """
+    Replaces the articles, or the instances of ``model``, by ``size``
+    new ones, tagged as given by ``get_tag_indexes``.
+    """
+    CTaggedItem.objects.all().delete()
+    model.objects.all().delete()
+    articles = model.objects.bulk_create(
+        [model(title='article%d' % index) for index in range(size)])
+    CTag.objects.bulk_add_tags(
+        (article, [tags[tag_index].pk
+                   for tag_index in get_tag_indexes(index, len(tags))])
+        for index, article in enumerate(articles))
+    return articles
+
+
+class QueryBudgetTestCase(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.tags = create_tags(5)
+
+    def test_usage_for_model(self):
+        for size in SIZES:
+            with self.subTest(size=size):
+                create_articles(size, self.tags)
+                with self.assertNumQueries(1):
+                    usage = CTag.objects.usage_for_model(
+                        Article, counts=True)
+                self.assertEqual(sum(ctag.count for ctag in usage),
+                                 3 * size)
+
+    def test_cloud_for_model(self):
+        for size in SIZES:
+            with self.subTest(size=size):
+                create_articles(size, self.tags)
+                with self.assertNumQueries(1):
+                    cloud = CTag.objects.cloud_for_model(Article)
+                self.assertEqual(len(cloud), min(size + 2, 5))
+
+    def test_related_for_model(self):
+        for size in SIZES:
+            with self.subTest(size=size):
+                create_articles(size, self.tags)
+                with self.assertNumQueries(1):
+                    related = CTag.objects.related_for_model(
+                        self.tags[0], Article, counts=True)
+                expected = set()
+                for index in range(size):
+                    tag_indexes = get_tag_indexes(index, len(self.tags))
+                    if 0 in tag_indexes:
+                        expected.update(tag_indexes)
+                expected.discard(0)
+                self.assertEqual([ctag.pk for ctag in related],
+                                 [self.tags[index].pk
+                                  for index in sorted(expected)])
+
+    def test_get_by_model(self):
+        for size in SIZES:
+            with self.subTest(size=size):
+                create_articles(size, self.tags)
+                with self.assertNumQueries(1):
+                    articles = list(CTaggedItem.objects.get_by_model(
+                        Article, self.tags[1:3]))
+                self.assertEqual(len(articles), len([
+                    index for index in range(size)
+                    if {1, 2} <= set(get_tag_indexes(index,
+                                                     len(self.tags)))]))
+
+    @mock.patch('ctags.settings.CTAGS_OBJECT_CACHE', True)
+    def test_object_cache(self):
+        for size in SIZES:
+            with self.subTest(size=size):
+                articles = create_articles(size, self.tags)
+                cache.clear()
+                objectcache.get_vocabulary(refresh=True)
+                with self.assertNumQueries(1):
+                    objectcache.get_tag_ids_many(articles)
+                with self.assertNumQueries(0):
+                    tags = objectcache.get_tags_many(articles)
+                self.assertEqual(sum(len(value) for value in tags.values()),
+                                 3 * size)
+
+    def test_budgets(self):
+        # The tags of an instance are read through a TagDescriptor for
+        # articles, a TagField for posts.
+        for model in (Article, Post):
+            with self.subTest(model=model):
+                create_articles(max(SIZES), self.tags, model)
+                results = budget.check(model, SIZES)
+                self.assertEqual([len(result.counts) for result in results],
+                                 [len(SIZES)] * len(budget.CHECKS))
+                self.assertEqual(budget.failures(results), [])
+
+    def test_tag_field(self):
+        posts = create_articles(2, self.tags, Post)
+        scope = budget.get_scopes(Post, [2])[0]
+        with self.assertNumQueries(1):
+            tags = budget._get_tags(scope)
+        self.assertEqual(tags, ' '.join(
+            self.tags[index].name_en for index in get_tag_indexes(1, 5)))
+        self.assertEqual(scope.obj, posts[1])
@@ -0,0 +1,146 @@
+"""
+Tests of the partitioned rebuilds of the data derived from the tagged
+items. The rebuilds run in the test process, as the workers could not
+see the test database.
+"""
+import datetime
+import io
+import os
+import pickle
+import tempfile
+from unittest import mock
+
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+from django.utils import timezone
+
+from ctags import objectcache
+from ctags import rebuild
+from ctags import trending
+from ctags.models import CTag
+from ctags.models import CTagTrend
+from ctags.models import CTaggedItem
+from ctags.tests.models import Event
+from ctags.tests.test_commands import get_scores
+from ctags.tests.test_queries import create_articles
+from ctags.tests.test_queries import create_tags
+from ctags.tests.test_queries import get_tag_indexes
+
+
+class RebuildTestCase(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.tags = create_tags(4)
+        cls.articles = create_articles(7, cls.tags)
+        cls.event = Event.objects.create(title='event')
+        CTag.objects.bulk_add_tags([(cls.event, [cls.tags[0].pk])])
+        now = timezone.now()
+        for index, article in enumerate(cls.articles):
+            CTaggedItem.objects.filter(object_id=article.pk).update(
+                created=now - datetime.timedelta(days=10 * index))
+        # Not counted in the trending scores.
+        CTaggedItem.objects.filter(object_id=cls.articles[0].pk).update(
+            created=None)
+
+    def setUp(self):
+        descriptor, self.state = tempfile.mkstemp(suffix='.state')
+        os.close(descriptor)
+        os.remove(self.state)
+        self.addCleanup(lambda: os.path.exists(self.state) and
+                        os.remove(self.state))
+
+    def get_expected_scores(self):
+        trending.rebuild()
+        scores = get_scores()
+        CTagTrend.objects.all().delete()
+        return scores
+
+    def assertScoresEqual(self, scores, expected):
+        self.assertEqual(scores.keys(), expected.keys())
+        for key, score in scores.items():
+            self.assertAlmostEqual(score, expected[key])
+
+    def test_get_partitions(self):
+        partitions = rebuild.get_partitions(partition_size=6)
+        article_type = ContentType.objects.get_for_model(self.articles[0])
+        event_type = ContentType.objects.get_for_model(self.event)
+        pks = [article.pk for article in self.articles]
+        # Each partition holds whole objects, two articles of three items.
+        self.assertEqual(sorted(partitions), sorted([
+            rebuild.Partition(article_type.pk, pks[0], pks[2]),
+            rebuild.Partition(article_type.pk, pks[2], pks[4]),
+            rebuild.Partition(article_type.pk, pks[4], pks[6]),
+            rebuild.Partition(article_type.pk, pks[6], None),
+            rebuild.Partition(event_type.pk, self.event.pk, None)]))
+        # An object with more items than a partition has its own.
+        self.assertEqual(
+            [partition for partition in rebuild.get_partitions(
+                partition_size=2) if partition.content_type_id ==
+             article_type.pk],
+            [rebuild.Partition(article_type.pk, pk, stop)
+             for pk, stop in zip(pks, pks[1:] + [None])])
+
+    def test_trending(self):
+        expected = self.get_expected_scores()
+        done = []
+        rebuild.run('trending', workers=1, partition_size=6,
+                    progress=lambda *args: done.append(args))
+        self.assertScoresEqual(get_scores(), expected)
+        self.assertEqual(done, [(index, 5) for index in range(1, 6)])
+
+    def test_objectcache(self):
+        cache.clear()
+        self.assertEqual(rebuild.run('objectcache', workers=1,
+                                     partition_size=6), 8)
+        for index, article in enumerate(self.articles):
+            self.assertEqual(
+                objectcache.unpack(cache.get(objectcache.make_key(
+                    ContentType.objects.get_for_model(article).pk,
+                    article.pk))),
+                tuple(sorted(self.tags[tag_index].pk for tag_index in
+                             get_tag_indexes(index, len(self.tags)))))
+
+    def test_resume(self):
+        expected = self.get_expected_scores()
+        partitions = rebuild.get_partitions(partition_size=6)
+        # An interrupted run recorded the first partition, the second
+        # being truncated.
+        with open(self.state, 'wb') as stream:
+            pickle.dump(('trending', 'default', partitions), stream)
+            pickle.dump((0, rebuild.map_partition(
+                'trending', 'default', partitions[0])), stream)
+            stream.write(pickle.dumps((1, {}))[:-3])
+        with mock.patch('ctags.rebuild.map_partition',
+                        wraps=rebuild.map_partition) as map_partition:
+            rebuild.run('trending', workers=1, state=self.state,
+                        resume=True)
+        self.assertEqual([call.args[2] for call in
+                          map_partition.call_args_list], partitions[1:])
+        self.assertScoresEqual(get_scores(), expected)
+        self.assertFalse(os.path.exists(self.state))
+
+    def test_command(self):
+        expected = self.get_expected_scores()
+        stdout = io.StringIO()
+        stderr = io.StringIO()
+        call_command('ctags_rebuild', 'trending', workers=1,
+                     partition_size=6, state=self.state, stdout=stdout,
+                     stderr=stderr)
+        self.assertEqual(stdout.getvalue(), 'Rebuilt trending: %d entries.\n'
+                         % len(expected))
+        self.assertEqual(stderr.getvalue().splitlines()[-1], '5/5 partitions')
+        self.assertScoresEqual(get_scores(), expected)
+        self.assertFalse(os.path.exists(self.state))
+
+    def test_command_errors(self):
+        with self.assertRaisesMessage(CommandError, 'missing'):
+            call_command('ctags_rebuild', 'missing', workers=1)
+        with open(self.state, 'wb') as stream:
+            pickle.dump(('objectcache', 'default', []), stream)
+        with self.assertRaisesMessage(CommandError, 'another rebuild'):
+            call_command('ctags_rebuild', 'trending', workers=1,
+                         state=self.state, resume=True)
@@ -0,0 +1,95 @@
+"""
+Tests of the registration of the tagged models.
+"""
+from django.db import models
+from django.db.models import Count
+from django.test import TestCase
+from django.test.utils import isolate_apps
+
+from ctags.models import CTag
+from ctags.models import CTaggedItem
+from ctags.registry import AlreadyRegistered
+from ctags.registry import register
+from ctags.tests.models import Article
+from ctags.tests.models import Event
+from ctags.tests.test_queries import create_articles
+from ctags.tests.test_queries import create_tags
+from ctags.tests.test_queries import get_tag_indexes
+
+
+class RegisterTestCase(TestCase):
+
+    def test_already_registered(self):
+        with self.assertRaises(AlreadyRegistered):
+            register(Article)
+
+    @isolate_apps('ctags.tests')
+    def test_relations_clash(self):
+        class Photo(models.Model):
+            ctags = models.CharField(max_length=100)
+
+        with self.assertRaises(AttributeError):
+            register(Photo, relations=True)
+        self.assertFalse(hasattr(Photo, 'tags'))
+
+
+class RelationsTestCase(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.tags = create_tags(5)
+        cls.events = create_articles(5, cls.tags, model=Event)
+        cls.article = Article.objects.create(title='article')
+        CTag.objects.bulk_add_tags([(cls.article, [cls.tags[0].pk])])
+
+    def get_expected(self, index):
+        return {self.tags[tag_index].pk
+                for tag_index in get_tag_indexes(index, len(self.tags))}
+
+    def test_prefetch_ctags(self):
+        with self.assertNumQueries(2):
+            events = list(Event.objects.order_by('pk').prefetch_related(
+                'ctags'))
+        with self.assertNumQueries(0):
+            for index, event in enumerate(events):
+                self.assertEqual({tag.pk for tag in event.ctags.all()},
+                                 self.get_expected(index))
+                # The tag descriptor is served from the prefetch cache.
+                self.assertEqual({tag.pk for tag in event.tags},
+                                 self.get_expected(index))
+
+    def test_ctags(self):
+        event = self.events[0]
+        self.assertEqual({tag.pk for tag in event.ctags.all()},
+                         self.get_expected(0))
+        self.assertEqual(
+            list(event.ctags.filter(name_en='tag1').values_list(
+                'pk', flat=True)), [self.tags[1].pk])
+        # The article of the same id is not mixed in.
+        self.assertEqual(list(self.article.tags), [self.tags[0]])
+
+    def test_prefetch_tagged_items(self):
+        with self.assertNumQueries(2):
+            events = list(Event.objects.order_by('pk').prefetch_related(
+                'ctagged_items'))
+        with self.assertNumQueries(0):
+            for index, event in enumerate(events):
+                self.assertEqual(
+                    {item.ctag_id for item in event.ctagged_items.all()},
+                    self.get_expected(index))
+
+    def test_lookups(self):
+        self.assertEqual(
+            list(Event.objects.filter(
+                ctagged_items__ctag=self.tags[0]).order_by(
+                    'title').values_list('title', flat=True)),
+            ['article0', 'article3', 'article4'])
+        self.assertEqual(
+            set(Event.objects.annotate(
+                count=Count('ctagged_items')).values_list(
+                    'count', flat=True)), {3})
+
+    def test_delete(self):
+        self.events[0].delete()
+        self.assertEqual(CTaggedItem.objects.count(), 13)
+        self.assertEqual(list(self.article.tags), [self.tags[0]])
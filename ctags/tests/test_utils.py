@@ -0,0 +1,118 @@
+"""
+Tests of the parsing of tag input, against the character by character
+parser it replaced.
+"""
+import random
+
+from django.test import SimpleTestCase
+from django.utils.encoding import force_str
+
+from ctags.utils import parse_tag_input
+from ctags.utils import parse_tag_inputs
+from ctags.utils import split_strip
+
+# Characters of the fuzzed inputs, the delimiters being the most likely.
+ALPHABET = 'ab C,,  ""\t\né日İ'
+
+SEED = 32
+NUM_INPUTS = 20000
+MAX_LENGTH = 16
+
+
+def reference_parse_tag_input(input):
+    """
+    The former ``parse_tag_input``, walking the input one character at a
+    time.
+    """
+    if not input:
+        return []
+
+    input = force_str(input)
+
+    if ',' not in input and '"' not in input:
+        words = list(set(split_strip(input, ' ')))
+        words.sort()
+        return words
+
+    words = []
+    buffer = []
+    to_be_split = []
+    saw_loose_comma = False
+    open_quote = False
+    i = iter(input)
+    try:
+        while 1:
+            c = next(i)
+            if c == '"':
+                if buffer:
+                    to_be_split.append(''.join(buffer))
+                    buffer = []
+                open_quote = True
+                c = next(i)
+                while c != '"':
+                    buffer.append(c)
+                    c = next(i)
+                if buffer:
+                    word = ''.join(buffer).strip()
+                    if word:
+                        words.append(word)
+                    buffer = []
+                open_quote = False
+            else:
+                if not saw_loose_comma and c == ',':
+                    saw_loose_comma = True
+                buffer.append(c)
+    except StopIteration:
+        if buffer:
+            if open_quote and ',' in buffer:
+                saw_loose_comma = True
+            to_be_split.append(''.join(buffer))
+    if to_be_split:
+        if saw_loose_comma:
+            delimiter = ','
+        else:
+            delimiter = ' '
+        for chunk in to_be_split:
+            words.extend(split_strip(chunk, delimiter))
+    words = list(set(words))
+    words.sort()
+    return words
+
+
+def fuzz_inputs(seed=SEED, num=NUM_INPUTS, max_length=MAX_LENGTH):
+    rng = random.Random(seed)
+    return [''.join(rng.choice(ALPHABET)
+                    for index in range(rng.randint(0, max_length)))
+            for input in range(num)]
+
+
+class ParseTagInputTestCase(SimpleTestCase):
+
+    def test_examples(self):
+        for input, expected in [
+                (None, []),
+                ('', []),
+                ('one two one', ['one', 'two']),
+                ('one, two three', ['one', 'two three']),
+                ('"one, two" three', ['one, two', 'three']),
+                ('"one two" three, four', ['four', 'one two', 'three']),
+                ('"apple" "ball dog', ['apple', 'ball', 'dog']),
+                ('a,"b', ['a', 'b'])]:
+            with self.subTest(input=input):
+                self.assertEqual(parse_tag_input(input), expected)
+                self.assertEqual(reference_parse_tag_input(input), expected)
+
+    def test_fuzzed_inputs(self):
+        for input in fuzz_inputs():
+            self.assertEqual(parse_tag_input(input),
+                             reference_parse_tag_input(input), repr(input))
+
+    def test_parse_tag_inputs(self):
+        inputs = fuzz_inputs(num=2000) + [None, '']
+        self.assertEqual(list(parse_tag_inputs(inputs, lowercase=False)),
+                         [reference_parse_tag_input(input)
+                          for input in inputs])
+        self.assertEqual(
+            list(parse_tag_inputs(inputs, lowercase=True)),
+            [reference_parse_tag_input(input and input.lower())
+             for input in inputs])
@@ -0,0 +1,53 @@
+"""
+Tests of the ctags views.
+"""
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import RequestFactory
+from django.test import TestCase
+
+from ctags.tests.models import Article
+from ctags.tests.test_queries import create_articles
+from ctags.tests.test_queries import create_tags
+from ctags.views import TaggedObjectList
+
+
+class TaggedObjectListTestCase(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.tags = create_tags(5)
+        cls.articles = create_articles(10, cls.tags)
+
+    def get_context(self, page, related_tags=True):
+        view = TaggedObjectList.as_view(
+            queryset=Article.objects.order_by('pk'), paginate_by=2,
+            related_tags=related_tags)
+        response = view(RequestFactory().get('/', {'page': page}),
+                        ctag=self.tags[0].name_en)
+        context = response.context_data
+        return (list(context['object_list']), context['paginator'].count,
+                [(ctag.pk, ctag.count)
+                 for ctag in context.get('related_tags', [])])
+
+    def test_cached(self):
+        expected = [self.get_context(page) for page in (1, 2, 'last')]
+        with mock.patch('ctags.settings.CTAGS_FACET_CACHE', True):
+            cache.clear()
+            for page, context in zip((1, 2, 'last'), expected):
+                with self.subTest(page=page):
+                    self.assertEqual(self.get_context(page), context)
+                    # Only the ctag is read once cached.
+                    with self.assertNumQueries(1):
+                        self.assertEqual(self.get_context(page), context)
+
+    @mock.patch('ctags.settings.CTAGS_FACET_CACHE', True)
+    def test_cold_queries(self):
+        cache.clear()
+        # The ctag, the count and the page, without facets.
+        with self.assertNumQueries(3):
+            self.get_context(3, related_tags=False)
+        # The count is shared by the pages.
+        with self.assertNumQueries(2):
+            self.get_context(2, related_tags=False)
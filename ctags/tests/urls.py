@@ -0,0 +1,9 @@
+"""
+URLs of the ctags tests.
+"""
+from django.contrib import admin
+from django.urls import path
+
+urlpatterns = [
+    path('admin/', admin.site.urls),
+]
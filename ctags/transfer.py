@@ -0,0 +1,102 @@
+"""
+Record formats shared by the ``ctags_export`` and ``ctags_import``
+management commands.
+
+Each record is a flat dictionary whose ``type`` is one of:
+
+* ``tag``: the names and approvals of a ``CTag``, and the ``name_en`` of
+  its ``parent``, if any.
+* ``alias``: the ``name`` of a ``CTagAliasEn`` and the ``name_en`` of its
+  ``target`` ctag.
+* ``item``: a ``CTaggedItem``, as the ``name_en`` of its ``ctag``, the
+  natural key (``app_label``, ``model``) of its content type, its
+  ``object_id`` and its ``created`` timestamp in ISO 8601, if any.
+"""
+import csv
+import json
+import sys
+import time
+
+TAG_FIELDS = ('name_en', 'name_ja', 'name_es', 'name_pt',
+              'approved_en', 'approved_ja', 'approved_es', 'approved_pt')
+BOOLEAN_FIELDS = ('approved_en', 'approved_ja', 'approved_es', 'approved_pt')
+RECORD_FIELDS = (('type',) + TAG_FIELDS +
+                 ('parent', 'name', 'target', 'ctag', 'app_label', 'model',
+                  'object_id', 'created'))
+FORMATS = ('jsonl', 'csv')
+
+
+def guess_format(path, default='jsonl'):
+    """
+    Returns the record format matching the extension of ``path``.
+    """
+    if path and path.lower().endswith('.csv'):
+        return 'csv'
+    return default
+
+
+def write_records(records, stream, format='jsonl'):
+    """
+    Writes the ``records`` iterable to ``stream``, one per line.
+    """
+    if format == 'csv':
+        writer = csv.DictWriter(stream, RECORD_FIELDS, restval='')
+        writer.writeheader()
+        for record in records:
+            writer.writerow({key: int(value) if key in BOOLEAN_FIELDS
+                             else value for key, value in record.items()})
+    else:
+        dumps = json.JSONEncoder(ensure_ascii=False,
+                                 separators=(',', ':')).encode
+        for record in records:
+            stream.write(dumps(record))
+            stream.write('\n')
+
+
+def read_records(stream, format='jsonl'):
+    """
+    Yields the records read from ``stream``.
+    """
+    if format == 'csv':
+        for row in csv.DictReader(stream):
+            record = {key: value for key, value in row.items() if value != ''}
+            for key in BOOLEAN_FIELDS:
+                if key in record:
+                    record[key] = record[key] in ('1', 'True', 'true')
+            if 'object_id' in record:
+                record['object_id'] = int(record['object_id'])
+            yield record
+    else:
+        loads = json.JSONDecoder().decode
+        for line in stream:
+            if line.strip():
+                yield loads(line)
+
+
+class Progress(object):
+    """
+    Reports the throughput of a command on ``stream`` every
+    ``interval`` rows.
+    """
+    def __init__(self, stream=None, interval=50000, verbose=True):
+        self.stream = stream or sys.stderr
+        self.interval = interval
+        self.verbose = verbose
+        self.counts = {}
+        self.total = 0
+        self.start = time.monotonic()
+        self.next_report = interval
+
+    def add(self, kind, rows=1):
+        self.counts[kind] = self.counts.get(kind, 0) + rows
+        self.total += rows
+        if self.verbose and self.total >= self.next_report:
+            self.next_report = self.total + self.interval
+            self.report()
+
+    def report(self, final=False):
+        elapsed = max(time.monotonic() - self.start, 1e-6)
+        self.stream.write('%s%s rows in %.1fs (%d rows/s)\n' % (
+            final and 'Done: ' or '',
+            ', '.join('%s %d' % item for item in sorted(self.counts.items())),
+            elapsed, self.total / elapsed))
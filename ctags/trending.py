@@ -0,0 +1,204 @@
+"""
+Trending ctags, ranked by exponentially decayed usage.
+
+The scores are kept in the ``CTagTrend`` table, updated as ctags are
+used when the ``CTAGS_TRENDING`` setting is enabled, including by the
+bulk insertions of ``bulk_add_items``, or rebuilt from the
+``created`` timestamps of the tagged items by ``rebuild``.
+"""
+import datetime
+import math
+
+from django.db import IntegrityError
+from django.db import router
+from django.db import transaction
+from django.utils import timezone
+
+from ctags import settings
+
+# Origin of the scores, any fixed date does.
+EPOCH = datetime.datetime(2020, 1, 1, tzinfo=datetime.timezone.utc)
+
+
+def decay_rate():
+    """
+    Returns the decay rate per second matching the
+    ``CTAGS_TRENDING_HALF_LIFE`` setting.
+    """
+    return math.log(2) / settings.CTAGS_TRENDING_HALF_LIFE
+
+
+def log_weight(when):
+    """
+    Returns the logarithm of the weight of a use of a ctag at ``when``.
+    """
+    if timezone.is_naive(when):
+        when = timezone.make_aware(when)
+    return decay_rate() * (when - EPOCH).total_seconds()
+
+
+def log_add(a, b):
+    """
+    Returns ``log(exp(a) + exp(b))`` without overflowing.
+    """
+    if a < b:
+        a, b = b, a
+    return a + math.log1p(math.exp(b - a))
+
+
+def current_score(log_score, now=None):
+    """
+    Returns the decayed usage, as of ``now``, of a ``log_score``.
+    """
+    return math.exp(log_score - log_weight(now or timezone.now()))
+
+
+def _add_score(trends, key, log_score, last_used):
+    """
+    Adds ``log_score`` and ``last_used`` to the ``CTagTrend`` row of the
+    ``(ctag_id, content_type_id)`` key, creating it if needed.
+    """
+    ctag_id, content_type_id = key
+    trend, created = trends.select_for_update().get_or_create(
+        ctag_id=ctag_id, content_type_id=content_type_id,
+        defaults={'log_score': log_score, 'last_used': last_used})
+    if not created:
+        trend.log_score = log_add(trend.log_score, log_score)
+        trend.last_used = max(trend.last_used, last_used)
+        trend.save(update_fields=['log_score', 'last_used'])
+
+
+def record_usage(ctag_id, content_type_id, when, using=None):
+    """
+    Adds a use of a ctag at ``when`` to its scores, for the content type
+    and for all of them.
+    """
+    from ctags.models import CTagTrend
+
+    weight = log_weight(when)
+    db = using or router.db_for_write(CTagTrend)
+    trends = CTagTrend.objects.using(db)
+    with transaction.atomic(using=db):
+        for scope in (content_type_id, None):
+            _add_score(trends, (ctag_id, scope), weight, when)
+
+
+def add_scores(scores, using=None):
+    """
+    Adds the ``scores`` dictionary of ``(log_score, last_used)`` by
+    ``(ctag_id, content_type_id)`` to the ``CTagTrend`` rows, reading,
+    updating and creating the rows in bulk.
+    """
+    from ctags.models import CTagTrend
+
+    if not scores:
+        return
+    db = using or router.db_for_write(CTagTrend)
+    trends = CTagTrend.objects.using(db)
+    with transaction.atomic(using=db):
+        existing = []
+        missing = dict(scores)
+        for trend in trends.select_for_update().filter(
+                ctag__in={ctag_id for ctag_id, scope in scores}):
+            key = (trend.ctag_id, trend.content_type_id)
+            if key in missing:
+                log_score, last_used = missing.pop(key)
+                trend.log_score = log_add(trend.log_score, log_score)
+                trend.last_used = max(trend.last_used, last_used)
+                existing.append(trend)
+        trends.bulk_update(existing, ['log_score', 'last_used'],
+                           batch_size=1000)
+        try:
+            with transaction.atomic(using=db):
+                trends.bulk_create(
+                    [CTagTrend(ctag_id=ctag_id, content_type_id=scope,
+                               log_score=log_score, last_used=last_used)
+                     for (ctag_id, scope), (log_score, last_used)
+                     in missing.items()],
+                    batch_size=1000)
+        except IntegrityError:
+            # Some rows were created concurrently, add to them one by
+            # one.
+            for key, (log_score, last_used) in missing.items():
+                _add_score(trends, key, log_score, last_used)
+
+
+def record_items(items, using=None):
+    """
+    Adds the uses of the given ``CTaggedItem`` instances to the scores,
+    when trending is enabled.
+    """
+    if not settings.CTAGS_TRENDING:
+        return
+    scores = {}
+    for item in items:
+        if item.created is None:
+            continue
+        weight = log_weight(item.created)
+        for key in ((item.ctag_id, item.content_type_id),
+                    (item.ctag_id, None)):
+            add_score(scores, key, weight, item.created)
+    add_scores(scores, using)
+
+
+def item_saved(sender, instance, created, raw=False, using=None, **kwargs):
+    """
+    ``post_save`` receiver of ``CTaggedItem`` recording new uses.
+    """
+    if created and not raw and instance.created is not None:
+        record_usage(instance.ctag_id, instance.content_type_id,
+                     instance.created, using)
+
+
+def add_score(scores, key, log_score, last_used):
+    """
+    Adds ``log_score`` and ``last_used`` to the score of ``key`` in the
+    ``scores`` dictionary.
+    """
+    if key in scores:
+        current, current_last_used = scores[key]
+        scores[key] = (log_add(current, log_score),
+                       max(current_last_used, last_used))
+    else:
+        scores[key] = (log_score, last_used)
+
+
+def save_scores(scores, using=None):
+    """
+    Replaces all the ``CTagTrend`` rows with the ``scores`` dictionary of
+    ``(log_score, last_used)`` by ``(ctag_id, content_type_id)``.
+    """
+    from ctags.models import CTagTrend
+
+    db = using or router.db_for_write(CTagTrend)
+    with transaction.atomic(using=db):
+        CTagTrend.objects.using(db).all().delete()
+        CTagTrend.objects.using(db).bulk_create(
+            [CTagTrend(ctag_id=ctag_id, content_type_id=content_type_id,
+                       log_score=log_score, last_used=last_used)
+             for (ctag_id, content_type_id), (log_score, last_used)
+             in scores.items()],
+            batch_size=1000)
+
+
+def rebuild(using=None, chunk_size=10000):
+    """
+    Computes all the scores again from the ``created`` timestamps of the
+    tagged items, in a single pass. See ``ctags.rebuild`` for a parallel
+    rebuild.
+    """
+    from ctags.models import CTagTrend
+    from ctags.models import CTaggedItem
+
+    db = using or router.db_for_write(CTagTrend)
+    scores = {}
+    items = CTaggedItem.objects.using(db).filter(
+        created__isnull=False).values_list(
+            'ctag_id', 'content_type_id', 'created')
+    for ctag_id, content_type_id, created in items.iterator(
+            chunk_size=chunk_size):
+        weight = log_weight(created)
+        for key in ((ctag_id, content_type_id), (ctag_id, None)):
+            add_score(scores, key, weight, created)
+    save_scores(scores, db)
+    return len(scores)
@@ -3,14 +3,21 @@ Tagging utilities - from user tag input parsing to tag cloud
 calculation.
 """
 import math
+import re
+from functools import lru_cache
 
 from django.db.models.query import QuerySet
 from django.utils.encoding import force_str
 from django.utils.translation import gettext as _
 
+from ctags import settings
+
 # Font size distribution algorithms
 LOGARITHMIC, LINEAR = 1, 2
 
+# A double quoted section of tag input
+QUOTED_RE = re.compile(r'"([^"]*)"')
+
 
 def parse_tag_input(input):
     """
@@ -34,55 +41,58 @@ def parse_tag_input(input):
         return words
 
     words = []
-    buffer = []
     # Defer splitting of non-quoted sections until we know if there are
     # any unquoted commas.
     to_be_split = []
-    saw_loose_comma = False
-    open_quote = False
-    i = iter(input)
-    try:
-        while 1:
-            c = next(i)
-            if c == '"':
-                if buffer:
-                    to_be_split.append(''.join(buffer))
-                    buffer = []
-                # Find the matching quote
-                open_quote = True
-                c = next(i)
-                while c != '"':
-                    buffer.append(c)
-                    c = next(i)
-                if buffer:
-                    word = ''.join(buffer).strip()
-                    if word:
-                        words.append(word)
-                    buffer = []
-                open_quote = False
-            else:
-                if not saw_loose_comma and c == ',':
-                    saw_loose_comma = True
-                buffer.append(c)
-    except StopIteration:
-        # If we were parsing an open quote which was never closed treat
-        # the buffer as unquoted.
-        if buffer:
-            if open_quote and ',' in buffer:
-                saw_loose_comma = True
-            to_be_split.append(''.join(buffer))
-    if to_be_split:
-        if saw_loose_comma:
-            delimiter = ','
-        else:
-            delimiter = ' '
-        for chunk in to_be_split:
-            words.extend(split_strip(chunk, delimiter))
+    position = 0
+    for match in QUOTED_RE.finditer(input):
+        to_be_split.append(input[position:match.start()])
+        word = match.group(1).strip()
+        if word:
+            words.append(word)
+        position = match.end()
+    # If a quote is left open, the text after it is treated as unquoted.
+    to_be_split.extend(input[position:].split('"', 1))
+
+    if any(',' in chunk for chunk in to_be_split):
+        delimiter = ','
+    else:
+        delimiter = ' '
+    for chunk in to_be_split:
+        words.extend(split_strip(chunk, delimiter))
     words = list(set(words))
     words.sort()
     return words
 
 
+def parse_tag_inputs(inputs, lowercase=None):
+    """
+    Parses each of the given tag inputs as ``parse_tag_input`` does,
+    yielding a sorted list of unique tag names for each of them.
+
+    Tag names are lowercased if ``lowercase`` is True, defaulting to
+    the ``FORCE_LOWERCASE_TAGS`` setting. Repeated inputs are parsed
+    once, and equal tag names share a single string across the
+    results.
+    """
+    if lowercase is None:
+        lowercase = settings.FORCE_LOWERCASE_TAGS
+    names = {}
+
+    @lru_cache(maxsize=1024)
+    def parse(input):
+        if lowercase:
+            input = input.lower()
+        return [names.setdefault(name, name)
+                for name in parse_tag_input(input)]
+
+    for input in inputs:
+        if not input:
+            yield []
+        else:
+            yield list(parse(force_str(input)))
+
+
 def split_strip(input, delimiter=','):
     """
     Splits ``input`` on ``delimiter``, stripping each resulting string
@@ -108,7 +118,7 @@ def edit_string_for_tags(tags):
     names = []
     use_commas = False
     for tag in tags:
-        name = tag.name
+        name = tag.name_en
         if ',' in name:
             names.append('"%s"' % name)
             continue
@@ -171,7 +181,7 @@ def get_tag_list(tags):
     elif isinstance(tags, QuerySet) and tags.model is CTag:
         return tags
     elif isinstance(tags, str):
-        return CTag.objects.filter(name__in=parse_tag_input(tags))
+        return CTag.objects.filter(name_en__in=parse_tag_input(tags))
     elif isinstance(tags, (list, tuple)):
         if len(tags) == 0:
             return tags
@@ -185,8 +195,8 @@ def get_tag_list(tags):
                 contents.add('int')
         if len(contents) == 1:
             if 'string' in contents:
-                return CTag.objects.filter(name__in=[force_str(tag)
-                                                    for tag in tags])
+                return CTag.objects.filter(name_en__in=[force_str(tag)
+                                                       for tag in tags])
             elif 'tag' in contents:
                 return tags
             elif 'int' in contents:
@@ -216,7 +226,7 @@ def get_tag(tag):
 
     try:
         if isinstance(tag, str):
-            return CTag.objects.get(name=tag)
+            return CTag.objects.get(name_en=tag)
         elif isinstance(tag, int):
             return CTag.objects.get(id=tag)
     except CTag.DoesNotExist:
@@ -6,12 +6,41 @@ from django.http import Http404
 from django.utils.translation import gettext as _
 from django.views.generic.list import ListView
 
-from ctags.models import CTag
+from ctags import facets
+from ctags import settings
 from ctags.models import CTaggedItem
 from ctags.utils import get_queryset_and_model
 from ctags.utils import get_tag
 
 
+class CachedPages(object):
+    """
+    The objects listed by a ``TaggedObjectList``, counted and paginated
+    by ``facets.get_count`` and ``facets.get_objects`` so that the total
+    and the pages are cached.
+    """
+
+    def __init__(self, queryset_or_model, ctag, per_page,
+                 include_descendants):
+        self.queryset_or_model = queryset_or_model
+        self.ctag = ctag
+        self.per_page = per_page
+        self.include_descendants = include_descendants
+
+    def count(self):
+        return facets.get_count(
+            self.queryset_or_model, [self.ctag],
+            include_descendants=self.include_descendants)
+
+    def __getitem__(self, index):
+        # The paginator only slices whole pages.
+        objects = facets.get_objects(
+            self.queryset_or_model, [self.ctag],
+            page=index.start // self.per_page + 1, per_page=self.per_page,
+            include_descendants=self.include_descendants)
+        return objects[:index.stop - index.start]
+
+
 class TaggedObjectList(ListView):
     """
     A thin wrapper around
@@ -23,13 +52,21 @@ class TaggedObjectList(ListView):
     ``ctag`` context variable will contain the ``CTag`` instance for the
     ctag.
 
+    If ``include_descendants`` is ``True``, the instances tagged with any
+    descendant of the ctag are listed too.
+
     If ``related_tags`` is ``True``, a ``related_tags`` context variable
     will contain ctags related to the given ctag for the given model.
     Additionally, if ``related_tag_counts`` is ``True``, each related
     ctag will have a ``count`` attribute indicating the number of items
     which have it in addition to the given ctag.
+
+    With the ``CTAGS_FACET_CACHE`` setting, the pages without orphans
+    and the related ctags are read from the caches of ``ctags.facets``,
+    which ``ctags_warm`` fills.
     """
     ctag = None
+    include_descendants = False
     related_tags = False
     related_tag_counts = True
 
@@ -65,7 +102,16 @@ class TaggedObjectList(ListView):
         self.queryset_or_model = self.get_queryset_or_model()
         self.ctag_instance = self.get_tag()
         return CTaggedItem.objects.get_by_model(
-            self.queryset_or_model, self.ctag_instance)
+            self.queryset_or_model, self.ctag_instance,
+            include_descendants=self.include_descendants)
+
+    def paginate_queryset(self, queryset, page_size):
+        if settings.CTAGS_FACET_CACHE and not self.get_paginate_orphans():
+            queryset = CachedPages(self.queryset_or_model,
+                                   self.ctag_instance, page_size,
+                                   self.include_descendants)
+        return super(TaggedObjectList, self).paginate_queryset(
+            queryset, page_size)
 
     def get_context_data(self, **kwargs):
         context = super(TaggedObjectList, self).get_context_data(**kwargs)
@@ -73,6 +119,7 @@ class TaggedObjectList(ListView):
 
         if self.related_tags:
             queryset, model = get_queryset_and_model(self.queryset_or_model)
-            context['related_tags'] = CTag.objects.related_for_model(
-                self.ctag_instance, model, counts=self.related_tag_counts)
+            context['related_tags'] = facets.get_related_tags(
+                [self.ctag_instance], model,
+                counts=self.related_tag_counts)
         return context
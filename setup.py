@@ -26,8 +26,15 @@ setup(
     include_package_data=True,
     zip_safe=False,
 
+    extras_require={'analytics': ['numpy', 'scipy']},
+
+    python_requires='>=3.8',
+    install_requires=['Django>=4.1'],
+
     classifiers=[
         'Framework :: Django',
+        'Framework :: Django :: 4.1',
+        'Framework :: Django :: 4.2',
         'Environment :: Web Environment',
         'Operating System :: OS Independent',
         'Development Status :: 5 - Production/Stable',
@@ -35,6 +42,7 @@ setup(
         'License :: OSI Approved :: BSD License',
         'Programming Language :: Python',
         'Programming Language :: Python :: 3',
+        'Programming Language :: Python :: 3 :: Only',
         'Topic :: Utilities',
         'Topic :: Software Development :: Libraries :: Python Modules']
 )